@@ -0,0 +1,440 @@
+# alertas_api.py
+import asyncio
+import heapq
+import itertools
+import json
+import threading
+import urllib.request
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import desc, func, inspect, text
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from calibracao_api import Calibracao
+from models_api import Alerta as AlertaSQLAlchemy, Leitura as LeituraSQLAlchemy, RegraAlerta as RegraAlertaSQLAlchemy
+from monitor_api import LeituraNova
+
+# Só o worker que consegue gravar a mudança de estado notifica: os demais recebem zero linhas
+_SQL_DISPARAR = text("""
+    INSERT INTO alertas (regra_id, sensor_id, inicio, disparado_em, nivel)
+    VALUES (:regra_id, :sensor_id, :inicio, :instante, :nivel)
+    ON CONFLICT (regra_id, inicio) DO NOTHING
+    RETURNING id
+""")
+
+_SQL_RESOLVER = text("""
+    UPDATE alertas SET resolvido_em = :instante
+    WHERE regra_id = :regra_id AND inicio = :inicio AND resolvido_em IS NULL
+    RETURNING id
+""")
+
+
+@dataclass(frozen=True)
+class RegraAlerta:
+    """`nivel_abaixo`: nível abaixo de `limiar`% por `duracao`; `sem_leitura`: nenhuma leitura por `duracao`."""
+    id: int
+    sensor_id: str
+    tipo: str
+    limiar: Optional[float]
+    duracao: timedelta
+    histerese: float
+    destino: str
+
+
+@dataclass(frozen=True)
+class Notificacao:
+    regra: RegraAlerta
+    estado: str  # "disparado" ou "resolvido"
+    inicio: datetime  # quando a condição começou; identifica o alerta
+    instante: datetime
+    nivel: Optional[float] = None
+
+    def para_json(self) -> Dict[str, Any]:
+        return {
+            "regra_id": self.regra.id,
+            "sensor_id": self.regra.sensor_id,
+            "tipo": self.regra.tipo,
+            "estado": self.estado,
+            "inicio": self.inicio.isoformat(),
+            "instante": self.instante.isoformat(),
+            "limiar": self.regra.limiar,
+            "duracao_minutos": self.regra.duracao.total_seconds() / 60,
+            "nivel": round(self.nivel, 1) if self.nivel is not None else None,
+        }
+
+
+class _RegrasNivel:
+    """Regras `nivel_abaixo` de um sensor, ordenadas pelo limiar de entrada e pelo de saída (limiar + histerese).
+
+    Entre duas leituras só mudam de estado as regras cujo limiar está entre o
+    nível anterior e o atual, encontradas por busca binária.
+    """
+
+    def __init__(self, regras: Iterable[RegraAlerta]):
+        self.por_entrada = sorted(regras, key=lambda r: r.limiar)
+        self.entradas = [r.limiar for r in self.por_entrada]
+        self.por_saida = sorted(self.por_entrada, key=lambda r: r.limiar + r.histerese)
+        self.saidas = [r.limiar + r.histerese for r in self.por_saida]
+
+    def entradas_entre(self, baixo: float, alto: float) -> List[RegraAlerta]:
+        """Regras com baixo < limiar <= alto."""
+        return self.por_entrada[bisect_right(self.entradas, baixo):bisect_right(self.entradas, alto)]
+
+    def saidas_entre(self, baixo: float, alto: float) -> List[RegraAlerta]:
+        return self.por_saida[bisect_right(self.saidas, baixo):bisect_right(self.saidas, alto)]
+
+
+class MotorAlertas:
+    """Avalia as regras de alerta incrementalmente, a cada leitura e a cada verificação periódica.
+
+    Por leitura, o custo é O(log n + k) para n regras do sensor e k regras que
+    mudam de estado: as regras de nível ficam ordenadas por limiar e os prazos
+    (fim da duração mínima, tempo sem leitura) ficam num heap. Um alerta dispara
+    uma vez e só volta a disparar depois de resolvido; o nível precisa subir
+    `histerese` pontos acima do limiar para resolver.
+    """
+
+    def __init__(self, calibracao: Callable[[str], Calibracao]):
+        self._calibracao = calibracao
+        self._trava = threading.Lock()
+        self._sequencia = itertools.count()
+        self.regras: Dict[int, RegraAlerta] = {}
+        self._nivel: Dict[str, _RegrasNivel] = {}
+        self._sem_leitura: Dict[str, List[RegraAlerta]] = {}
+        # regra_id -> ("pendente" | "disparado", início da condição), só para regras de nível
+        self._estados: Dict[int, Tuple[str, datetime]] = {}
+        # Regras sem_leitura de cada sensor já disparadas (as k primeiras, por duração)
+        self._disparadas_sem_leitura: Dict[str, int] = {}
+        self._ultimo_nivel: Dict[str, float] = {}
+        self._ultima_leitura: Dict[str, datetime] = {}
+        self._prazos: List[tuple] = []
+
+    def carregar(
+        self, regras: Iterable[RegraAlerta], abertos: Dict[int, datetime], ultimas: Dict[str, datetime]
+    ) -> List[Notificacao]:
+        """Troca o conjunto de regras, preservando o estado das que continuam iguais.
+
+        `abertos` são os alertas disparados e não resolvidos (regra -> início),
+        e `ultimas` a última leitura de cada sensor, ambos lidos do banco.
+        """
+        with self._trava:
+            antigas = self.regras
+            self.regras = {r.id: r for r in regras}
+            estados = {
+                id_: estado for id_, estado in self._estados.items()
+                if id_ in self.regras and antigas.get(id_) == self.regras[id_]
+            }
+            for id_, inicio in abertos.items():
+                if id_ in self.regras and self.regras[id_].tipo == "nivel_abaixo":
+                    estados.setdefault(id_, ("disparado", inicio))
+            self._estados = estados
+
+            por_sensor: Dict[Tuple[str, str], List[RegraAlerta]] = {}
+            for regra in self.regras.values():
+                por_sensor.setdefault((regra.sensor_id, regra.tipo), []).append(regra)
+            self._nivel = {s: _RegrasNivel(r) for (s, tipo), r in por_sensor.items() if tipo == "nivel_abaixo"}
+            self._sem_leitura = {
+                s: sorted(r, key=lambda regra: regra.duracao) for (s, tipo), r in por_sensor.items() if tipo == "sem_leitura"
+            }
+            for sensor_id, instante in ultimas.items():
+                self._ultima_leitura[sensor_id] = max(instante, self._ultima_leitura.get(sensor_id, instante))
+            # A próxima leitura de cada sensor reavalia todas as regras de nível (inclusive as novas)
+            self._ultimo_nivel.clear()
+
+            notificacoes = []
+            # Alertas sem_leitura abertos de antes: resolvidos se chegou leitura depois, senão voltam a contar
+            for id_, inicio in abertos.items():
+                regra = self.regras.get(id_)
+                if regra is not None and regra.tipo == "sem_leitura":
+                    ultima = self._ultima_leitura.get(regra.sensor_id)
+                    if ultima is not None and ultima > inicio:
+                        notificacoes.append(Notificacao(regra, "resolvido", inicio, ultima))
+            # Prazos já vencidos disparam de novo; o que já estava gravado não é notificado outra vez
+            self._reconstruir_prazos()
+            self._vencer(datetime.now(dt_timezone.utc), notificacoes)
+            return notificacoes
+
+    def _reconstruir_prazos(self) -> None:
+        self._prazos = []
+        for id_, (estado, desde) in self._estados.items():
+            if estado == "pendente":
+                self._agendar(desde + self.regras[id_].duracao, "nivel", id_, desde)
+        for sensor_id, regras in self._sem_leitura.items():
+            self._disparadas_sem_leitura[sensor_id] = 0
+            if sensor_id in self._ultima_leitura:
+                self._agendar(self._ultima_leitura[sensor_id] + regras[0].duracao, "sem_leitura", sensor_id, self._ultima_leitura[sensor_id])
+
+    def _agendar(self, prazo: datetime, tipo: str, chave, desde: datetime) -> None:
+        heapq.heappush(self._prazos, (prazo, next(self._sequencia), tipo, chave, desde))
+
+    def ao_receber(self, novas: List[LeituraNova]) -> List[Notificacao]:
+        notificacoes: List[Notificacao] = []
+        with self._trava:
+            for leitura in novas:
+                sensor_id, instante = leitura.sensor_id, leitura.created_on
+                if sensor_id not in self._nivel and sensor_id not in self._sem_leitura:
+                    continue
+                # Prazos vencidos até esta leitura valem mesmo que ela encerre a condição
+                self._vencer(instante, notificacoes)
+                self._avaliar_sem_leitura(sensor_id, instante, notificacoes)
+                regras = self._nivel.get(sensor_id)
+                if regras is not None:
+                    nivel = self._calibracao(sensor_id).nivel(leitura.distancia)
+                    self._avaliar_nivel(regras, sensor_id, instante, nivel, notificacoes)
+                    self._vencer(instante, notificacoes)
+        return notificacoes
+
+    def verificar_prazos(self, agora: datetime) -> List[Notificacao]:
+        """Dispara as regras cujo prazo venceu (chamado periodicamente, mesmo sem leituras novas)."""
+        notificacoes: List[Notificacao] = []
+        with self._trava:
+            self._vencer(agora, notificacoes)
+        return notificacoes
+
+    def _avaliar_nivel(self, regras: _RegrasNivel, sensor_id: str, instante: datetime, nivel: float, notificacoes: List[Notificacao]) -> None:
+        anterior = self._ultimo_nivel.get(sensor_id)
+        self._ultimo_nivel[sensor_id] = nivel
+        if anterior is None:
+            # Primeira leitura do sensor: avalia todas as regras uma vez
+            for regra in regras.por_entrada[bisect_right(regras.entradas, nivel):]:
+                self._estados.setdefault(regra.id, ("pendente", instante))
+                if self._estados[regra.id][0] == "pendente":
+                    self._agendar(instante + regra.duracao, "nivel", regra.id, self._estados[regra.id][1])
+            for regra in regras.por_saida[:bisect_right(regras.saidas, nivel)]:
+                self._resolver_nivel(regra, instante, nivel, notificacoes)
+            return
+
+        if nivel < anterior:
+            for regra in regras.entradas_entre(nivel, anterior):
+                if regra.id not in self._estados:
+                    self._estados[regra.id] = ("pendente", instante)
+                    self._agendar(instante + regra.duracao, "nivel", regra.id, instante)
+        elif nivel > anterior:
+            for regra in regras.entradas_entre(anterior, nivel):
+                if self._estados.get(regra.id, ("",))[0] == "pendente":
+                    del self._estados[regra.id]
+            for regra in regras.saidas_entre(anterior, nivel):
+                self._resolver_nivel(regra, instante, nivel, notificacoes)
+
+    def _resolver_nivel(self, regra: RegraAlerta, instante: datetime, nivel: float, notificacoes: List[Notificacao]) -> None:
+        estado = self._estados.get(regra.id)
+        if estado is not None and estado[0] == "disparado":
+            del self._estados[regra.id]
+            notificacoes.append(Notificacao(regra, "resolvido", estado[1], instante, nivel))
+
+    def _avaliar_sem_leitura(self, sensor_id: str, instante: datetime, notificacoes: List[Notificacao]) -> None:
+        regras = self._sem_leitura.get(sensor_id)
+        anterior = self._ultima_leitura.get(sensor_id)
+        if anterior is not None and instante <= anterior:
+            return
+        self._ultima_leitura[sensor_id] = instante
+        if regras is None:
+            return
+        for regra in regras[:self._disparadas_sem_leitura.get(sensor_id, 0)]:
+            notificacoes.append(Notificacao(regra, "resolvido", anterior, instante))
+        self._disparadas_sem_leitura[sensor_id] = 0
+        self._agendar(instante + regras[0].duracao, "sem_leitura", sensor_id, instante)
+
+    def _vencer(self, agora: datetime, notificacoes: List[Notificacao]) -> None:
+        prazos = self._prazos
+        while prazos and prazos[0][0] <= agora:
+            _, _, tipo, chave, desde = heapq.heappop(prazos)
+            if tipo == "nivel":
+                # Entradas de condições já encerradas são descartadas aqui
+                if self._estados.get(chave) != ("pendente", desde):
+                    continue
+                regra = self.regras[chave]
+                self._estados[chave] = ("disparado", desde)
+                notificacoes.append(Notificacao(regra, "disparado", desde, agora, self._ultimo_nivel.get(regra.sensor_id)))
+            else:
+                if self._ultima_leitura.get(chave) != desde or chave not in self._sem_leitura:
+                    continue
+                regras = self._sem_leitura[chave]
+                k = self._disparadas_sem_leitura.get(chave, 0)
+                while k < len(regras) and desde + regras[k].duracao <= agora:
+                    notificacoes.append(Notificacao(regras[k], "disparado", desde, agora))
+                    k += 1
+                self._disparadas_sem_leitura[chave] = k
+                if k < len(regras):
+                    self._agendar(desde + regras[k].duracao, "sem_leitura", chave, desde)
+
+
+# --- DESTINOS DAS NOTIFICAÇÕES ---
+
+class Destino(ABC):
+    """Para onde as notificações de uma regra são enviadas (campo `destino` da regra)."""
+
+    @abstractmethod
+    def enviar(self, notificacao: Notificacao) -> None:
+        """Entrega a notificação; exceções são registradas em `AlertasAoVivo.entregar`."""
+
+
+class DestinoLog(Destino):
+    def enviar(self, notificacao: Notificacao) -> None:
+        regra = notificacao.regra
+        nivel = f", nível {notificacao.nivel:.1f}%" if notificacao.nivel is not None else ""
+        print(f"[Alerta] Regra {regra.id} ({regra.tipo}) do sensor '{regra.sensor_id}' {notificacao.estado}{nivel}.")
+
+
+class DestinoWebhook(Destino):
+    """POST do JSON da notificação para uma URL."""
+
+    def __init__(self, url: str, timeout_segundos: float = 5):
+        self.url = url
+        self.timeout_segundos = timeout_segundos
+
+    def enviar(self, notificacao: Notificacao) -> None:
+        pedido = urllib.request.Request(
+            self.url, data=json.dumps(notificacao.para_json()).encode("utf-8"),
+            headers={"Content-Type": "application/json"}, method="POST",
+        )
+        with urllib.request.urlopen(pedido, timeout=self.timeout_segundos) as resposta:
+            resposta.read()
+
+
+class AlertasAoVivo:
+    """Liga o motor de alertas ao monitor, ao banco e aos destinos.
+
+    As notificações saem da thread do monitor para uma fila e são entregues por
+    uma tarefa própria, então um webhook lento não atrasa a avaliação. Antes de
+    notificar, a mudança de estado é gravada na tabela `alertas`; com vários
+    workers, só o que gravou primeiro envia.
+    """
+
+    def __init__(self, fabrica_sessao: Callable[[], Session], calibracao: Callable[[str], Calibracao], intervalo_segundos: Callable[[], float]):
+        self._fabrica_sessao = fabrica_sessao
+        self._intervalo_segundos = intervalo_segundos
+        self.motor = MotorAlertas(calibracao)
+        self.destinos: Dict[str, Destino] = {"log": DestinoLog()}
+        self.disponivel = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._fila: Optional[asyncio.Queue] = None
+        self._tarefas: List[asyncio.Task] = []
+
+    def registrar_destino(self, nome: str, destino: Optional[Destino]) -> None:
+        """Adiciona ou troca um destino; None remove."""
+        if destino is None:
+            self.destinos.pop(nome, None)
+        else:
+            self.destinos[nome] = destino
+
+    def recarregar(self) -> int:
+        """Lê as regras ativas, os alertas em aberto e a última leitura dos sensores envolvidos."""
+        with self._fabrica_sessao() as db:
+            self.disponivel = inspect(db.get_bind()).has_table(RegraAlertaSQLAlchemy.__tablename__)
+            if not self.disponivel:
+                return 0
+            regras = [
+                RegraAlerta(l.id, l.sensor_id, l.tipo, l.limiar, timedelta(minutes=l.duracao_minutos), l.histerese, l.destino)
+                for l in db.query(RegraAlertaSQLAlchemy).filter(RegraAlertaSQLAlchemy.ativo.is_(True)).all()
+            ]
+            abertos = dict(db.query(AlertaSQLAlchemy.regra_id, AlertaSQLAlchemy.inicio)\
+                             .filter(AlertaSQLAlchemy.resolvido_em.is_(None))\
+                             .all())
+            sensores = {r.sensor_id for r in regras if r.tipo == "sem_leitura"}
+            ultimas = {}
+            if sensores:
+                ultimas = dict(db.query(LeituraSQLAlchemy.sensor_id, func.max(LeituraSQLAlchemy.created_on))\
+                                 .filter(LeituraSQLAlchemy.sensor_id.in_(sensores))\
+                                 .group_by(LeituraSQLAlchemy.sensor_id)\
+                                 .all())
+        self._enfileirar(self.motor.carregar(regras, abertos, ultimas))
+        print(f"[Alertas] {len(regras)} regras ativas carregadas.")
+        return len(regras)
+
+    def ao_receber(self, novas: List[LeituraNova]) -> None:
+        """Assinante do monitor."""
+        if self.disponivel:
+            self._enfileirar(self.motor.ao_receber(novas))
+
+    def _enfileirar(self, notificacoes: List[Notificacao]) -> None:
+        for notificacao in notificacoes:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._fila.put_nowait, notificacao)
+            else:
+                self.entregar(notificacao)
+
+    def _registrar(self, notificacao: Notificacao) -> bool:
+        """Grava a mudança de estado; False se outro worker já a gravou."""
+        regra = notificacao.regra
+        sql = _SQL_DISPARAR if notificacao.estado == "disparado" else _SQL_RESOLVER
+        with self._fabrica_sessao() as db:
+            gravou = db.execute(sql, {
+                "regra_id": regra.id, "sensor_id": regra.sensor_id, "inicio": notificacao.inicio,
+                "instante": notificacao.instante, "nivel": notificacao.nivel,
+            }).first() is not None
+            db.commit()
+        return gravou
+
+    def entregar(self, notificacao: Notificacao) -> None:
+        try:
+            if not self._registrar(notificacao):
+                return
+            destino = self.destinos.get(notificacao.regra.destino)
+            if destino is None:
+                print(f"[Alertas] Destino '{notificacao.regra.destino}' não configurado; usando log.")
+                destino = self.destinos["log"]
+            destino.enviar(notificacao)
+        except Exception as e:
+            print(f"[Alertas] Erro ao entregar notificação da regra {notificacao.regra.id}: {e}")
+
+    async def _despachar(self) -> None:
+        while True:
+            notificacao = await self._fila.get()
+            await run_in_threadpool(self.entregar, notificacao)
+
+    async def _verificar(self) -> None:
+        while True:
+            await asyncio.sleep(self._intervalo_segundos())
+            if self.disponivel:
+                self._enfileirar(self.motor.verificar_prazos(datetime.now(dt_timezone.utc)))
+
+    def iniciar(self) -> None:
+        if not self._tarefas:
+            self._loop = asyncio.get_running_loop()
+            self._fila = asyncio.Queue()
+            self._tarefas = [self._loop.create_task(self._despachar()), self._loop.create_task(self._verificar())]
+
+    async def parar(self) -> None:
+        for tarefa in self._tarefas:
+            tarefa.cancel()
+        for tarefa in self._tarefas:
+            try:
+                await tarefa
+            except asyncio.CancelledError:
+                pass
+        self._tarefas = []
+        self._loop = None
+
+    def listar(self, db: Session, sensor_id: str, desde: datetime, apenas_ativos: bool = False):
+        """Alertas do sensor disparados desde `desde` (ou ainda ativos), com o tipo da regra."""
+        consulta = db.query(AlertaSQLAlchemy, RegraAlertaSQLAlchemy.tipo)\
+                     .join(RegraAlertaSQLAlchemy, RegraAlertaSQLAlchemy.id == AlertaSQLAlchemy.regra_id)\
+                     .filter(AlertaSQLAlchemy.sensor_id == sensor_id)
+        if apenas_ativos:
+            consulta = consulta.filter(AlertaSQLAlchemy.resolvido_em.is_(None))
+        else:
+            consulta = consulta.filter(AlertaSQLAlchemy.disparado_em >= desde)
+        return consulta.order_by(desc(AlertaSQLAlchemy.disparado_em)).all()
+
+
+if __name__ == "__main__":
+    # Receptor local para testar o destino webhook: python alertas_api.py [porta]
+    import sys
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    class _Receptor(BaseHTTPRequestHandler):
+        def do_POST(self):
+            corpo = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            print(f"[Webhook] {self.path} {corpo.decode('utf-8')}")
+            self.send_response(204)
+            self.end_headers()
+
+    porta = int(sys.argv[1]) if len(sys.argv) > 1 else 8081
+    print(f"[Webhook] Recebendo notificações em http://127.0.0.1:{porta}/")
+    HTTPServer(("127.0.0.1", porta), _Receptor).serve_forever()
@@ -1,20 +1,53 @@
 # api.py
 
 # Bibliotecas
+import asyncio
+import gzip
+import hashlib
+import logging
 import os
+import secrets
+import signal
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta, timezone as dt_timezone
-from typing import List, Literal, Optional
+from functools import lru_cache, partial
+from typing import List, Literal, Optional, Set
 from dotenv import load_dotenv
-from fastapi import Depends, FastAPI, HTTPException, Path, Request
+from fastapi import FastAPI, Header, HTTPException, Path, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
 from sqlalchemy import asc, desc
-from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 # Módulos Locais do Projeto
-from database_api import get_db_session
-from models_api import Leitura as LeituraSQLAlchemy, LeituraResponse
+import database_api
+import exportacao_api
+from alertas_api import AlertasAoVivo, DestinoWebhook
+from cache_api import CachePorSensor
+from calibracao_api import CacheCalibracoes, Calibracao
+from coalescencia_api import Coalescedor
+from config_api import ConfiguracaoRuntime
+from database_api import SessionLeitura, SessionLocal
+from estatisticas_api import consultar_estatisticas, consultar_estatisticas_aproximadas
+from estaticos_api import Estaticos, codificacoes_aceitas
+from eventos_api import EventosAoVivo, ParametrosEventos
+from filtros_api import FiltroBase, FiltrosAoVivo, criar_filtro
+from lacunas_api import Lacunas
+from metricas_api import Metricas
+from models_api import (
+    AlertaResponse, AlertasResponse, ConsumoBucket, ConsumoResponse, DisponibilidadeResponse, EstatisticasJanela, EstatisticasResponse,
+    EventoResponse, EventosResponse, LacunaResponse, LacunasResponse, Leitura as LeituraSQLAlchemy, LeituraResponse, LoteRequest,
+    LoteResponse, PeriodoDisponibilidade, PontoSerie, PontoTendencia, PrevisaoResponse, SerieResponse, SnapshotResponse,
+)
+from monitor_api import MonitorLeituras
+from previsao_api import PrevisoesAoVivo
+from rollups_api import LACUNA_MAXIMA_MINUTOS, LIMIAR_REABASTECIMENTO_CM, SKETCH_PRECISAO_RELATIVA, Rollups, alinhar
+from serializacao_api import RespostaJSON, adaptador_lista, lista_para_json, para_json
+from series_api import Janela, consultar_janelas
+from snapshot_api import consultar_snapshot
+from sparkline_api import Sparklines
 
 
 # --- CONFIGURAÇÃO E INICIALIZAÇÃO DA APP ---
@@ -22,14 +55,196 @@ from models_api import Leitura as LeituraSQLAlchemy, LeituraResponse
 load_dotenv()
 
 # Carrega constantes a partir das variáveis de ambiente
-MIN_NIVEL = int(os.getenv("MIN_NIVEL"))
-MAX_NIVEL = int(os.getenv("MAX_NIVEL"))
+SENSOR_PADRAO = os.getenv("SENSOR_PADRAO", "principal")
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+# Recompilar templates alterados no disco só em desenvolvimento
+TEMPLATES_AUTO_RELOAD = os.getenv("TEMPLATES_AUTO_RELOAD", "false").strip().lower() in ("1", "true", "sim", "yes", "on")
+# Bytecode compilado dos templates, compartilhado entre workers e reinícios. O Jinja executa o que
+# encontrar ali: sem TEMPLATES_CACHE_DIR, usa o próprio diretório por usuário (modo 0700, dono conferido)
+TEMPLATES_CACHE_DIR = os.getenv("TEMPLATES_CACHE_DIR") or None
+
+# Calibração padrão e parâmetros de ajuste, recarregáveis sem reiniciar (SIGHUP ou /admin/config/recarregar)
+config = ConfiguracaoRuntime()
+
+# Calibração por sensor; MIN_NIVEL/MAX_NIVEL valem para sensores sem calibração própria
+calibracoes = CacheCalibracoes(
+    Calibracao(config.obter("MIN_NIVEL"), config.obter("MAX_NIVEL"), config.obter("CAPACIDADE_LITROS")),
+    SessionLocal,
+    tamanho_maximo=config.obter("CALIBRACAO_CACHE_MAX"),
+)
+
+# Requisições idênticas e simultâneas compartilham uma única consulta ao banco
+coalescedor = Coalescedor(timeout_padrao=config.obter("COALESCENCIA_TIMEOUT_SEGUNDOS"))
+coalescedor.definir_timeout("ultima", config.obter("COALESCENCIA_TIMEOUT_ULTIMA_SEGUNDOS"))
+
+# Acompanha as leituras gravadas pelo publicador e alimenta os estados incrementais
+monitor = MonitorLeituras(SessionLocal, lambda: config.obter("MONITOR_INTERVALO_SEGUNDOS"))
+
+PARAMETROS_FILTRO = ["FILTRO_JANELA_MEDIANA", "FILTRO_ALFA_EMA", "FILTRO_KALMAN_Q", "FILTRO_KALMAN_R", "FILTRO_LIMIAR_OUTLIER_CM"]
+
+def _parametros_filtro() -> dict:
+    return {nome: config.obter(nome) for nome in PARAMETROS_FILTRO}
+
+# Valor suavizado mais recente de cada sensor, atualizado a cada leitura nova
+# Estados alimentados pelo monitor leem do primário, para não perder leituras que a réplica ainda não tem
+filtros_ao_vivo = FiltrosAoVivo(
+    partial(SessionLeitura, recente=True), _parametros_filtro, tamanho_maximo=config.obter("SENSORES_CACHE_MAX")
+)
+monitor.assinar(filtros_ao_vivo.ao_receber)
+
+# Agregados por hora, mantidos a cada lote do monitor
+rollups = Rollups(SessionLocal)
+monitor.assinar(rollups.ao_receber)
+
+# Tendência recente de cada sensor para a previsão de esvaziamento
+previsoes = PrevisoesAoVivo(
+    SessionLocal, lambda: timedelta(hours=config.obter("PREVISAO_JANELA_HORAS")), LIMIAR_REABASTECIMENTO_CM,
+    tamanho_maximo=config.obter("SENSORES_CACHE_MAX"),
+)
+monitor.assinar(previsoes.ao_receber)
+
+# Reabastecimentos, drenagens e períodos vazios, detectados a cada leitura e gravados na tabela eventos
+PARAMETROS_EVENTOS = [
+    "EVENTO_HISTERESE_CM", "EVENTO_REABASTECIMENTO_MIN_CM", "EVENTO_DRENAGEM_CM_H", "EVENTO_DURACAO_MINIMA_MINUTOS", "EVENTO_NIVEL_VAZIO",
+]
+eventos = EventosAoVivo(
+    SessionLocal,
+    lambda: ParametrosEventos.da_configuracao(config.valores, LACUNA_MAXIMA_MINUTOS),
+    calibracoes.obter,
+    lambda: criar_filtro("median", _parametros_filtro()),
+)
+monitor.assinar(eventos.ao_receber)
+calibracoes.ao_alterar(eventos.limpar)
+
+# Intervalos sem leituras, materializados para o relatório de disponibilidade
+lacunas = Lacunas(SessionLocal)
+monitor.assinar(lacunas.ao_receber)
+
+# Regras de alerta avaliadas a cada leitura; notificações por log ou webhook (ALERTA_WEBHOOK_URL)
+alertas = AlertasAoVivo(SessionLocal, calibracoes.obter, lambda: config.obter("MONITOR_INTERVALO_SEGUNDOS"))
+monitor.assinar(alertas.ao_receber)
+
+# Médias por bucket das últimas 24h para o minigráfico da página HTML
+sparklines = Sparklines(partial(SessionLeitura, recente=True), tamanho_maximo=config.obter("SENSORES_CACHE_MAX"))
+monitor.assinar(sparklines.ao_receber)
+
+# Tempos de execução (ex.: renderização de templates), expostos em /metricas
+metricas = Metricas()
+
+# Favicon, CSS e JS de static/, com URLs versionadas e variantes .gz/.br pré-comprimidas
+estaticos = Estaticos(os.path.join(os.path.dirname(os.path.abspath(__file__)), "static"))
+
+# Snapshot do dashboard e página da última leitura já prontos, válidos até a próxima leitura do sensor
+snapshots = CachePorSensor(tamanho_maximo=config.obter("SENSORES_CACHE_MAX"))
+monitor.assinar(snapshots.ao_receber)
+calibracoes.ao_alterar(snapshots.invalidar)
+
+
+# --- RECARGA DE CONFIGURAÇÃO ---
+
+def _aplicar_calibracao_padrao(cfg: ConfiguracaoRuntime, alterados):
+    calibracoes.definir_padrao(Calibracao(cfg.obter("MIN_NIVEL"), cfg.obter("MAX_NIVEL"), cfg.obter("CAPACIDADE_LITROS")))
+
+def _aplicar_timeouts(cfg: ConfiguracaoRuntime, alterados):
+    coalescedor.timeout_padrao = cfg.obter("COALESCENCIA_TIMEOUT_SEGUNDOS")
+    coalescedor.definir_timeout("ultima", cfg.obter("COALESCENCIA_TIMEOUT_ULTIMA_SEGUNDOS"))
+
+def _aplicar_tamanho_cache(cfg: ConfiguracaoRuntime, alterados):
+    calibracoes.tamanho_maximo = cfg.obter("CALIBRACAO_CACHE_MAX")
+    for cache in (filtros_ao_vivo, previsoes, sparklines, snapshots):
+        cache.tamanho_maximo = cfg.obter("SENSORES_CACHE_MAX")
+
+def _aplicar_pool(cfg: ConfiguracaoRuntime, alterados):
+    database_api.reconfigurar_pool(cfg.obter("DB_POOL_SIZE"), cfg.obter("DB_MAX_OVERFLOW"), cfg.obter("DB_POOL_SIZE_LEITURA"))
+
+def _aplicar_echo(cfg: ConfiguracaoRuntime, alterados):
+    database_api.engine.echo = cfg.obter("DB_ECHO")
+    database_api.engine_leitura.echo = cfg.obter("DB_ECHO")
+    database_api.replicas.definir_echo(cfg.obter("DB_ECHO"))
+
+def _aplicar_webhook(cfg: ConfiguracaoRuntime, alterados):
+    url = cfg.obter("ALERTA_WEBHOOK_URL")
+    alertas.registrar_destino("webhook", DestinoWebhook(url) if url else None)
+
+def _aplicar_log(cfg: ConfiguracaoRuntime, alterados):
+    for nome in ("", "uvicorn", "uvicorn.access", "uvicorn.error"):
+        logging.getLogger(nome).setLevel(cfg.obter("LOG_LEVEL"))
+
+config.ao_alterar(["MIN_NIVEL", "MAX_NIVEL", "CAPACIDADE_LITROS"], _aplicar_calibracao_padrao)
+config.ao_alterar(["COALESCENCIA_TIMEOUT_SEGUNDOS", "COALESCENCIA_TIMEOUT_ULTIMA_SEGUNDOS"], _aplicar_timeouts)
+config.ao_alterar(["CALIBRACAO_CACHE_MAX", "SENSORES_CACHE_MAX"], _aplicar_tamanho_cache)
+config.ao_alterar(["DB_POOL_SIZE", "DB_MAX_OVERFLOW", "DB_POOL_SIZE_LEITURA"], _aplicar_pool)
+config.ao_alterar(["DB_ECHO"], _aplicar_echo)
+config.ao_alterar(["LOG_LEVEL"], _aplicar_log)
+config.ao_alterar(["ALERTA_WEBHOOK_URL"], _aplicar_webhook)
+_aplicar_webhook(config, frozenset())
+config.ao_alterar(PARAMETROS_FILTRO, lambda cfg, alterados: filtros_ao_vivo.limpar())
+config.ao_alterar(PARAMETROS_FILTRO, lambda cfg, alterados: snapshots.invalidar())
+config.ao_alterar(["PREVISAO_JANELA_HORAS"], lambda cfg, alterados: previsoes.limpar())
+config.ao_alterar(PARAMETROS_EVENTOS + PARAMETROS_FILTRO, lambda cfg, alterados: eventos.limpar())
+
+def _recarregar_configuracao() -> dict:
+    """Relê o .env, a tabela de calibrações e as regras de alerta, aplicando apenas o que mudou."""
+    alterados = config.recarregar()
+    sensores_recalibrados = calibracoes.recarregar()
+    regras_alerta = alertas.recarregar()
+    print(f"[Config] Versão {config.versao}: parâmetros alterados {sorted(alterados)}, sensores recalibrados {sorted(sensores_recalibrados)}")
+    return {
+        "versao": config.versao,
+        "parametros_alterados": sorted(alterados),
+        "sensores_recalibrados": sorted(sensores_recalibrados),
+        "regras_alerta": regras_alerta,
+    }
+
+# Referência às recargas em andamento: o loop só guarda referência fraca às tarefas
+_recargas_sighup: Set[asyncio.Task] = set()
+
+def _ao_terminar_recarga(tarefa: asyncio.Task):
+    _recargas_sighup.discard(tarefa)
+    if not tarefa.cancelled() and tarefa.exception() is not None:
+        print(f"[Config] Erro ao recarregar a configuração via SIGHUP: {tarefa.exception()}")
+
+def _ao_receber_sighup():
+    tarefa = asyncio.get_running_loop().create_task(run_in_threadpool(_recarregar_configuracao))
+    _recargas_sighup.add(tarefa)
+    tarefa.add_done_callback(_ao_terminar_recarga)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Pré-carrega caches e instala a recarga via SIGHUP antes de aceitar requisições."""
+    await run_in_threadpool(estaticos.carregar)
+    await run_in_threadpool(_precompilar_templates)
+    await run_in_threadpool(calibracoes.carregar_todas)
+    await run_in_threadpool(rollups.verificar_tabela)
+    await run_in_threadpool(eventos.verificar_tabela)
+    await run_in_threadpool(lacunas.verificar_tabela)
+    await run_in_threadpool(alertas.recarregar)
+    loop = asyncio.get_running_loop()
+    sighup = getattr(signal, "SIGHUP", None)  # Não existe no Windows
+    try:
+        if sighup is not None:
+            loop.add_signal_handler(sighup, _ao_receber_sighup)
+    except (NotImplementedError, RuntimeError):
+        # Loop fora da thread principal (ex.: testes) ou sem suporte a sinais
+        sighup = None
+    alertas.iniciar()
+    monitor.iniciar()
+    database_api.replicas.iniciar()
+    yield
+    await database_api.replicas.parar()
+    await monitor.parar()
+    await alertas.parar()
+    if sighup is not None:
+        loop.remove_signal_handler(sighup)
+    estaticos.fechar()
 
 # Instância principal da aplicação FastAPI
 app = FastAPI(
     title="API Caixa D'água",
     description="API para monitorar o nível da caixa d'água usando um sensor de distância.",
     version="1.3.0",
+    lifespan=lifespan,
+    default_response_class=RespostaJSON,
 )
 
 # Configuração do CORS para permitir acesso de qualquer origem
@@ -41,11 +256,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Configuração do motor de templates Jinja2 para renderizar HTML
-templates = Jinja2Templates(directory="templates")
+# Configuração do motor de templates Jinja2 para renderizar HTML (assíncrono: use _renderizar)
+if TEMPLATES_CACHE_DIR:
+    os.makedirs(TEMPLATES_CACHE_DIR, mode=0o700, exist_ok=True)
+templates = Jinja2Templates(env=Environment(
+    loader=FileSystemLoader("templates"),
+    autoescape=True,
+    auto_reload=TEMPLATES_AUTO_RELOAD,
+    bytecode_cache=FileSystemBytecodeCache(TEMPLATES_CACHE_DIR),
+    enable_async=True,
+))
+templates.env.globals["estatico"] = estaticos.url
+
+def _precompilar_templates() -> None:
+    """Compila todos os templates na subida, para a primeira requisição não pagar a compilação."""
+    with metricas.cronometrar("templates.precompilar"):
+        nomes = templates.env.list_templates(extensions=["html"])
+        for nome in nomes:
+            templates.env.get_template(nome)
+    print(f"[Templates] {len(nomes)} templates compilados (auto_reload={TEMPLATES_AUTO_RELOAD}).")
 
+async def _renderizar(nome: str, **contexto) -> str:
+    """Renderiza um template de forma assíncrona, registrando o tempo em /metricas."""
+    with metricas.cronometrar(f"template.{nome}"):
+        return await templates.env.get_template(nome).render_async(**contexto)
 
-def _calcular_nivel_percentual(distancia_original: float | int | None, min_val: int, max_val: int) -> int | None:
+
+def _calcular_nivel_percentual(distancia_original: float | int | None, min_val: float, max_val: float) -> int | None:
     """Calcula o nível percentual da água com base na distância medida."""
     if not isinstance(distancia_original, (int, float)):
         return None
@@ -60,69 +297,771 @@ def _calcular_nivel_percentual(distancia_original: float | int | None, min_val:
     
     return round(nivel_percentual)
 
-def _processar_leitura(leitura_obj: LeituraSQLAlchemy) -> Optional[LeituraResponse]:
-    """Converte um objeto SQLAlchemy para o modelo Pydantic, calculando o nível."""
+def _processar_leitura(
+    leitura_obj: LeituraSQLAlchemy, calibracao: Optional[Calibracao] = None, distancia: Optional[float] = None
+) -> Optional[LeituraResponse]:
+    """Converte um objeto SQLAlchemy para o modelo Pydantic, calculando o nível com a calibração do sensor.
+
+    `distancia` substitui o valor bruto da leitura (ex.: valor suavizado por um filtro).
+    """
     if not leitura_obj:
         return None
 
-    nivel_percentual = _calcular_nivel_percentual(leitura_obj.distancia, MIN_NIVEL, MAX_NIVEL)
+    distancia = leitura_obj.distancia if distancia is None else distancia
+    calibracao = calibracao or calibracoes.obter(leitura_obj.sensor_id)
+    nivel_percentual = _calcular_nivel_percentual(distancia, calibracao.min_nivel, calibracao.max_nivel)
     created_on_str = leitura_obj.created_on.isoformat() if leitura_obj.created_on else None
-    print(nivel_percentual)
     return LeituraResponse(
         id=leitura_obj.id,
-        distancia=leitura_obj.distancia,
+        distancia=distancia,
         nivel=nivel_percentual,
         created_on=created_on_str
     )
 
+def _serializar_json(conteudo) -> bytes:
+    """Serializa o conteúdo do mesmo modo que a resposta padrão da API (RespostaJSON)."""
+    return para_json(conteudo)
+
+def _consultar_ultima_leitura(sensor_id: str, filtro: Optional[str] = None) -> Optional[LeituraResponse]:
+    """Busca a leitura mais recente do sensor em uma sessão própria (executada pelo coalescedor).
+
+    Com filtro, a distância vem do estado incremental do sensor, sem reler o histórico.
+    Sempre no primário: uma réplica atrasada mostraria uma leitura velha.
+    """
+    with SessionLeitura(recente=True) as db:
+        ultima_leitura_obj = db.query(LeituraSQLAlchemy)\
+                               .filter(LeituraSQLAlchemy.sensor_id == sensor_id)\
+                               .order_by(desc(LeituraSQLAlchemy.created_on))\
+                               .first()
+        distancia = filtros_ao_vivo.valor_atual(sensor_id, filtro) if filtro and ultima_leitura_obj else None
+        return _processar_leitura(ultima_leitura_obj, distancia=distancia)
+
+def _aquecer_filtro(
+    db, sensor_id: str, limite_tempo_utc: datetime, filtro: str, primeiro: Optional[datetime], incremental: bool
+) -> FiltroBase:
+    """Cria o filtro do período.
+
+    Numa busca incremental, o filtro é aquecido com as leituras que o cliente já tem, como em FiltrosAoVivo.
+    """
+    instancia = criar_filtro(filtro, _parametros_filtro())
+    if incremental and primeiro is not None:
+        anteriores = db.query(LeituraSQLAlchemy.distancia)\
+                       .filter(LeituraSQLAlchemy.sensor_id == sensor_id)\
+                       .filter(LeituraSQLAlchemy.created_on >= limite_tempo_utc)\
+                       .filter(LeituraSQLAlchemy.created_on < primeiro)\
+                       .order_by(desc(LeituraSQLAlchemy.created_on))\
+                       .limit(FiltrosAoVivo.LEITURAS_AQUECIMENTO)\
+                       .all()
+        for (distancia,) in reversed(anteriores):
+            instancia.atualizar(distancia)
+    return instancia
+
+def _filtrar_periodo(
+    db, sensor_id: str, limite_tempo_utc: datetime, filtro: str, distancias: list, primeiro: Optional[datetime], incremental: bool
+) -> list:
+    """Aplica o filtro às distâncias do período."""
+    instancia = _aquecer_filtro(db, sensor_id, limite_tempo_utc, filtro, primeiro, incremental)
+    return [instancia.atualizar(d) for d in distancias]
+
+def _instantes_colunares(instantes: list, tempo: str) -> list:
+    """created_on como ISO 8601, epoch em ms, ou epoch em ms do primeiro seguido das diferenças."""
+    if tempo == "iso":
+        return [instante.isoformat() for instante in instantes]
+    epoch_ms = [round(instante.timestamp() * 1000) for instante in instantes]
+    if tempo == "epoch_ms" or not epoch_ms:
+        return epoch_ms
+    return epoch_ms[:1] + [b - a for a, b in zip(epoch_ms, epoch_ms[1:])]
+
+# Campos de uma leitura no histórico, na ordem em que saem; `nivel` é calculado a partir da distância
+CAMPOS_LEITURA = ("id", "distancia", "nivel", "created_on")
+
+def _campos_pedidos(fields: Optional[str]) -> tuple:
+    """Normaliza `fields=a,b` na ordem de CAMPOS_LEITURA, para que cada combinação tenha uma só chave."""
+    if not fields:
+        return CAMPOS_LEITURA
+    pedidos = {campo.strip() for campo in fields.split(",") if campo.strip()}
+    desconhecidos = pedidos - set(CAMPOS_LEITURA)
+    if desconhecidos or not pedidos:
+        raise HTTPException(
+            status_code=422, detail=f"Campos inválidos em fields: {sorted(desconhecidos)}; use {', '.join(CAMPOS_LEITURA)}"
+        )
+    return tuple(campo for campo in CAMPOS_LEITURA if campo in pedidos)
+
+@lru_cache(maxsize=None)
+def _serializador_periodo(campos: tuple, formato: str, tempo: str):
+    """Função que serializa as colunas do período, montada uma vez por combinação de campos e formato."""
+    converter_instantes = partial(_instantes_colunares, tempo=tempo if formato == "columnar" else "iso")
+    conversores = tuple(converter_instantes if campo == "created_on" else None for campo in campos)
+
+    def colunas_convertidas(colunas: dict) -> list:
+        return [
+            conversor(colunas[campo]) if conversor else colunas[campo] for campo, conversor in zip(campos, conversores)
+        ]
+
+    if formato == "columnar":
+        chaves = tuple("ids" if campo == "id" else campo for campo in campos)
+
+        def serializar(colunas: dict) -> bytes:
+            return _serializar_json(dict(zip(chaves, colunas_convertidas(colunas))))
+    else:
+        adaptador = adaptador_lista(LeituraResponse, campos)
+
+        def serializar(colunas: dict) -> bytes:
+            return lista_para_json(adaptador, [dict(zip(campos, valores)) for valores in zip(*colunas_convertidas(colunas))])
+    return serializar
+
+def _janela(unit: str, value: int) -> tuple:
+    """(início, fim) das últimas `value` horas (unit="h") ou dias (unit="d"), terminando agora."""
+    fim = datetime.now(dt_timezone.utc)
+    return fim - (timedelta(hours=value) if unit == "h" else timedelta(days=value)), fim
+
+def _consultar_periodo_serializado(
+    sensor_id: str, unit: str, value: int, filtro: Optional[str] = None,
+    since_id: Optional[int] = None, since: Optional[datetime] = None,
+    formato: str = "rows", tempo: str = "iso", campos: tuple = CAMPOS_LEITURA,
+) -> tuple:
+    """Busca o histórico do período e já devolve (JSON pronto, maior id), compartilhados entre os aguardantes.
+
+    Com `since_id`/`since`, só vêm as leituras posteriores às que o cliente já tem.
+    Só as colunas necessárias para `campos` são lidas, e saem do banco como listas.
+    A busca incremental vai ao primário: o ETag dela vem do monitor, que lê do primário.
+    """
+    limite_tempo_utc, _ = _janela(unit, value)
+    incremental = since_id is not None or since is not None
+
+    # Colunas lidas: as pedidas, mais o id para o ETag e o instante para aquecer o filtro
+    lidas = [c for c in ("id", "distancia", "created_on") if c in campos]
+    if "nivel" in campos and "distancia" not in lidas:
+        lidas.append("distancia")
+    if incremental and "id" not in lidas:
+        lidas.append("id")
+    if filtro and incremental and "created_on" not in lidas:
+        lidas.append("created_on")
+
+    with SessionLeitura(recente=incremental) as db:
+        consulta = db.query(*(getattr(LeituraSQLAlchemy, coluna) for coluna in lidas))\
+                     .filter(LeituraSQLAlchemy.sensor_id == sensor_id)\
+                     .filter(LeituraSQLAlchemy.created_on >= limite_tempo_utc)
+        if since_id is not None:
+            consulta = consulta.filter(LeituraSQLAlchemy.id > since_id)
+        if since is not None:
+            consulta = consulta.filter(LeituraSQLAlchemy.created_on > since)
+        linhas = consulta.order_by(asc(LeituraSQLAlchemy.created_on)).all()
+        colunas = dict(zip(lidas, (list(coluna) for coluna in zip(*linhas)))) if linhas else {c: [] for c in lidas}
+
+        if filtro and "distancia" in colunas:
+            primeiro = colunas["created_on"][0] if incremental and linhas else None
+            colunas["distancia"] = _filtrar_periodo(
+                db, sensor_id, limite_tempo_utc, filtro, colunas["distancia"], primeiro, incremental
+            )
+    if "nivel" in campos:
+        calibracao = calibracoes.obter(sensor_id)
+        minimo, maximo = calibracao.min_nivel, calibracao.max_nivel
+        colunas["nivel"] = [_calcular_nivel_percentual(d, minimo, maximo) for d in colunas["distancia"]]
+    maior_id = max(colunas["id"], default=since_id) if "id" in colunas else None
+    return _serializador_periodo(campos, formato, tempo)(colunas), maior_id
+
+def _consultar_consumo(sensor_id: str, unit: str, value: int, bucket_minutos: int) -> ConsumoResponse:
+    """Consumo e reabastecimento por bucket a partir das primeiras diferenças da distância."""
+    passo = bucket_minutos * 60
+    inicio, agora = _janela(unit, value)
+    inicio = alinhar(inicio, passo)
+    litros_por_cm = calibracoes.obter(sensor_id).litros_por_cm()
+
+    with SessionLeitura() as db:
+        fonte, linhas = rollups.variacoes(db, sensor_id, inicio, agora, passo)
+
+    buckets = []
+    for bucket, n, variacao_cm, reabastecimento_cm in linhas:
+        # Saldo negativo no bucket (enchimento lento, sem degrau) conta como reabastecimento
+        consumo = max(variacao_cm, 0.0) * litros_por_cm
+        reabastecimento = (reabastecimento_cm + max(-variacao_cm, 0.0)) * litros_por_cm
+        horas = min(passo, (agora - bucket).total_seconds()) / 3600
+        buckets.append(ConsumoBucket(
+            inicio=bucket.isoformat(),
+            leituras=n,
+            consumo_litros=round(consumo, 2),
+            reabastecimento_litros=round(reabastecimento, 2),
+            vazao_consumo_lph=round(consumo / horas, 2) if horas > 0 else 0.0,
+            vazao_reabastecimento_lph=round(reabastecimento / horas, 2) if horas > 0 else 0.0,
+        ))
+
+    return ConsumoResponse(
+        sensor_id=sensor_id,
+        bucket_minutos=bucket_minutos,
+        fonte=fonte,
+        consumo_total_litros=round(sum(b.consumo_litros for b in buckets), 2),
+        reabastecimento_total_litros=round(sum(b.reabastecimento_litros for b in buckets), 2),
+        buckets=buckets,
+    )
+
+def _calcular_previsao(sensor_id: str) -> PrevisaoResponse:
+    """Extrapola a tendência atual do sensor até o nível zero, a partir do modelo em memória."""
+    modelo = previsoes.modelo(sensor_id)
+    calibracao = calibracoes.obter(sensor_id)
+    agora = datetime.now(dt_timezone.utc)
+    ajuste = modelo.ajuste(agora)
+    ultima = modelo.ultimo_instante.isoformat() if modelo.ultimo_instante else None
+    faixa = calibracao.max_nivel - calibracao.min_nivel
+    if ajuste is None or faixa == 0:
+        return PrevisaoResponse(
+            sensor_id=sensor_id, leituras_usadas=modelo.n, nivel_estimado=None, taxa_percentual_por_hora=None,
+            vazao_litros_por_hora=None, horas_ate_vazio=None, vazio_em=None, ultima_leitura_em=ultima,
+            desatualizada=modelo.desatualizado(agora),
+        )
+
+    inclinacao_cm_h, distancia_agora = ajuste
+    nivel = _calcular_nivel_percentual(distancia_agora, calibracao.min_nivel, calibracao.max_nivel)
+    taxa = -inclinacao_cm_h / faixa * 100.0
+    horas_ate_vazio = nivel / -taxa if taxa < 0 else None
+    return PrevisaoResponse(
+        sensor_id=sensor_id,
+        leituras_usadas=modelo.n,
+        nivel_estimado=nivel,
+        taxa_percentual_por_hora=round(taxa, 3),
+        vazao_litros_por_hora=round(-inclinacao_cm_h * calibracao.litros_por_cm() * (1 if faixa > 0 else -1), 2),
+        horas_ate_vazio=round(horas_ate_vazio, 2) if horas_ate_vazio is not None else None,
+        vazio_em=(agora + timedelta(hours=horas_ate_vazio)).isoformat() if horas_ate_vazio is not None else None,
+        ultima_leitura_em=ultima,
+    )
+
+def _consultar_lote(sensor_id: str, janelas: tuple) -> LoteResponse:
+    """Monta todas as séries pedidas a partir de um único plano de consultas."""
+    calibracao = calibracoes.obter(sensor_id)
+    with SessionLeitura() as db:
+        resultados = consultar_janelas(db, sensor_id, janelas, rollups.disponivel)
+
+    series = []
+    for janela, (fonte, pontos) in zip(janelas, resultados):
+        if janela.resolucao_minutos is None:
+            pontos_serie = [
+                PontoSerie(id=id_, created_on=created_on.isoformat(), distancia=distancia,
+                           nivel=_calcular_nivel_percentual(distancia, calibracao.min_nivel, calibracao.max_nivel))
+                for id_, created_on, distancia in pontos
+            ]
+        else:
+            pontos_serie = [
+                PontoSerie(created_on=b.inicio.isoformat(), distancia=round(b.distancia, 2), leituras=b.leituras,
+                           nivel=_calcular_nivel_percentual(b.distancia, calibracao.min_nivel, calibracao.max_nivel))
+                for b in pontos
+            ]
+        series.append(SerieResponse(
+            unit=janela.unit, value=janela.value, resolucao_minutos=janela.resolucao_minutos,
+            fonte=fonte, pontos=pontos_serie,
+        ))
+    return LoteResponse(sensor_id=sensor_id, series=series)
+
+def _gerar_snapshot(sensor_id: str) -> tuple:
+    """Monta o snapshot do dashboard e devolve (JSON, ETag)."""
+    calibracao = calibracoes.obter(sensor_id)
+    minimo, maximo = calibracao.min_nivel, calibracao.max_nivel
+    # Primário: o snapshot é regerado assim que o monitor vê leitura nova
+    with SessionLeitura(recente=True) as db:
+        id_, distancia, created_on, n, d_min, d_max, d_media, tendencia = consultar_snapshot(
+            db, sensor_id, datetime.now(dt_timezone.utc), timedelta(hours=24), pontos_tendencia=48
+        )
+
+    ultima = None
+    if id_ is not None:
+        ultima = LeituraResponse(
+            id=id_, distancia=distancia, created_on=created_on.isoformat(),
+            nivel=_calcular_nivel_percentual(distancia, minimo, maximo),
+        )
+    # Distância maior significa nível menor
+    estatisticas = EstatisticasJanela(
+        leituras=n, distancia_min=d_min, distancia_max=d_max,
+        distancia_media=round(d_media, 2) if d_media is not None else None,
+        nivel_min=_calcular_nivel_percentual(d_max, minimo, maximo),
+        nivel_max=_calcular_nivel_percentual(d_min, minimo, maximo),
+        nivel_medio=_calcular_nivel_percentual(d_media, minimo, maximo),
+    )
+    pontos = [
+        PontoTendencia(
+            created_on=datetime.fromtimestamp(float(epoch), tz=dt_timezone.utc).isoformat(),
+            nivel=_calcular_nivel_percentual(d, minimo, maximo),
+        )
+        for epoch, d in tendencia
+    ]
+    corpo = _serializar_json(SnapshotResponse(
+        sensor_id=sensor_id, ultima=ultima, estatisticas_24h=estatisticas, tendencia=pontos,
+    ))
+    return corpo, f'"{hashlib.blake2b(corpo, digest_size=12).hexdigest()}"'
+
+def _obter_snapshot(sensor_id: str) -> tuple:
+    return snapshots.obter(sensor_id, "snapshot", lambda: _gerar_snapshot(sensor_id))
+
+def _dados_pagina_ultima(sensor_id: str, filtro: Optional[str]) -> tuple:
+    """Última leitura e minigráfico do sensor (consulta ao banco, executada numa thread)."""
+    leitura = _consultar_ultima_leitura(sensor_id, filtro)
+    sparkline = sparklines.svg(sensor_id, calibracoes.obter(sensor_id)) if leitura is not None else None
+    return leitura, sparkline
+
+async def _gerar_pagina_ultima(sensor_id: str, filtro: Optional[str]) -> tuple:
+    """Renderiza a página da última leitura e devolve (status, HTML, HTML gzip, ETag)."""
+    leitura, sparkline = await run_in_threadpool(_dados_pagina_ultima, sensor_id, filtro)
+    if leitura is None:
+        status, html = 404, await _renderizar("error.html", mensagem="Nenhuma leitura encontrada no banco de dados.")
+    else:
+        status, html = 200, await _renderizar("ultima_leitura.html", leitura=leitura, sparkline=sparkline)
+    corpo = html.encode("utf-8")
+    return status, corpo, gzip.compress(corpo, mtime=0), f'"{hashlib.blake2b(corpo, digest_size=12).hexdigest()}"'
+
+async def _obter_pagina_ultima(sensor_id: str, filtro: Optional[str]) -> tuple:
+    return await snapshots.obter_async(sensor_id, ("ultima_html", filtro), lambda: _gerar_pagina_ultima(sensor_id, filtro))
+
+def _consultar_estatisticas(sensor_id: str, unit: str, value: int, percentis: tuple, metodo: str) -> EstatisticasResponse:
+    """Resumo estatístico da distância e do nível na janela, agregado no banco.
+
+    Janelas longas (ou metodo=aproximado) usam os rollups e sketches horários em vez das leituras brutas.
+    """
+    inicio, fim = _janela(unit, value)
+    delta = fim - inicio
+    if metodo == "auto":
+        longa = delta >= timedelta(days=config.obter("ESTATISTICAS_DIAS_EXATO"))
+        metodo = "aproximado" if longa and rollups.com_sketch else "exato"
+    if metodo == "aproximado" and not rollups.com_sketch:
+        raise HTTPException(status_code=409, detail="Sketches de quantis indisponíveis (aplique a migração 003)")
+
+    consultar = consultar_estatisticas_aproximadas if metodo == "aproximado" else consultar_estatisticas
+    with SessionLeitura() as db:
+        resumo = consultar(db, sensor_id, inicio, fim, list(percentis), calibracoes.obter(sensor_id))
+    return EstatisticasResponse(
+        sensor_id=sensor_id, inicio=inicio.isoformat(), fim=fim.isoformat(), metodo=metodo,
+        erro_relativo_percentis=SKETCH_PRECISAO_RELATIVA if metodo == "aproximado" else None,
+        **resumo,
+    )
+
+def _consultar_eventos(sensor_id: str, unit: str, value: int, tipos: tuple) -> EventosResponse:
+    """Eventos que se sobrepõem à janela, lidos da tabela indexada por sensor e início."""
+    inicio, fim = _janela(unit, value)
+    calibracao = calibracoes.obter(sensor_id)
+    minimo, maximo = calibracao.min_nivel, calibracao.max_nivel
+    with SessionLeitura() as db:
+        linhas = eventos.listar(db, sensor_id, inicio, fim, tipos)
+
+    resposta = []
+    for evento in linhas:
+        volume = None
+        if evento.tipo != "vazio" and evento.distancia_fim is not None:
+            volume = round(abs(evento.distancia_fim - evento.distancia_inicio) * calibracao.litros_por_cm(), 2)
+        resposta.append(EventoResponse(
+            id=evento.id,
+            tipo=evento.tipo,
+            inicio=evento.inicio.isoformat(),
+            fim=evento.fim.isoformat() if evento.fim else None,
+            em_andamento=evento.fim is None,
+            duracao_minutos=round((evento.fim - evento.inicio).total_seconds() / 60, 1) if evento.fim else None,
+            nivel_inicio=_calcular_nivel_percentual(evento.distancia_inicio, minimo, maximo),
+            nivel_fim=_calcular_nivel_percentual(evento.distancia_fim, minimo, maximo),
+            volume_litros=volume,
+        ))
+    return EventosResponse(sensor_id=sensor_id, inicio=inicio.isoformat(), fim=fim.isoformat(), eventos=resposta)
+
+def _consultar_lacunas(sensor_id: str, unit: str, value: int, limiar_minutos: float) -> LacunasResponse:
+    """Intervalos sem leituras maiores que o limiar na janela, incluindo o atual se o sensor está fora."""
+    inicio, fim = _janela(unit, value)
+    with SessionLeitura() as db:
+        fonte, linhas = lacunas.listar(db, sensor_id, inicio, fim, timedelta(minutes=limiar_minutos))
+    itens = [
+        LacunaResponse(
+            inicio=l_inicio.isoformat(),
+            fim=l_fim.isoformat() if l_fim else None,
+            em_andamento=l_fim is None,
+            duracao_minutos=round(((l_fim or fim) - l_inicio).total_seconds() / 60, 1),
+        )
+        for l_inicio, l_fim in linhas
+    ]
+    fora = sum(((l_fim or fim) - max(l_inicio, inicio)).total_seconds() for l_inicio, l_fim in linhas) / 60
+    return LacunasResponse(
+        sensor_id=sensor_id, inicio=inicio.isoformat(), fim=fim.isoformat(), limiar_minutos=limiar_minutos,
+        fonte=fonte, tempo_fora_minutos=round(fora, 1), lacunas=itens,
+    )
+
+def _consultar_disponibilidade(sensor_id: str, unit: str, value: int, limiar_minutos: float, agrupamento: Optional[str]) -> DisponibilidadeResponse:
+    """Percentual do tempo com leituras, no total e por período, a partir da tabela de lacunas."""
+    inicio, fim = _janela(unit, value)
+    with SessionLeitura() as db:
+        fonte, primeira, linhas = lacunas.disponibilidade(
+            db, sensor_id, inicio, fim, timedelta(minutes=limiar_minutos), agrupamento
+        )
+
+    def _percentual(segundos_fora: float, total: float) -> float:
+        return round(100.0 * (1 - segundos_fora / total), 3) if total > 0 else 100.0
+
+    periodos = [
+        PeriodoDisponibilidade(
+            inicio=p_inicio.isoformat(), fim=p_fim.isoformat(),
+            disponibilidade_percentual=_percentual(fora, (p_fim - p_inicio).total_seconds()),
+            tempo_fora_minutos=round(fora / 60, 1), lacunas=n,
+        )
+        for p_inicio, p_fim, fora, n in linhas
+    ]
+    fora_total = sum(float(linha[2]) for linha in linhas)
+    total = sum((p_fim - p_inicio).total_seconds() for p_inicio, p_fim, _, _ in linhas)
+    return DisponibilidadeResponse(
+        sensor_id=sensor_id, inicio=inicio.isoformat(), fim=fim.isoformat(), limiar_minutos=limiar_minutos, fonte=fonte,
+        primeira_leitura=primeira.isoformat() if primeira else None,
+        disponibilidade_percentual=_percentual(fora_total, total) if linhas else None,
+        tempo_fora_minutos=round(fora_total / 60, 1), periodos=periodos,
+    )
+
+def _consultar_alertas(sensor_id: str, dias: int, apenas_ativos: bool) -> AlertasResponse:
+    desde = datetime.now(dt_timezone.utc) - timedelta(days=dias)
+    with SessionLeitura() as db:
+        linhas = alertas.listar(db, sensor_id, desde, apenas_ativos)
+    return AlertasResponse(sensor_id=sensor_id, alertas=[
+        AlertaResponse(
+            id=alerta.id,
+            regra_id=alerta.regra_id,
+            tipo=tipo,
+            inicio=alerta.inicio.isoformat(),
+            disparado_em=alerta.disparado_em.isoformat(),
+            resolvido_em=alerta.resolvido_em.isoformat() if alerta.resolvido_em else None,
+            ativo=alerta.resolvido_em is None,
+            nivel=round(alerta.nivel, 1) if alerta.nivel is not None else None,
+        )
+        for alerta, tipo in linhas
+    ])
+
 @app.get("/favicon.ico", include_in_schema=False)
-async def get_favicon():
-    """Serve o arquivo de ícone para o navegador."""
-    favicon_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "favicon.ico")
-    return FileResponse(favicon_path)
+async def get_favicon(request: Request):
+    """Serve o ícone para o navegador a partir da memória."""
+    resposta = estaticos.responder("favicon.ico", request.headers)
+    if resposta is None:
+        raise HTTPException(status_code=404, detail="Ícone não encontrado")
+    return resposta
+
+@app.get("/static/{caminho:path}", include_in_schema=False)
+async def get_estatico(request: Request, caminho: str):
+    """Arquivos estáticos; as URLs com hash (ver `estatico()` nos templates) podem ficar em cache para sempre."""
+    resposta = estaticos.responder(caminho, request.headers)
+    if resposta is None:
+        raise HTTPException(status_code=404, detail="Arquivo não encontrado")
+    return resposta
 
 @app.get("/leituras/ultima_html", response_class=HTMLResponse, summary="Página web com a última leitura")
-async def get_ultima_leitura_html(request: Request, db: Session = Depends(get_db_session)):
-    """Busca a última leitura no banco de dados e a renderiza em uma página HTML."""
+async def get_ultima_leitura_html(
+    request: Request,
+    sensor_id: str = Query(SENSOR_PADRAO, max_length=64, title="Sensor", description="Identificador do sensor/caixa"),
+    filtro: Optional[Literal["median", "ema", "kalman"]] = Query(None, alias="filter", title="Filtro de ruído"),
+):
+    """Página HTML com a última leitura.
+
+    Inclui um minigráfico SVG das últimas 24h, gerado no servidor a partir das
+    médias por bucket em memória. A página é renderizada uma vez por leitura nova e guardada em bytes (e já
+    comprimida em gzip); as visitas seguintes só copiam esses bytes da memória.
+    """
     try:
-        ultima_leitura_obj = db.query(LeituraSQLAlchemy).order_by(desc(LeituraSQLAlchemy.created_on)).first()
-
-        if not ultima_leitura_obj:
-            contexto_erro = {"request": request, "mensagem": "Nenhuma leitura encontrada no banco de dados."}
-            return templates.TemplateResponse("error.html", contexto_erro, status_code=404)
-        
-        leitura_processada = _processar_leitura(ultima_leitura_obj)
-        #print("oieeeeee")
-        #print(leitura_processada.nivel)
-        #print(leitura_processada.distancia)
-        contexto_jinja = {
-            "request": request,
-            "leitura": leitura_processada
-        }
-        
-        return templates.TemplateResponse("ultima_leitura.html", context=contexto_jinja)
+        em_cache = snapshots.em_cache(sensor_id, ("ultima_html", filtro))
+        status, corpo, corpo_gzip, etag = em_cache or await coalescedor.executar(
+            ("ultima_html", sensor_id, filtro), _obter_pagina_ultima, sensor_id, filtro
+        )
+
+        cabecalhos = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=cabecalhos)
+        if "gzip" in codificacoes_aceitas(request.headers.get("accept-encoding", "")):
+            cabecalhos["Content-Encoding"] = "gzip"
+            corpo = corpo_gzip
+        return Response(content=corpo, status_code=status, media_type="text/html; charset=utf-8", headers=cabecalhos)
 
     except Exception as e:
         print(f"API Erro em /leituras/ultima_html: {e}")
-        contexto_erro = {"request": request, "mensagem": "Ocorreu um erro interno no servidor."}
-        return templates.TemplateResponse("error.html", contexto_erro, status_code=500)
+        return HTMLResponse(await _renderizar("error.html", mensagem="Ocorreu um erro interno no servidor."), status_code=500)
+
+def _processar_leitura_nova(nova, sensor_id: str, filtro: Optional[str]) -> LeituraResponse:
+    """Resposta para a leitura vista pelo monitor (aquecer o filtro ou a calibração consulta o banco, executada numa thread)."""
+    distancia = filtros_ao_vivo.valor_atual(sensor_id, filtro) if filtro else None
+    return _processar_leitura(nova, distancia=distancia)
+
+@app.get("/leituras/proxima", response_model=LeituraResponse, summary="Aguardar a próxima leitura (long-poll)")
+async def get_proxima_leitura(
+    after_id: int = Query(..., ge=0, title="Maior id que o cliente já tem"),
+    timeout: float = Query(30, gt=0, le=60, title="Espera máxima, em segundos"),
+    sensor_id: str = Query(SENSOR_PADRAO, max_length=64, title="Sensor", description="Identificador do sensor/caixa"),
+    filtro: Optional[Literal["median", "ema", "kalman"]] = Query(None, alias="filter", title="Filtro de ruído"),
+):
+    """Responde assim que existir uma leitura do sensor com id maior que `after_id`.
+
+    Alternativa a consultar `/leituras/ultima_html` em laço para telas sem WebSocket/SSE.
+    A requisição fica parada no evento do monitor; se o prazo acabar, responde 204.
+    """
+    try:
+        if sensor_id not in monitor.ultima_por_sensor:
+            # Sensor sem leituras desde que a API subiu: a última pode já estar no banco
+            leitura = await coalescedor.executar(
+                ("ultima", sensor_id, filtro), _consultar_ultima_leitura, sensor_id, filtro
+            )
+            if leitura is not None and leitura.id > after_id:
+                return leitura
+
+        nova = await monitor.aguardar_nova(sensor_id, after_id, timeout)
+        if nova is None:
+            return Response(status_code=204, headers={"Cache-Control": "no-store"})
+        return await run_in_threadpool(_processar_leitura_nova, nova, sensor_id, filtro)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Tempo esgotado ao buscar a última leitura")
+    except Exception as e:
+        print(f"API Erro em /leituras/proxima: {e}")
+        raise HTTPException(status_code=500, detail="Erro interno ao aguardar a próxima leitura")
 
 @app.get("/leituras/{unit}/{value}", response_model=List[LeituraResponse], summary="Obter leituras por período")
-def get_leituras_por_periodo(
+async def get_leituras_por_periodo(
+    request: Request,
     unit: Literal["h", "d"] = Path(..., title="Unidade de tempo", description="'h' para horas, 'd' para dias"),
     value: int = Path(..., ge=1, title="Valor do período", description="Deve ser um inteiro >= 1"),
-    db: Session = Depends(get_db_session)
+    sensor_id: str = Query(SENSOR_PADRAO, max_length=64, title="Sensor", description="Identificador do sensor/caixa"),
+    filtro: Optional[Literal["median", "ema", "kalman"]] = Query(None, alias="filter", title="Filtro de ruído"),
+    since_id: Optional[int] = Query(None, ge=0, title="Somente leituras com id maior que este"),
+    since: Optional[datetime] = Query(None, title="Somente leituras posteriores a este instante (ISO 8601)"),
+    formato: Literal["rows", "columnar"] = Query("rows", alias="format", title="Uma lista de objetos ou um objeto de colunas"),
+    tempo: Literal["iso", "epoch_ms", "delta_ms"] = Query("iso", alias="timestamps", title="Codificação de created_on no formato colunar"),
+    fields: Optional[str] = Query(None, max_length=64, title="Campos a retornar, separados por vírgula (id, distancia, nivel, created_on)"),
 ):
-    """Busca um histórico de leituras com base em um período de tempo (horas ou dias)."""
-    delta = timedelta(hours=value) if unit == "h" else timedelta(days=value)
-    
+    """Busca um histórico de leituras com base em um período de tempo (horas ou dias).
+
+    Para atualizar um gráfico aberto, passe o maior `id` recebido em `since_id` (e o ETag em
+    If-None-Match): só as leituras novas são enviadas, ou 304 se não houver nenhuma.
+
+    `format=columnar` devolve `{ids, distancia, nivel, created_on}` com uma lista por coluna;
+    `timestamps=epoch_ms` ou `delta_ms` (primeiro instante, depois as diferenças) encurta created_on.
+    `fields=created_on,nivel` restringe as colunas lidas do banco e as enviadas.
+
+    Com `Accept: application/vnd.apache.arrow.stream` ou `application/msgpack`, o histórico
+    sai em formato binário, em lotes transmitidos conforme são lidos do banco.
+    """
+    incremental = since_id is not None or since is not None
+    campos = _campos_pedidos(fields)
+    if since is not None and since.tzinfo is None:
+        since = since.replace(tzinfo=dt_timezone.utc)
+    if incremental:
+        # O ETag é o maior id conhecido do sensor; se o monitor não viu nada além dele, nada mudou
+        conhecida = monitor.ultima_por_sensor.get(sensor_id)
+        if conhecida is not None and request.headers.get("if-none-match") == f'"{conhecida.id}"':
+            return Response(status_code=304, headers={"ETag": f'"{conhecida.id}"', "Cache-Control": "no-cache"})
+
+    tipo_binario = exportacao_api.negociar(request.headers.get("accept"))
+    if tipo_binario is not None:
+        if not exportacao_api.disponivel(tipo_binario):
+            raise HTTPException(
+                status_code=406,
+                detail=f"Formato {tipo_binario} indisponível: instale '{exportacao_api.BIBLIOTECAS[tipo_binario]}' no servidor",
+            )
+        limite_tempo_utc, _ = _janela(unit, value)
+        preparar_filtro = None
+        if filtro:
+            def preparar_filtro(db, primeiro):
+                return _aquecer_filtro(db, sensor_id, limite_tempo_utc, filtro, primeiro, incremental)
+        return StreamingResponse(
+            exportacao_api.exportar(
+                tipo_binario, partial(SessionLeitura, recente=incremental, transacional=True), sensor_id,
+                limite_tempo_utc, calibracoes.obter,
+                since_id=since_id, since=since, preparar_filtro=preparar_filtro, campos=campos,
+            ),
+            media_type=tipo_binario,
+        )
+
     try:
-        limite_tempo_utc = datetime.now(dt_timezone.utc) - delta
-        leituras_objs = db.query(LeituraSQLAlchemy)\
-                          .filter(LeituraSQLAlchemy.created_on >= limite_tempo_utc)\
-                          .order_by(asc(LeituraSQLAlchemy.created_on))\
-                          .all()
-        
-        return [_processar_leitura(leitura) for leitura in leituras_objs]
+        corpo, maior_id = await coalescedor.executar(
+            ("periodo", sensor_id, unit, value, filtro, since_id, since, formato, tempo, campos),
+            _consultar_periodo_serializado, sensor_id, unit, value, filtro, since_id, since, formato, tempo, campos,
+        )
+        cabecalhos = {}
+        if incremental and maior_id is not None:
+            cabecalhos = {"ETag": f'"{maior_id}"', "Cache-Control": "no-cache"}
+            if request.headers.get("if-none-match") == cabecalhos["ETag"]:
+                return Response(status_code=304, headers=cabecalhos)
+        return Response(content=corpo, media_type="application/json", headers=cabecalhos)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Tempo esgotado ao buscar histórico")
     except Exception:
-        raise HTTPException(status_code=500, detail="Erro interno do servidor ao buscar histórico")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Erro interno do servidor ao buscar histórico")
+
+@app.get("/leituras/consumo", response_model=ConsumoResponse, summary="Consumo e vazão por período")
+async def get_consumo(
+    unit: Literal["h", "d"] = Query("h", title="Unidade de tempo", description="'h' para horas, 'd' para dias"),
+    value: int = Query(24, ge=1, title="Valor do período", description="Deve ser um inteiro >= 1"),
+    bucket_minutos: int = Query(60, ge=1, le=43200, title="Tamanho do bucket em minutos"),
+    sensor_id: str = Query(SENSOR_PADRAO, max_length=64, title="Sensor", description="Identificador do sensor/caixa"),
+):
+    """Litros consumidos e reabastecidos por bucket, com as vazões médias em litros por hora."""
+    try:
+        return await coalescedor.executar(
+            ("consumo", sensor_id, unit, value, bucket_minutos), _consultar_consumo, sensor_id, unit, value, bucket_minutos
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Tempo esgotado ao calcular consumo")
+    except Exception as e:
+        print(f"API Erro em /leituras/consumo: {e}")
+        raise HTTPException(status_code=500, detail="Erro interno do servidor ao calcular consumo")
+
+def _verificar_admin(token: Optional[str]):
+    """Libera as rotas administrativas apenas com o ADMIN_TOKEN configurado."""
+    if not ADMIN_TOKEN or not token or not secrets.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Acesso administrativo negado")
+
+@app.post("/leituras/lote", response_model=LoteResponse, summary="Várias janelas de histórico em uma requisição")
+async def post_leituras_lote(pedido: LoteRequest):
+    """Responde várias janelas e resoluções de uma vez, reaproveitando a consulta mais larga."""
+    sensor_id = pedido.sensor_id or SENSOR_PADRAO
+    janelas = tuple(Janela(j.unit, j.value, j.resolucao_minutos) for j in pedido.janelas)
+    try:
+        return await coalescedor.executar(("lote", sensor_id, janelas), _consultar_lote, sensor_id, janelas)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Tempo esgotado ao buscar séries")
+    except Exception as e:
+        print(f"API Erro em /leituras/lote: {e}")
+        raise HTTPException(status_code=500, detail="Erro interno do servidor ao buscar séries")
+
+@app.get("/dashboard/snapshot", response_model=SnapshotResponse, summary="Última leitura, estatísticas de 24h e tendência")
+async def get_dashboard_snapshot(
+    request: Request,
+    sensor_id: str = Query(SENSOR_PADRAO, max_length=64, title="Sensor", description="Identificador do sensor/caixa"),
+):
+    """Tudo o que a página inicial do dashboard precisa, calculado em uma ida ao banco e mantido em cache."""
+    try:
+        em_cache = snapshots.em_cache(sensor_id, "snapshot")
+        corpo, etag = em_cache or await coalescedor.executar(("snapshot", sensor_id), _obter_snapshot, sensor_id)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Tempo esgotado ao montar snapshot")
+    except Exception as e:
+        print(f"API Erro em /dashboard/snapshot: {e}")
+        raise HTTPException(status_code=500, detail="Erro interno do servidor ao montar snapshot")
+
+    cabecalhos = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=cabecalhos)
+    return Response(content=corpo, media_type="application/json", headers=cabecalhos)
+
+@app.get("/leituras/estatisticas/{unit}/{value}", response_model=EstatisticasResponse, summary="Estatísticas da janela")
+async def get_estatisticas(
+    unit: Literal["h", "d"] = Path(..., title="Unidade de tempo", description="'h' para horas, 'd' para dias"),
+    value: int = Path(..., ge=1, title="Valor do período", description="Deve ser um inteiro >= 1"),
+    percentis: List[float] = Query([0.05, 0.25, 0.5, 0.75, 0.95], title="Percentis", description="Valores entre 0 e 1"),
+    metodo: Literal["auto", "exato", "aproximado"] = Query("auto", title="Método", description="'aproximado' usa os sketches horários"),
+    sensor_id: str = Query(SENSOR_PADRAO, max_length=64, title="Sensor", description="Identificador do sensor/caixa"),
+):
+    """Mínimo, máximo, média, desvio padrão e percentis da distância e do nível, sem baixar as leituras."""
+    if not percentis or len(percentis) > 20 or any(not 0 <= p <= 1 for p in percentis):
+        raise HTTPException(status_code=422, detail="Informe de 1 a 20 percentis entre 0 e 1")
+    chave_percentis = tuple(sorted(set(percentis)))
+    try:
+        return await coalescedor.executar(
+            ("estatisticas", sensor_id, unit, value, chave_percentis, metodo),
+            _consultar_estatisticas, sensor_id, unit, value, chave_percentis, metodo,
+        )
+    except HTTPException:
+        raise
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Tempo esgotado ao calcular estatísticas")
+    except Exception as e:
+        print(f"API Erro em /leituras/estatisticas: {e}")
+        raise HTTPException(status_code=500, detail="Erro interno do servidor ao calcular estatísticas")
+
+@app.get("/eventos", response_model=EventosResponse, summary="Reabastecimentos, drenagens e períodos de caixa vazia")
+async def get_eventos(
+    unit: Literal["h", "d"] = Query("d", title="Unidade de tempo", description="'h' para horas, 'd' para dias"),
+    value: int = Query(30, ge=1, title="Valor do período", description="Deve ser um inteiro >= 1"),
+    tipo: Optional[List[Literal["reabastecimento", "drenagem", "vazio"]]] = Query(None, title="Tipos de evento"),
+    sensor_id: str = Query(SENSOR_PADRAO, max_length=64, title="Sensor", description="Identificador do sensor/caixa"),
+):
+    """Eventos detectados na janela, incluindo os ainda em andamento."""
+    if not eventos.disponivel:
+        raise HTTPException(status_code=409, detail="Tabela de eventos indisponível (aplique a migração 004)")
+    tipos = tuple(sorted(set(tipo or ())))
+    try:
+        return await coalescedor.executar(
+            ("eventos", sensor_id, unit, value, tipos), _consultar_eventos, sensor_id, unit, value, tipos
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Tempo esgotado ao buscar eventos")
+    except Exception as e:
+        print(f"API Erro em /eventos: {e}")
+        raise HTTPException(status_code=500, detail="Erro interno do servidor ao buscar eventos")
+
+@app.get("/leituras/lacunas", response_model=LacunasResponse, summary="Intervalos sem leituras")
+async def get_lacunas(
+    unit: Literal["h", "d"] = Query("d", title="Unidade de tempo", description="'h' para horas, 'd' para dias"),
+    value: int = Query(7, ge=1, title="Valor do período", description="Deve ser um inteiro >= 1"),
+    limiar_minutos: float = Query(LACUNA_MAXIMA_MINUTOS, gt=0, title="Duração mínima da lacuna em minutos"),
+    sensor_id: str = Query(SENSOR_PADRAO, max_length=64, title="Sensor", description="Identificador do sensor/caixa"),
+):
+    """Períodos em que o sensor ficou sem enviar leituras, para não interpolar gráficos através deles."""
+    try:
+        return await coalescedor.executar(
+            ("lacunas", sensor_id, unit, value, limiar_minutos), _consultar_lacunas, sensor_id, unit, value, limiar_minutos
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Tempo esgotado ao buscar lacunas")
+    except Exception as e:
+        print(f"API Erro em /leituras/lacunas: {e}")
+        raise HTTPException(status_code=500, detail="Erro interno do servidor ao buscar lacunas")
+
+@app.get("/leituras/disponibilidade", response_model=DisponibilidadeResponse, summary="Disponibilidade do sensor")
+async def get_disponibilidade(
+    unit: Literal["h", "d"] = Query("d", title="Unidade de tempo", description="'h' para horas, 'd' para dias"),
+    value: int = Query(365, ge=1, title="Valor do período", description="Deve ser um inteiro >= 1"),
+    agrupamento: Optional[Literal["dia", "semana", "mes"]] = Query(None, title="Quebra por período de calendário (UTC)"),
+    limiar_minutos: float = Query(LACUNA_MAXIMA_MINUTOS, gt=0, title="Duração mínima da lacuna em minutos"),
+    sensor_id: str = Query(SENSOR_PADRAO, max_length=64, title="Sensor", description="Identificador do sensor/caixa"),
+):
+    """Percentual do tempo em que o sensor esteve enviando leituras, desde a primeira leitura na janela."""
+    try:
+        return await coalescedor.executar(
+            ("disponibilidade", sensor_id, unit, value, limiar_minutos, agrupamento),
+            _consultar_disponibilidade, sensor_id, unit, value, limiar_minutos, agrupamento,
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Tempo esgotado ao calcular disponibilidade")
+    except Exception as e:
+        print(f"API Erro em /leituras/disponibilidade: {e}")
+        raise HTTPException(status_code=500, detail="Erro interno do servidor ao calcular disponibilidade")
+
+@app.get("/alertas", response_model=AlertasResponse, summary="Alertas disparados e ativos")
+def get_alertas(
+    dias: int = Query(7, ge=1, le=366, title="Dias de histórico"),
+    apenas_ativos: bool = Query(False, title="Somente alertas ainda não resolvidos"),
+    sensor_id: str = Query(SENSOR_PADRAO, max_length=64, title="Sensor", description="Identificador do sensor/caixa"),
+):
+    """Histórico de disparos das regras de alerta do sensor, mais recentes primeiro."""
+    if not alertas.disponivel:
+        raise HTTPException(status_code=409, detail="Tabelas de alerta indisponíveis (aplique a migração 005)")
+    try:
+        return _consultar_alertas(sensor_id, dias, apenas_ativos)
+    except Exception as e:
+        print(f"API Erro em /alertas: {e}")
+        raise HTTPException(status_code=500, detail="Erro interno do servidor ao buscar alertas")
+
+@app.get("/leituras/previsao", response_model=PrevisaoResponse, summary="Previsão de esvaziamento no ritmo atual")
+def get_previsao(
+    sensor_id: str = Query(SENSOR_PADRAO, max_length=64, title="Sensor", description="Identificador do sensor/caixa"),
+):
+    """Estima quando a caixa esvazia mantida a tendência recente, sem reler o histórico."""
+    try:
+        return _calcular_previsao(sensor_id)
+    except Exception as e:
+        print(f"API Erro em /leituras/previsao: {e}")
+        raise HTTPException(status_code=500, detail="Erro interno do servidor ao calcular previsão")
+
+@app.get("/metricas", include_in_schema=False)
+def get_metricas():
+    """Tempos registrados desde a subida (renderização de templates, ...)."""
+    return {
+        "tempos": metricas.resumo(), "consultas_em_voo": coalescedor.em_voo(),
+        "replicas": database_api.replicas.estado(),
+    }
+
+@app.get("/admin/config", include_in_schema=False)
+def get_configuracao(x_admin_token: Optional[str] = Header(None)):
+    """Mostra a versão e os valores atuais da configuração recarregável."""
+    _verificar_admin(x_admin_token)
+    return {"versao": config.versao, "valores": dict(config.valores)}
+
+@app.post("/admin/config/recarregar", include_in_schema=False)
+def post_recarregar_configuracao(x_admin_token: Optional[str] = Header(None)):
+    """Recarrega calibração e parâmetros de ajuste sem reiniciar o servidor."""
+    _verificar_admin(x_admin_token)
+    try:
+        return _recarregar_configuracao()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,68 @@
+# benchmarks/bench_serializacao.py
+"""Compara os caminhos de serialização do histórico com 100 mil leituras sintéticas.
+
+Uso (da raiz do projeto, com o .env do banco configurado, já que os modelos o importam):
+    python benchmarks/bench_serializacao.py [linhas] [repeticoes]
+"""
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+import serializacao_api  # noqa: E402
+from models_api import LeituraResponse  # noqa: E402
+from serializacao_api import adaptador_lista, lista_para_json, para_json  # noqa: E402
+
+CAMPOS = ("id", "distancia", "nivel", "created_on")
+
+
+def gerar_colunas(n: int) -> dict:
+    inicio = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    distancias = [round(random.uniform(20, 100), 2) for _ in range(n)]
+    return {
+        "id": list(range(1, n + 1)),
+        "distancia": distancias,
+        "nivel": [round((1 - (d - 20) / 80) * 100) for d in distancias],
+        "created_on": [(inicio + timedelta(minutes=i)).isoformat() for i in range(n)],
+    }
+
+
+def medir(nome: str, funcao, repeticoes: int) -> None:
+    tempos = []
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        corpo = funcao()
+        tempos.append(time.perf_counter() - t0)
+    print(f"{nome:<48} {min(tempos) * 1000:9.1f} ms  {len(corpo) / 1e6:6.2f} MB")
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    repeticoes = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    colunas = gerar_colunas(n)
+    linhas = [dict(zip(CAMPOS, valores)) for valores in zip(*(colunas[c] for c in CAMPOS))]
+    adaptador = adaptador_lista(LeituraResponse, CAMPOS)
+    print(f"{n} leituras, melhor de {repeticoes}; orjson {'disponível' if serializacao_api.orjson else 'ausente'}")
+
+    def antigo():
+        # Um modelo por item, jsonable_encoder e json da biblioteca padrão (caminho anterior)
+        modelos = [LeituraResponse(**linha) for linha in linhas]
+        return json.dumps(
+            jsonable_encoder(modelos), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+        ).encode("utf-8")
+
+    medir("modelo por item + jsonable_encoder + json", antigo, repeticoes)
+    medir("dicts + json (sem validação)", lambda: json.dumps(linhas, separators=(",", ":")).encode("utf-8"), repeticoes)
+    medir("TypeAdapter (valida a lista + dump_json)", lambda: lista_para_json(adaptador, linhas), repeticoes)
+    medir("para_json (dicts)", lambda: para_json(linhas), repeticoes)
+    medir("para_json (colunar)", lambda: para_json(colunas), repeticoes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# benchmarks/bench_sessao_leitura.py
+"""Conta as idas ao banco por requisição de leitura: SessionLocal x SessionLeitura x conexão crua.
+
+Um proxy TCP local fica entre o SQLAlchemy e o Postgres e conta as mensagens de
+consulta (protocolo simples 'Q' e estendido 'S'/Sync) enviadas pelo cliente;
+cada uma é uma ida e volta. Também mede o tempo médio por requisição.
+
+Uso (da raiz do projeto, com o .env do banco configurado):
+    python benchmarks/bench_sessao_leitura.py [requisicoes]
+"""
+import asyncio
+import os
+import struct
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import database_api  # noqa: E402
+
+CONSULTA = text("SELECT id, distancia, created_on FROM leituras ORDER BY id DESC LIMIT 1")
+_MENSAGENS_IDA = {b"Q", b"S"}
+
+
+class ProxyContador:
+    """Proxy TCP para o Postgres que conta as mensagens de consulta vindas do cliente."""
+
+    def __init__(self):
+        self.idas = 0
+        self.porta = None
+        self._pronto = threading.Event()
+
+    async def _destino(self):
+        host = database_api.DB_HOST
+        if host:
+            return await asyncio.open_connection(host, int(database_api.DB_PORT or 5432))
+        # Sem DB_HOST o libpq usa o socket unix (PGHOST)
+        soquete = os.path.join(os.getenv("PGHOST", "/tmp"), f".s.PGSQL.{database_api.DB_PORT or 5432}")
+        return await asyncio.open_unix_connection(soquete)
+
+    async def _cliente_para_servidor(self, leitor, escritor):
+        # Inicialização (e SSLRequest) não têm byte de tipo: só comprimento + corpo
+        while True:
+            cabecalho = await leitor.readexactly(8)
+            tamanho, codigo = struct.unpack("!ii", cabecalho)
+            escritor.write(cabecalho + await leitor.readexactly(tamanho - 8))
+            await escritor.drain()
+            if codigo != 80877103:  # SSLRequest: o servidor responde 'N' e vem a inicialização de verdade
+                break
+        while True:
+            tipo = await leitor.readexactly(1)
+            tamanho_bruto = await leitor.readexactly(4)
+            corpo = await leitor.readexactly(struct.unpack("!i", tamanho_bruto)[0] - 4)
+            if tipo in _MENSAGENS_IDA:
+                self.idas += 1
+            escritor.write(tipo + tamanho_bruto + corpo)
+            await escritor.drain()
+
+    async def _copiar(self, leitor, escritor):
+        while dados := await leitor.read(65536):
+            escritor.write(dados)
+            await escritor.drain()
+
+    async def _atender(self, leitor, escritor):
+        leitor_bd, escritor_bd = await self._destino()
+        try:
+            await asyncio.gather(
+                self._cliente_para_servidor(leitor, escritor_bd), self._copiar(leitor_bd, escritor),
+            )
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            escritor.close()
+            escritor_bd.close()
+
+    async def _servir(self):
+        servidor = await asyncio.start_server(self._atender, "127.0.0.1", 0)
+        self.porta = servidor.sockets[0].getsockname()[1]
+        self._pronto.set()
+        async with servidor:
+            await servidor.serve_forever()
+
+    def iniciar(self) -> int:
+        threading.Thread(target=lambda: asyncio.run(self._servir()), daemon=True).start()
+        self._pronto.wait()
+        return self.porta
+
+
+def medir(nome: str, proxy: ProxyContador, requisicao, n: int) -> None:
+    requisicao()  # abre a conexão do pool fora da medição
+    idas_antes = proxy.idas
+    t0 = time.perf_counter()
+    for _ in range(n):
+        requisicao()
+    decorrido = time.perf_counter() - t0
+    print(f"{nome:<44} {(proxy.idas - idas_antes) / n:5.2f} idas/req  {decorrido / n * 1000:7.3f} ms/req")
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    proxy = ProxyContador()
+    porta = proxy.iniciar()
+    url = (
+        f"postgresql://{database_api.DB_USER}:{database_api.DB_PASSWORD}"
+        f"@127.0.0.1:{porta}/{database_api.DB_NAME}"
+    )
+    engine = create_engine(url, pool_size=1)
+    engine_leitura = database_api.criar_engine_leitura(url, pool_size=1)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    SessionLeitura = sessionmaker(autoflush=False, expire_on_commit=False, bind=engine_leitura)
+    print(f"{n} requisições de leitura (uma consulta cada) via proxy em 127.0.0.1:{porta}")
+
+    def sessao_transacional():
+        with SessionLocal() as db:
+            db.execute(CONSULTA).first()
+
+    def sessao_leitura():
+        with SessionLeitura() as db:
+            db.execute(CONSULTA).first()
+
+    def conexao_crua():
+        with engine_leitura.connect() as conexao:
+            conexao.execute(CONSULTA).first()
+
+    medir("SessionLocal (BEGIN + consulta + ROLLBACK)", proxy, sessao_transacional, n)
+    medir("SessionLeitura (autocommit, somente leitura)", proxy, sessao_leitura, n)
+    medir("engine_leitura.connect() (conexão crua)", proxy, conexao_crua, n)
+
+
+if __name__ == "__main__":
+    main()
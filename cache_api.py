@@ -0,0 +1,72 @@
+# cache_api.py
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional
+
+from monitor_api import LeituraNova
+
+
+class CachePorSensor:
+    """Valores derivados das leituras de um sensor, válidos até chegar uma leitura nova dele.
+
+    Cada sensor pode ter várias variantes em cache (ex.: com e sem filtro). Uma
+    geração por sensor evita guardar um valor calculado antes de uma invalidação
+    que aconteceu durante o cálculo. O `sensor_id` vem do cliente, então no
+    máximo `tamanho_maximo` sensores ficam guardados; os mais antigos saem primeiro.
+    """
+
+    def __init__(self, tamanho_maximo: int = 10000):
+        self.tamanho_maximo = tamanho_maximo
+        self._valores: Dict[str, Dict[Hashable, Any]] = {}
+        self._geracoes: Dict[str, int] = {}
+        self._geracao_global = 0
+        self._trava = threading.Lock()
+
+    def em_cache(self, sensor_id: str, variante: Hashable) -> Any:
+        """Retorna o valor guardado, ou None, sem calcular nada."""
+        return self._valores.get(sensor_id, {}).get(variante)
+
+    def obter(self, sensor_id: str, variante: Hashable, gerar: Callable[[], Any]) -> Any:
+        """Retorna o valor em cache ou o calcula com `gerar()` e o guarda."""
+        try:
+            return self._valores[sensor_id][variante]
+        except KeyError:
+            pass
+        geracao = (self._geracao_global, self._geracoes.get(sensor_id, 0))
+        valor = gerar()
+        self._guardar(sensor_id, variante, valor, geracao)
+        return valor
+
+    async def obter_async(self, sensor_id: str, variante: Hashable, gerar: Callable[[], Awaitable[Any]]) -> Any:
+        """Como `obter`, para quando o valor é gerado por uma corrotina."""
+        try:
+            return self._valores[sensor_id][variante]
+        except KeyError:
+            pass
+        geracao = (self._geracao_global, self._geracoes.get(sensor_id, 0))
+        valor = await gerar()
+        self._guardar(sensor_id, variante, valor, geracao)
+        return valor
+
+    def _guardar(self, sensor_id: str, variante: Hashable, valor: Any, geracao: tuple) -> None:
+        with self._trava:
+            if (self._geracao_global, self._geracoes.get(sensor_id, 0)) != geracao:
+                return
+            # Descarta os sensores mais antigos quando o limite é atingido
+            while len(self._valores) >= self.tamanho_maximo and sensor_id not in self._valores:
+                self._valores.pop(next(iter(self._valores)), None)
+            self._valores.setdefault(sensor_id, {})[variante] = valor
+
+    def invalidar(self, sensores: Optional[Iterable[str]] = None) -> None:
+        """Descarta os valores dos sensores informados, ou de todos."""
+        with self._trava:
+            if sensores is None:
+                self._geracao_global += 1
+                self._valores.clear()
+                return
+            for sensor_id in sensores:
+                self._geracoes[sensor_id] = self._geracoes.get(sensor_id, 0) + 1
+                self._valores.pop(sensor_id, None)
+
+    def ao_receber(self, novas: List[LeituraNova]) -> None:
+        """Assinante do monitor: invalida os sensores que receberam leituras."""
+        self.invalidar({leitura.sensor_id for leitura in novas})
@@ -0,0 +1,120 @@
+# calibracao_api.py
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from models_api import Calibracao as CalibracaoSQLAlchemy
+
+
+@dataclass(frozen=True)
+class Calibracao:
+    """Distâncias (em cm) que correspondem ao nível máximo e ao nível mínimo de um sensor, e o volume da caixa."""
+    min_nivel: float
+    max_nivel: float
+    capacidade_litros: Optional[float] = None
+
+    def litros_por_cm(self) -> float:
+        faixa = abs(self.max_nivel - self.min_nivel)
+        return (self.capacidade_litros or 0.0) / faixa if faixa else 0.0
+
+    def nivel(self, distancia: float) -> float:
+        """Nível percentual (0 a 100, sem arredondar) correspondente à distância."""
+        faixa = self.max_nivel - self.min_nivel
+        if faixa == 0:
+            return 0.0
+        return max(0.0, min(100.0, (1 - (distancia - self.min_nivel) / faixa) * 100.0))
+
+
+# Recebe os sensores cuja calibração mudou, ou None quando todos podem ter mudado
+OuvinteCalibracao = Callable[[Optional[Set[str]]], None]
+
+
+class CacheCalibracoes:
+    """Mantém em memória a calibração de cada sensor.
+
+    Sensores sem linha na tabela `calibracoes` usam a calibração padrão; essa
+    ausência também fica em cache, então cada sensor custa no máximo uma
+    consulta até a próxima invalidação.
+    """
+
+    def __init__(self, padrao: Calibracao, fabrica_sessao: Callable[[], Session], tamanho_maximo: int = 10000):
+        self.padrao = padrao
+        self.tamanho_maximo = tamanho_maximo
+        self._fabrica_sessao = fabrica_sessao
+        self._por_sensor: Dict[str, Optional[Calibracao]] = {}
+        self._ouvintes: List[OuvinteCalibracao] = []
+
+    def obter(self, sensor_id: str) -> Calibracao:
+        """Retorna a calibração do sensor, consultando o banco apenas na primeira vez."""
+        try:
+            calibracao = self._por_sensor[sensor_id]
+        except KeyError:
+            calibracao = self._carregar(sensor_id)
+        if calibracao is None:
+            return self.padrao
+        if calibracao.capacidade_litros is None:
+            return Calibracao(calibracao.min_nivel, calibracao.max_nivel, self.padrao.capacidade_litros)
+        return calibracao
+
+    def _carregar(self, sensor_id: str) -> Optional[Calibracao]:
+        with self._fabrica_sessao() as db:
+            linha = db.get(CalibracaoSQLAlchemy, sensor_id)
+            calibracao = self._converter(linha) if linha else None
+        self._guardar(sensor_id, calibracao)
+        return calibracao
+
+    def _guardar(self, sensor_id: str, calibracao: Optional[Calibracao]) -> None:
+        # Descarta as entradas mais antigas quando o limite é atingido
+        while len(self._por_sensor) >= self.tamanho_maximo and sensor_id not in self._por_sensor:
+            self._por_sensor.pop(next(iter(self._por_sensor)), None)
+        self._por_sensor[sensor_id] = calibracao
+
+    def _ler_tabela(self) -> Dict[str, Calibracao]:
+        with self._fabrica_sessao() as db:
+            linhas = db.query(CalibracaoSQLAlchemy).all()
+            return {l.sensor_id: self._converter(l) for l in linhas}
+
+    def _converter(self, linha: CalibracaoSQLAlchemy) -> Calibracao:
+        # Sem capacidade própria, o sensor usa a capacidade padrão
+        return Calibracao(linha.min_nivel, linha.max_nivel, linha.capacidade_litros)
+
+    def carregar_todas(self) -> None:
+        """Carrega a tabela inteira de uma vez (útil na inicialização)."""
+        for sensor_id, calibracao in self._ler_tabela().items():
+            self._guardar(sensor_id, calibracao)
+
+    def recarregar(self) -> Set[str]:
+        """Relê a tabela e invalida só os sensores cuja calibração mudou."""
+        tabela = self._ler_tabela()
+        alterados = {
+            sensor_id for sensor_id, calibracao in list(self._por_sensor.items())
+            if tabela.get(sensor_id) != calibracao
+        }
+        alterados.update(sensor_id for sensor_id in tabela if sensor_id not in self._por_sensor)
+        for sensor_id in alterados:
+            self._guardar(sensor_id, tabela.get(sensor_id))
+        if alterados:
+            self._notificar(alterados)
+        return alterados
+
+    def definir_padrao(self, padrao: Calibracao) -> None:
+        """Troca a calibração padrão, afetando todos os sensores sem calibração própria."""
+        if padrao != self.padrao:
+            self.padrao = padrao
+            self._notificar(None)
+
+    def ao_alterar(self, ouvinte: OuvinteCalibracao) -> None:
+        """Registra uma função chamada quando a calibração de algum sensor muda."""
+        self._ouvintes.append(ouvinte)
+
+    def _notificar(self, sensores: Optional[Set[str]]) -> None:
+        for ouvinte in self._ouvintes:
+            ouvinte(sensores)
+
+    def invalidar(self, sensor_id: Optional[str] = None) -> None:
+        """Descarta a calibração de um sensor, ou de todos se nenhum for informado."""
+        if sensor_id is None:
+            self._por_sensor.clear()
+        else:
+            self._por_sensor.pop(sensor_id, None)
@@ -0,0 +1,68 @@
+# coalescencia_api.py
+import asyncio
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+
+class Coalescedor:
+    """Agrupa chamadas concorrentes idênticas em uma única execução (single-flight).
+
+    A primeira requisição de uma chave dispara a função em uma thread do pool
+    (ou no próprio loop, se for uma corrotina); as seguintes aguardam o mesmo resultado (ou a mesma exceção). Cada espera
+    tem um timeout próprio, definido por prefixo de chave.
+    """
+
+    def __init__(self, timeout_padrao: float = 30.0):
+        self.timeout_padrao = timeout_padrao
+        self._timeouts: Dict[Hashable, float] = {}
+        self._em_voo: Dict[Hashable, asyncio.Future] = {}
+        self._tarefas: Set[asyncio.Task] = set()
+
+    def definir_timeout(self, prefixo: Hashable, segundos: float) -> None:
+        """Define o timeout de espera para as chaves que começam com `prefixo`."""
+        self._timeouts[prefixo] = segundos
+
+    def _timeout_da_chave(self, chave: Hashable) -> float:
+        prefixo = chave[0] if isinstance(chave, tuple) and chave else chave
+        return self._timeouts.get(prefixo, self.timeout_padrao)
+
+    async def executar(self, chave: Hashable, funcao: Callable[..., Any], *args: Any, timeout: Optional[float] = None) -> Any:
+        """Executa `funcao(*args)` uma única vez por chave entre as chamadas concorrentes."""
+        futuro = self._em_voo.get(chave)
+        if futuro is None:
+            futuro = asyncio.get_running_loop().create_future()
+            # Marca a exceção como consumida mesmo se todos os aguardantes desistirem por timeout
+            futuro.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._em_voo[chave] = futuro
+            tarefa = asyncio.create_task(self._liderar(chave, futuro, funcao, args))
+            self._tarefas.add(tarefa)
+            tarefa.add_done_callback(self._tarefas.discard)
+
+        espera = self._timeout_da_chave(chave) if timeout is None else timeout
+        # shield: o timeout de um aguardante não cancela a consulta dos demais
+        return await asyncio.wait_for(asyncio.shield(futuro), espera)
+
+    async def _liderar(self, chave: Hashable, futuro: asyncio.Future, funcao: Callable[..., Any], args: Tuple) -> None:
+        try:
+            if asyncio.iscoroutinefunction(funcao):
+                resultado = await funcao(*args)
+            else:
+                resultado = await run_in_threadpool(funcao, *args)
+        except asyncio.CancelledError:
+            futuro.cancel()
+            raise
+        except Exception as e:
+            if not futuro.done():
+                futuro.set_exception(e)
+        else:
+            if not futuro.done():
+                futuro.set_result(resultado)
+        finally:
+            # Remove a chave antes de acordar os aguardantes: novas chamadas fazem nova consulta
+            if self._em_voo.get(chave) is futuro:
+                del self._em_voo[chave]
+
+    def em_voo(self) -> int:
+        """Quantidade de chaves com consulta em andamento."""
+        return len(self._em_voo)
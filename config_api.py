@@ -0,0 +1,107 @@
+# config_api.py
+import os
+import threading
+from types import MappingProxyType
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+from dotenv import dotenv_values, find_dotenv
+
+
+def _booleano(valor: str) -> bool:
+    return str(valor).strip().lower() in ("1", "true", "sim", "yes", "on")
+
+def _texto(valor: str) -> str:
+    return str(valor).strip()
+
+def _inteiro_opcional(valor: str) -> Optional[int]:
+    return int(valor) if _texto(valor) else None
+
+# Parâmetros recarregáveis: nome -> (conversor, valor padrão)
+PARAMETROS: Dict[str, Tuple[Callable[[str], Any], Optional[str]]] = {
+    "MIN_NIVEL": (float, None),
+    "MAX_NIVEL": (float, None),
+    "CAPACIDADE_LITROS": (float, "1000"),
+    "COALESCENCIA_TIMEOUT_SEGUNDOS": (float, "30"),
+    "COALESCENCIA_TIMEOUT_ULTIMA_SEGUNDOS": (float, "5"),
+    "CALIBRACAO_CACHE_MAX": (int, "10000"),
+    "SENSORES_CACHE_MAX": (int, "10000"),
+    "DB_POOL_SIZE": (int, "5"),
+    "DB_MAX_OVERFLOW": (int, "10"),
+    # Vazio: o pool de leitura tem o tamanho de DB_POOL_SIZE
+    "DB_POOL_SIZE_LEITURA": (_inteiro_opcional, ""),
+    "DB_ECHO": (_booleano, "true"),
+    "LOG_LEVEL": (lambda v: _texto(v).upper(), "INFO"),
+    "MONITOR_INTERVALO_SEGUNDOS": (float, "5"),
+    "FILTRO_JANELA_MEDIANA": (int, "5"),
+    "FILTRO_ALFA_EMA": (float, "0.3"),
+    "FILTRO_KALMAN_Q": (float, "0.01"),
+    "FILTRO_KALMAN_R": (float, "1.0"),
+    "FILTRO_LIMIAR_OUTLIER_CM": (float, "10"),
+    "PREVISAO_JANELA_HORAS": (float, "6"),
+    "ESTATISTICAS_DIAS_EXATO": (float, "7"),
+    "EVENTO_HISTERESE_CM": (float, "1"),
+    "EVENTO_REABASTECIMENTO_MIN_CM": (float, "3"),
+    "EVENTO_DRENAGEM_CM_H": (float, "10"),
+    "EVENTO_DURACAO_MINIMA_MINUTOS": (float, "10"),
+    "EVENTO_NIVEL_VAZIO": (float, "5"),
+    "ALERTA_WEBHOOK_URL": (_texto, ""),
+}
+
+Ouvinte = Callable[["ConfiguracaoRuntime", FrozenSet[str]], None]
+
+
+class ConfiguracaoRuntime:
+    """Configuração em memória, versionada e recarregável sem reiniciar o processo.
+
+    Cada recarga relê o .env, compara com a versão atual e notifica apenas os
+    ouvintes registrados para os parâmetros que mudaram.
+    """
+
+    def __init__(self, parametros: Mapping[str, Tuple[Callable[[str], Any], Optional[str]]] = PARAMETROS, caminho_env: Optional[str] = None):
+        self._parametros = dict(parametros)
+        self._caminho_env = caminho_env or find_dotenv(usecwd=True)
+        self._ouvintes: List[Tuple[FrozenSet[str], Ouvinte]] = []
+        self._trava = threading.Lock()
+        self.versao = 1
+        self.valores: Mapping[str, Any] = MappingProxyType(self._ler(primeira_carga=True))
+
+    def _ler(self, primeira_carga: bool = False) -> Dict[str, Any]:
+        # Na inicialização o ambiente do processo tem prioridade (como no load_dotenv);
+        # nas recargas vale o que estiver no arquivo, que é o que o operador edita.
+        arquivo = dotenv_values(self._caminho_env) if self._caminho_env else {}
+        valores = {}
+        for nome, (conversor, padrao) in self._parametros.items():
+            bruto = os.getenv(nome) if primeira_carga else None
+            if bruto is None:
+                bruto = arquivo.get(nome)
+            if bruto is None:
+                bruto = os.getenv(nome, padrao)
+            if bruto is None:
+                raise ValueError(f"Parâmetro de configuração obrigatório não definido: {nome}")
+            valores[nome] = conversor(bruto)
+        return valores
+
+    def obter(self, nome: str) -> Any:
+        return self.valores[nome]
+
+    def ao_alterar(self, nomes: Iterable[str], ouvinte: Ouvinte) -> None:
+        """Registra `ouvinte` para ser chamado quando algum dos parâmetros `nomes` mudar."""
+        self._ouvintes.append((frozenset(nomes), ouvinte))
+
+    def recarregar(self) -> FrozenSet[str]:
+        """Relê a configuração e devolve o conjunto de parâmetros alterados."""
+        with self._trava:
+            novos = self._ler()
+            alterados = frozenset(nome for nome, valor in novos.items() if self.valores.get(nome) != valor)
+            if not alterados:
+                return alterados
+            self.valores = MappingProxyType(novos)
+            self.versao += 1
+
+        for nomes, ouvinte in self._ouvintes:
+            if nomes & alterados:
+                try:
+                    ouvinte(self, alterados)
+                except Exception as e:
+                    print(f"[Config] Erro ao aplicar alteração de {sorted(nomes & alterados)}: {e}")
+        return alterados
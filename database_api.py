@@ -1,11 +1,13 @@
 # database_api.py
 from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from typing import Optional
 import sys
 import os
 from dotenv import load_dotenv
 
+from replicas_api import Replicas
+
 load_dotenv()
 
 DB_NAME = os.getenv("DB_NAME")
@@ -13,23 +15,87 @@ DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_HOST = os.getenv("DB_HOST")
 DB_PORT = os.getenv("DB_PORT")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_ECHO = os.getenv("DB_ECHO", "true").strip().lower() in ("1", "true", "sim", "yes", "on")
+# Pool separado das conexões somente leitura (GETs); por padrão, do mesmo tamanho
+DB_POOL_SIZE_LEITURA = int(os.getenv("DB_POOL_SIZE_LEITURA") or DB_POOL_SIZE)
+# Réplicas de leitura, separadas por vírgula: URL completa ou host[:porta] com as credenciais do primário
+DB_REPLICAS = [item.strip() for item in os.getenv("DB_REPLICAS", "").split(",") if item.strip()]
+DB_REPLICA_ESTRATEGIA = os.getenv("DB_REPLICA_ESTRATEGIA", "round_robin")  # ou menos_conexoes
+DB_REPLICA_ATRASO_MAXIMO_SEGUNDOS = float(os.getenv("DB_REPLICA_ATRASO_MAXIMO_SEGUNDOS", "5"))
+DB_REPLICA_INTERVALO_SEGUNDOS = float(os.getenv("DB_REPLICA_INTERVALO_SEGUNDOS", "5"))
+# Réplica sem mensagem do primário por mais que isso é considerada desconectada
+DB_REPLICA_SILENCIO_MAXIMO_SEGUNDOS = float(os.getenv("DB_REPLICA_SILENCIO_MAXIMO_SEGUNDOS", "60"))
 
 SQLALCHEMY_DATABASE_URL = f'postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
 
-# echo=True é útil para debug, loga as queries SQL. Remova em produção.
-engine = create_engine(SQLALCHEMY_DATABASE_URL, echo=True)
+# echo=True é útil para debug, loga as queries SQL. Desative (DB_ECHO=false) em produção.
+engine = create_engine(SQLALCHEMY_DATABASE_URL, echo=DB_ECHO, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
+# Somente leitura: em autocommit não há BEGIN nem ROLLBACK por requisição (só a própria consulta
+# vai ao banco), e a sessão do Postgres já nasce com default_transaction_read_only, sem SET extra.
+# transacional=True mantém o BEGIN, exigido pelos cursores nomeados (yield_per) das exportações.
+def criar_engine_leitura(url: str, transacional: bool = False, **opcoes):
+    if not transacional:
+        opcoes["isolation_level"] = "AUTOCOMMIT"
+    return create_engine(url, connect_args={"options": "-c default_transaction_read_only=on"}, **opcoes)
+
+engine_leitura = criar_engine_leitura(
+    SQLALCHEMY_DATABASE_URL, echo=DB_ECHO, pool_size=DB_POOL_SIZE_LEITURA, max_overflow=DB_MAX_OVERFLOW
+)
+
+def _url_replica(item: str) -> str:
+    if "://" in item:
+        return item
+    host, _, porta = item.partition(":")
+    return f'postgresql://{DB_USER}:{DB_PASSWORD}@{host}:{porta or DB_PORT}/{DB_NAME}'
+
+replicas = Replicas(
+    [_url_replica(item) for item in DB_REPLICAS], criar_engine_leitura,
+    estrategia=DB_REPLICA_ESTRATEGIA, atraso_maximo=DB_REPLICA_ATRASO_MAXIMO_SEGUNDOS,
+    intervalo_segundos=DB_REPLICA_INTERVALO_SEGUNDOS, silencio_maximo=DB_REPLICA_SILENCIO_MAXIMO_SEGUNDOS,
+    echo=DB_ECHO, pool_size=DB_POOL_SIZE_LEITURA, max_overflow=DB_MAX_OVERFLOW,
+)
+
+class SessaoLeitura(Session):
+    """Sessão somente leitura: vai para uma réplica em dia ou, sem nenhuma, para o primário.
+
+    `recente=True` força o primário, para quem não pode ver dados atrasados
+    (última leitura, snapshot, buscas incrementais). `transacional=True` abre
+    transação, para cursores nomeados (yield_per) das exportações: na réplica,
+    ainda somente leitura; sem réplica em dia, no engine principal.
+    """
+
+    def __init__(self, *args, recente: bool = False, transacional: bool = False, **kwargs):
+        replica = None if recente else replicas.escolher(transacional)
+        if replica is not None:
+            kwargs["bind"] = replica
+        elif transacional:
+            kwargs["bind"] = engine
+        super().__init__(*args, **kwargs)
+
+SessionLeitura = sessionmaker(class_=SessaoLeitura, autoflush=False, expire_on_commit=False, bind=engine_leitura)
 
-# Função para obter uma sessão do banco de dados (usada como dependência no FastAPI)
-def get_db_session():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Troca o pool de conexões em tempo de execução (usada na recarga de configuração)
+def reconfigurar_pool(pool_size: int, max_overflow: int, pool_size_leitura: Optional[int] = None):
+    global engine, engine_leitura
+    # Sem tamanho próprio, o pool de leitura (e o de cada réplica) acompanha o do primário
+    pool_size_leitura = pool_size_leitura or pool_size
+    antigo, antigo_leitura = engine, engine_leitura
+    engine = create_engine(SQLALCHEMY_DATABASE_URL, echo=antigo.echo, pool_size=pool_size, max_overflow=max_overflow)
+    engine_leitura = criar_engine_leitura(
+        SQLALCHEMY_DATABASE_URL, echo=antigo_leitura.echo, pool_size=pool_size_leitura, max_overflow=max_overflow
+    )
+    SessionLocal.configure(bind=engine)
+    SessionLeitura.configure(bind=engine_leitura)
+    replicas.reconfigurar(pool_size=pool_size_leitura, max_overflow=max_overflow)
+    # Fecha as conexões ociosas; as que estão em uso são descartadas quando devolvidas
+    antigo.dispose()
+    antigo_leitura.dispose()
+    print(f"[DatabaseAPI] Pool reconfigurado: pool_size={pool_size} (leitura {pool_size_leitura}), max_overflow={max_overflow}.")
 
 # Tente conectar para verificar se o engine foi criado corretamente (opcional, falha cedo)
 try:
@@ -0,0 +1,161 @@
+# estaticos_api.py
+import gzip
+import hashlib
+import mimetypes
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass, field
+from typing import Dict, Mapping, Optional
+
+from fastapi.responses import FileResponse, Response
+
+# brotli é opcional: sem ele, só a variante gzip é gerada
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# URL com hash do conteúdo nunca muda de conteúdo; sem hash, o navegador revalida de hora em hora
+CACHE_IMUTAVEL = "public, max-age=31536000, immutable"
+CACHE_SEM_HASH = "public, max-age=3600"
+
+_TIPOS_COMPRIMIVEIS = (
+    "text/", "application/javascript", "application/json", "image/svg+xml", "image/x-icon", "image/vnd.microsoft.icon",
+)
+
+# Ordem de preferência quando o cliente aceita mais de uma
+_CODIFICACOES = ("br", "gzip")
+
+
+@dataclass
+class Variante:
+    """Uma codificação do arquivo: em memória (`conteudo`) ou no disco (`caminho`)."""
+    etag: str
+    conteudo: Optional[bytes] = None
+    caminho: Optional[str] = None
+
+
+@dataclass
+class Ativo:
+    nome: str
+    url: str
+    tipo: str
+    variantes: Dict[str, Variante] = field(default_factory=dict)
+
+
+def codificacoes_aceitas(accept_encoding: str) -> set:
+    """Codificações do Accept-Encoding, menos as recusadas com q=0."""
+    aceitas = set()
+    for item in accept_encoding.split(","):
+        nome, _, parametros = item.partition(";")
+        chave, _, valor = parametros.partition("=")
+        try:
+            recusada = chave.strip() == "q" and float(valor) == 0
+        except ValueError:
+            recusada = False
+        if not recusada:
+            aceitas.add(nome.strip().lower())
+    return aceitas
+
+
+class Estaticos:
+    """Arquivos de `static/` (favicon, CSS, JS do dashboard) servidos com URL versionada pelo hash.
+
+    Na subida, cada arquivo é lido, recebe uma URL `/static/nome.<hash>.ext` e
+    ganha variantes .gz/.br pré-comprimidas. Arquivos até `limite_memoria` bytes
+    ficam em memória; os maiores (e suas variantes) são servidos do disco, com as
+    variantes num diretório temporário próprio que `fechar` remove.
+    """
+
+    def __init__(self, diretorio: str, prefixo: str = "/static", limite_memoria: int = 256 * 1024):
+        self.diretorio = diretorio
+        self.prefixo = prefixo
+        self.limite_memoria = limite_memoria
+        self._por_nome: Dict[str, Ativo] = {}
+        self._por_nome_versionado: Dict[str, Ativo] = {}
+        self._diretorio_variantes: Optional[str] = None
+
+    def carregar(self) -> None:
+        por_nome, por_nome_versionado = {}, {}
+        for raiz, _, arquivos in os.walk(self.diretorio):
+            for arquivo in sorted(arquivos):
+                caminho = os.path.join(raiz, arquivo)
+                nome = os.path.relpath(caminho, self.diretorio).replace(os.sep, "/")
+                ativo, nome_versionado = self._preparar(nome, caminho)
+                por_nome[nome] = ativo
+                por_nome_versionado[nome_versionado] = ativo
+        self._por_nome, self._por_nome_versionado = por_nome, por_nome_versionado
+        print(f"[Estaticos] {len(por_nome)} arquivos carregados de '{self.diretorio}'.")
+
+    def _preparar(self, nome: str, caminho: str):
+        with open(caminho, "rb") as f:
+            conteudo = f.read()
+        resumo = hashlib.blake2b(conteudo, digest_size=6).hexdigest()
+        base, extensao = os.path.splitext(nome)
+        nome_versionado = f"{base}.{resumo}{extensao}"
+        tipo = mimetypes.guess_type(nome)[0] or "application/octet-stream"
+        ativo = Ativo(nome=nome, url=f"{self.prefixo}/{nome_versionado}", tipo=tipo)
+
+        em_memoria = len(conteudo) <= self.limite_memoria
+        ativo.variantes["identity"] = Variante(
+            etag=f'"{resumo}"', conteudo=conteudo if em_memoria else None, caminho=None if em_memoria else caminho,
+        )
+        if tipo.startswith(_TIPOS_COMPRIMIVEIS):
+            comprimidos = {"gzip": gzip.compress(conteudo, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                comprimidos["br"] = brotli.compress(conteudo, quality=11)
+            for codificacao, dados in comprimidos.items():
+                # Só vale a pena se economizar pelo menos 10%
+                if len(dados) > 0.9 * len(conteudo):
+                    continue
+                variante = Variante(etag=f'"{resumo}-{codificacao}"')
+                if em_memoria:
+                    variante.conteudo = dados
+                else:
+                    variante.caminho = self._gravar_variante(nome_versionado, codificacao, dados)
+                ativo.variantes[codificacao] = variante
+        return ativo, nome_versionado
+
+    def _gravar_variante(self, nome_versionado: str, codificacao: str, dados: bytes) -> str:
+        if self._diretorio_variantes is None:
+            self._diretorio_variantes = tempfile.mkdtemp(prefix="estaticos_")
+        destino = os.path.join(self._diretorio_variantes, f"{nome_versionado.replace('/', '_')}.{codificacao}")
+        with open(destino, "wb") as f:
+            f.write(dados)
+        return destino
+
+    def fechar(self) -> None:
+        """Apaga as variantes gravadas no disco (no desligamento da aplicação)."""
+        if self._diretorio_variantes is not None:
+            shutil.rmtree(self._diretorio_variantes, ignore_errors=True)
+            self._diretorio_variantes = None
+
+    def url(self, nome: str) -> str:
+        """URL versionada do arquivo (para os templates); sem o arquivo, a URL simples."""
+        ativo = self._por_nome.get(nome)
+        return ativo.url if ativo else f"{self.prefixo}/{nome}"
+
+    def responder(self, nome: str, cabecalhos: Mapping[str, str]) -> Optional[Response]:
+        """Resposta para `nome` (versionado ou não), ou None se o arquivo não existe."""
+        ativo = self._por_nome_versionado.get(nome)
+        cache = CACHE_IMUTAVEL
+        if ativo is None:
+            ativo, cache = self._por_nome.get(nome), CACHE_SEM_HASH
+        if ativo is None:
+            return None
+
+        aceitas = codificacoes_aceitas(cabecalhos.get("accept-encoding", ""))
+        codificacao = next((c for c in _CODIFICACOES if c in aceitas and c in ativo.variantes), "identity")
+        variante = ativo.variantes[codificacao]
+        resposta_cabecalhos = {"Cache-Control": cache, "ETag": variante.etag}
+        if len(ativo.variantes) > 1:
+            resposta_cabecalhos["Vary"] = "Accept-Encoding"
+        if codificacao != "identity":
+            resposta_cabecalhos["Content-Encoding"] = codificacao
+
+        if cabecalhos.get("if-none-match") == variante.etag:
+            return Response(status_code=304, headers=resposta_cabecalhos)
+        if variante.conteudo is not None:
+            return Response(content=variante.conteudo, media_type=ativo.tipo, headers=resposta_cabecalhos)
+        return FileResponse(variante.caminho, media_type=ativo.tipo, headers=resposta_cabecalhos)
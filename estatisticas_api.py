@@ -0,0 +1,143 @@
+# estatisticas_api.py
+import math
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Sequence
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY, DOUBLE_PRECISION
+from sqlalchemy.orm import Session
+
+from calibracao_api import Calibracao
+from rollups_api import SQL_INDICE_SKETCH, alinhar, novo_sketch
+
+# Mesma conta de _calcular_nivel_percentual (api.py), feita no banco e sem arredondar
+_SQL_NIVEL = """
+    CASE WHEN CAST(:max_nivel AS double precision) = :min_nivel THEN 0
+         ELSE greatest(0.0, least(100.0, (1 - (distancia - :min_nivel) / (:max_nivel - :min_nivel)) * 100.0))
+    END
+"""
+
+_SQL_ESTATISTICAS = text(f"""
+    SELECT count(*) AS n,
+           min(distancia), max(distancia), avg(distancia), stddev_samp(distancia),
+           percentile_cont(:percentis) WITHIN GROUP (ORDER BY distancia),
+           min(nivel), max(nivel), avg(nivel), stddev_samp(nivel),
+           percentile_cont(:percentis) WITHIN GROUP (ORDER BY nivel)
+    FROM (
+        SELECT distancia, {_SQL_NIVEL} AS nivel
+        FROM leituras
+        WHERE sensor_id = :sensor_id AND created_on >= :inicio AND created_on < :fim
+    ) l
+""").bindparams(bindparam("percentis", type_=ARRAY(DOUBLE_PRECISION)))
+
+
+# Trechos da janela que não cobrem uma hora inteira vêm das leituras brutas
+_SQL_BORDAS = """
+    sensor_id = :sensor_id
+    AND ((created_on >= :inicio AND created_on < :inicio_cheio) OR (created_on >= :fim_cheio AND created_on < :fim))
+"""
+
+_SQL_SOMAS_APROXIMADAS = text(f"""
+    SELECT coalesce(sum(n), 0), min(mn), max(mx), sum(s), sum(sq) FROM (
+        SELECT n, distancia_min AS mn, distancia_max AS mx, distancia_soma AS s, distancia_soma_quadrados AS sq
+        FROM leituras_rollup_hora
+        WHERE sensor_id = :sensor_id AND bucket >= :inicio_cheio AND bucket < :fim_cheio
+        UNION ALL
+        SELECT 1, distancia, distancia, distancia, distancia * distancia
+        FROM leituras
+        WHERE {_SQL_BORDAS}
+    ) x
+""")
+
+# Junta, no próprio banco, os sketches horários da janela e as bordas em um só histograma
+_SQL_SKETCH_MESCLADO = text(f"""
+    SELECT indice, sum(c) FROM (
+        SELECT s.key AS indice, CAST(s.value AS bigint) AS c
+        FROM leituras_rollup_hora r, jsonb_each_text(r.sketch) s
+        WHERE r.sensor_id = :sensor_id AND r.bucket >= :inicio_cheio AND r.bucket < :fim_cheio
+        UNION ALL
+        SELECT {SQL_INDICE_SKETCH}, 1
+        FROM leituras
+        WHERE {_SQL_BORDAS}
+    ) x
+    GROUP BY indice
+""")
+
+
+def rotulo_percentil(p: float) -> str:
+    """0.5 -> 'p50', 0.999 -> 'p99.9'."""
+    return f"p{round(p * 100, 4):g}"
+
+
+def _resumo(minimo, maximo, media, desvio, valores_percentis, percentis: Sequence[float]) -> Dict[str, Any]:
+    return {
+        "min": minimo,
+        "max": maximo,
+        "media": media,
+        "desvio_padrao": desvio,
+        "percentis": {rotulo_percentil(p): v for p, v in zip(percentis, valores_percentis or [])},
+    }
+
+
+def consultar_estatisticas(
+    db: Session, sensor_id: str, inicio: datetime, fim: datetime, percentis: List[float], calibracao: Calibracao
+) -> Dict[str, Any]:
+    """Agrega a janela inteiramente no Postgres; só o resumo volta para a API."""
+    linha = db.execute(_SQL_ESTATISTICAS, {
+        "sensor_id": sensor_id, "inicio": inicio, "fim": fim, "percentis": percentis,
+        "min_nivel": calibracao.min_nivel, "max_nivel": calibracao.max_nivel,
+    }).one()
+    return {
+        "leituras": linha[0],
+        "distancia": _resumo(*linha[1:6], percentis),
+        "nivel": _resumo(*linha[6:11], percentis),
+    }
+
+
+def consultar_estatisticas_aproximadas(
+    db: Session, sensor_id: str, inicio: datetime, fim: datetime, percentis: List[float], calibracao: Calibracao
+) -> Dict[str, Any]:
+    """Resumo a partir dos rollups horários e dos sketches de quantis, com custo O(horas da janela).
+
+    Mínimo, máximo, média e desvio da distância são exatos; os percentis (e a
+    média e o desvio do nível) têm erro relativo limitado pela precisão do sketch.
+    """
+    inicio_cheio = alinhar(inicio, 3600)
+    if inicio_cheio < inicio:
+        inicio_cheio += timedelta(hours=1)
+    fim_cheio = max(alinhar(fim, 3600), inicio_cheio)
+    parametros = {
+        "sensor_id": sensor_id, "inicio": inicio, "fim": fim,
+        "inicio_cheio": inicio_cheio, "fim_cheio": fim_cheio, "ln_gama": novo_sketch().ln_gama,
+    }
+    n, minimo, maximo, soma, soma_quadrados = db.execute(_SQL_SOMAS_APROXIMADAS, parametros).one()
+    sketch = novo_sketch()
+    sketch.mesclar(db.execute(_SQL_SKETCH_MESCLADO, parametros).all())
+
+    media = soma / n if n else None
+    desvio = math.sqrt(max(0.0, (soma_quadrados - soma * soma / n) / (n - 1))) if n > 1 else None
+
+    # O nível é função monótona da distância: o percentil p do nível sai do percentil 1 - p (ou p) da distância
+    decrescente = calibracao.max_nivel >= calibracao.min_nivel
+    quantis = sketch.quantis(list(percentis) + [1 - p for p in percentis])
+    percentis_distancia = [quantis[p] for p in percentis] if sketch.n else None
+    percentis_nivel = None
+    if sketch.n:
+        percentis_nivel = [calibracao.nivel(quantis[1 - p if decrescente else p]) for p in percentis]
+
+    nivel_media = nivel_desvio = None
+    if sketch.n:
+        pares = [(calibracao.nivel(valor), contagem) for valor, contagem in sketch.buckets()]
+        nivel_media = sum(v * c for v, c in pares) / sketch.n
+        if sketch.n > 1:
+            nivel_desvio = math.sqrt(sum(c * (v - nivel_media) ** 2 for v, c in pares) / (sketch.n - 1))
+
+    nivel_min = nivel_max = None
+    if n:
+        extremos = (calibracao.nivel(minimo), calibracao.nivel(maximo))
+        nivel_min, nivel_max = min(extremos), max(extremos)
+    return {
+        "leituras": n,
+        "distancia": _resumo(minimo, maximo, media, desvio, percentis_distancia, percentis),
+        "nivel": _resumo(nivel_min, nivel_max, nivel_media, nivel_desvio, percentis_nivel, percentis),
+    }
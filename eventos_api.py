@@ -0,0 +1,385 @@
+# eventos_api.py
+import threading
+from collections import deque
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from sqlalchemy import asc, inspect, or_, text
+from sqlalchemy.orm import Session
+
+from calibracao_api import Calibracao
+from filtros_api import FiltroBase
+from models_api import Evento as EventoSQLAlchemy, Leitura as LeituraSQLAlchemy
+from monitor_api import LeituraNova
+
+# Mesma chave (sensor, tipo, início) = mesmo evento: reprocessar leituras só completa o fim
+_SQL_GRAVAR_EVENTO = text("""
+    INSERT INTO eventos (sensor_id, tipo, inicio, fim, distancia_inicio, distancia_fim)
+    VALUES (:sensor_id, :tipo, :inicio, :fim, :distancia_inicio, :distancia_fim)
+    ON CONFLICT (sensor_id, tipo, inicio) DO UPDATE SET
+        fim = excluded.fim,
+        distancia_inicio = excluded.distancia_inicio,
+        distancia_fim = excluded.distancia_fim
+""")
+
+# Ponto de retomada do detector: o início do evento em aberto mais antigo ou o fim do último evento
+_SQL_PONTO_RETOMADA = text("""
+    SELECT coalesce(min(inicio) FILTER (WHERE fim IS NULL), max(fim)) FROM eventos WHERE sensor_id = :sensor_id
+""")
+
+_SQL_APAGAR_ABERTOS = text("DELETE FROM eventos WHERE sensor_id = :sensor_id AND fim IS NULL")
+
+# (instante, último instante perto dele, distância, recordes (instante, distância) a menos de meia histerese)
+Extremo = Tuple[datetime, datetime, float, deque]
+
+
+@dataclass(frozen=True)
+class ParametrosEventos:
+    histerese_cm: float
+    reabastecimento_min_cm: float
+    drenagem_cm_h: float
+    duracao_minima: timedelta
+    nivel_vazio: float
+    lacuna: timedelta
+
+    @classmethod
+    def da_configuracao(cls, valores: Mapping[str, float], lacuna_minutos: float) -> "ParametrosEventos":
+        return cls(
+            histerese_cm=valores["EVENTO_HISTERESE_CM"],
+            reabastecimento_min_cm=valores["EVENTO_REABASTECIMENTO_MIN_CM"],
+            drenagem_cm_h=valores["EVENTO_DRENAGEM_CM_H"],
+            duracao_minima=timedelta(minutes=valores["EVENTO_DURACAO_MINIMA_MINUTOS"]),
+            nivel_vazio=valores["EVENTO_NIVEL_VAZIO"],
+            lacuna=timedelta(minutes=lacuna_minutos),
+        )
+
+
+@dataclass(frozen=True)
+class Evento:
+    """Evento detectado; sem `fim`, ainda está em andamento."""
+    sensor_id: str
+    tipo: str
+    inicio: datetime
+    distancia_inicio: float
+    fim: Optional[datetime] = None
+    distancia_fim: Optional[float] = None
+
+    def encerrar(self, instante: datetime, distancia: float) -> "Evento":
+        return replace(self, fim=instante, distancia_fim=distancia)
+
+
+class DetectorEventos:
+    """Detecta eventos na sequência de leituras de um sensor, uma leitura por vez.
+
+    As distâncias passam antes por uma mediana móvel, então picos isolados não
+    abrem eventos. Depois:
+
+    - reabastecimento: trecho de queda da distância num zigue-zague com histerese
+      (o trecho só termina quando a distância volta a subir `histerese_cm`), com
+      queda total de pelo menos `reabastecimento_min_cm`;
+    - drenagem: distância subindo a `drenagem_cm_h` ou mais, medida sobre os
+      últimos `duracao_minima`; termina quando a taxa cai abaixo da metade;
+    - vazio: nível em até `nivel_vazio`% por pelo menos `duracao_minima`;
+      termina quando o nível passa de `nivel_vazio` mais a histerese.
+
+    Um intervalo sem leituras maior que `lacuna` encerra os eventos abertos na
+    última leitura anterior a ele. Eventos abertos são devolvidos ao começar e
+    de novo, com o fim, ao terminar.
+    """
+
+    def __init__(self, sensor_id: str, parametros: ParametrosEventos, calibracao: Calibracao, filtro: FiltroBase):
+        self.sensor_id = sensor_id
+        self.p = parametros
+        self.calibracao = calibracao
+        self._filtro = filtro
+        self._ultimo: Optional[Tuple[datetime, float]] = None
+        self._reiniciar()
+
+    def _reiniciar(self) -> None:
+        # Zigue-zague: direção do trecho atual e seus extremos (ver Extremo)
+        self._direcao = 0
+        self._origem: Optional[Extremo] = None
+        self._extremo: Optional[Extremo] = None
+        self._minimo: Optional[Extremo] = None
+        self._maximo: Optional[Extremo] = None
+        self._reabastecimento: Optional[Evento] = None
+        # Drenagem: pontos dos últimos `duracao_minima` (mais um anterior a eles)
+        self._janela: deque = deque()
+        self._drenagem: Optional[Evento] = None
+        # Vazio
+        self._vazio_desde: Optional[Tuple[datetime, float]] = None
+        self._vazio: Optional[Evento] = None
+
+    def adicionar(self, instante: datetime, distancia: float) -> List[Evento]:
+        """Processa uma leitura e retorna os eventos abertos ou encerrados por ela."""
+        eventos: List[Evento] = []
+        if self._ultimo is not None and instante - self._ultimo[0] > self.p.lacuna:
+            eventos += self._interromper()
+        d = self._filtro.atualizar(distancia)
+        self._ultimo = (instante, d)
+        eventos += self._zigue_zague(instante, d)
+        eventos += self._verificar_drenagem(instante, d)
+        eventos += self._verificar_vazio(instante, d)
+        return eventos
+
+    def _interromper(self) -> List[Evento]:
+        instante, d = self._ultimo
+        eventos = []
+        if self._reabastecimento is not None:
+            eventos.append(self._reabastecimento.encerrar(self._extremo[0], self._extremo[2]))
+        for aberto in (self._drenagem, self._vazio):
+            if aberto is not None:
+                eventos.append(aberto.encerrar(instante, d))
+        self._reiniciar()
+        return eventos
+
+    # --- REABASTECIMENTO ---
+
+    def _zigue_zague(self, instante: datetime, d: float) -> List[Evento]:
+        if self._origem is None:
+            self._minimo, self._maximo = self._novo_extremo(instante, d), self._novo_extremo(instante, d)
+            self._origem = self._minimo
+            return []
+        if self._direcao == 0:
+            # Ainda sem tendência: o trecho começa no extremo de onde a distância se afastou
+            self._minimo = self._estender(self._minimo, instante, d, -1)
+            self._maximo = self._estender(self._maximo, instante, d, 1)
+            if d - self._minimo[2] >= self.p.histerese_cm:
+                self._direcao, self._origem = 1, self._minimo
+            elif self._maximo[2] - d >= self.p.histerese_cm:
+                self._direcao, self._origem = -1, self._maximo
+            else:
+                return []
+            self._extremo = self._novo_extremo(instante, d)
+            return self._abrir_reabastecimento()
+
+        if (self._extremo[2] - d) * self._direcao < self.p.histerese_cm:
+            self._extremo = self._estender(self._extremo, instante, d, self._direcao)
+            return self._abrir_reabastecimento()
+
+        # Reversão confirmada: o trecho termina no extremo e o próximo começa nele
+        eventos = []
+        if self._reabastecimento is not None:
+            eventos.append(self._reabastecimento.encerrar(self._extremo[0], self._extremo[2]))
+            self._reabastecimento = None
+        self._origem, self._extremo, self._direcao = self._extremo, self._novo_extremo(instante, d), -self._direcao
+        return eventos + self._abrir_reabastecimento()
+
+    @staticmethod
+    def _novo_extremo(instante: datetime, d: float) -> Extremo:
+        return (instante, instante, d, deque([(instante, d)]))
+
+    def _estender(self, extremo: Extremo, instante: datetime, d: float, sentido: int) -> Extremo:
+        """Novo extremo se a leitura o ultrapassa; se fica dentro da histerese, ele continua valendo até ela.
+
+        O instante do extremo é o da primeira leitura a menos de meia histerese
+        dele, não o da leitura mais extrema: num patamar (caixa cheia), o ruído
+        do sensor renova o extremo por centésimos e arrastaria o fim do evento.
+        Essa primeira leitura é sempre um recorde, então basta guardar os recordes
+        e descartar os que ficaram para trás.
+        """
+        inicio, _, valor, recordes = extremo
+        if (d - valor) * sentido > 0:
+            recordes.append((instante, d))
+            while (d - recordes[0][1]) * sentido >= self.p.histerese_cm / 2:
+                recordes.popleft()
+            return (recordes[0][0], instante, d, recordes)
+        if (valor - d) * sentido < self.p.histerese_cm:
+            return (inicio, instante, valor, recordes)
+        return extremo
+
+    def _abrir_reabastecimento(self) -> List[Evento]:
+        if self._direcao >= 0 or self._reabastecimento is not None:
+            return []
+        _, inicio, d0, _ = self._origem
+        if d0 - self._extremo[2] < self.p.reabastecimento_min_cm:
+            return []
+        self._reabastecimento = Evento(self.sensor_id, "reabastecimento", inicio, d0)
+        return [self._reabastecimento]
+
+    # --- DRENAGEM ---
+
+    def _verificar_drenagem(self, instante: datetime, d: float) -> List[Evento]:
+        janela = self._janela
+        janela.append((instante, d))
+        while len(janela) > 1 and janela[1][0] <= instante - self.p.duracao_minima:
+            janela.popleft()
+        t0, d0 = janela[0]
+        segundos = (instante - t0).total_seconds()
+        if segundos < self.p.duracao_minima.total_seconds() or segundos <= 0:
+            return []
+        taxa = (d - d0) / (segundos / 3600)
+        if self._drenagem is None:
+            if taxa < self.p.drenagem_cm_h:
+                return []
+            self._drenagem = Evento(self.sensor_id, "drenagem", t0, d0)
+            return [self._drenagem]
+        if taxa >= self.p.drenagem_cm_h / 2:
+            return []
+        evento, self._drenagem = self._drenagem.encerrar(instante, d), None
+        return [evento]
+
+    # --- VAZIO ---
+
+    def _verificar_vazio(self, instante: datetime, d: float) -> List[Evento]:
+        faixa = abs(self.calibracao.max_nivel - self.calibracao.min_nivel)
+        if faixa == 0:
+            return []
+        nivel = self.calibracao.nivel(d)
+        if self._vazio is None:
+            if nivel > self.p.nivel_vazio:
+                self._vazio_desde = None
+                return []
+            if self._vazio_desde is None:
+                self._vazio_desde = (instante, d)
+            if instante - self._vazio_desde[0] < self.p.duracao_minima:
+                return []
+            self._vazio = Evento(self.sensor_id, "vazio", *self._vazio_desde)
+            return [self._vazio]
+        if nivel < self.p.nivel_vazio + self.p.histerese_cm / faixa * 100:
+            return []
+        evento, self._vazio, self._vazio_desde = self._vazio.encerrar(instante, d), None, None
+        return [evento]
+
+
+def gravar_eventos(db: Session, eventos: Sequence[Evento]) -> None:
+    if eventos:
+        db.execute(_SQL_GRAVAR_EVENTO, [
+            {"sensor_id": e.sensor_id, "tipo": e.tipo, "inicio": e.inicio, "fim": e.fim,
+             "distancia_inicio": e.distancia_inicio, "distancia_fim": e.distancia_fim}
+            for e in eventos
+        ])
+
+
+class EventosAoVivo:
+    """Um detector por sensor, avançado pelo monitor, gravando os eventos na tabela `eventos`.
+
+    Na primeira leitura de um sensor, o detector é aquecido reprocessando as
+    leituras desde o ponto de retomada (evento em aberto mais antigo ou fim do
+    último evento). A gravação é idempotente, então reprocessar ou rodar em
+    vários workers não duplica eventos.
+    """
+
+    AQUECIMENTO_PADRAO = timedelta(hours=24)
+    AQUECIMENTO_MAXIMO = timedelta(days=7)
+
+    def __init__(
+        self,
+        fabrica_sessao: Callable[[], Session],
+        parametros: Callable[[], ParametrosEventos],
+        calibracao: Callable[[str], Calibracao],
+        criar_filtro: Callable[[], FiltroBase],
+    ):
+        self._fabrica_sessao = fabrica_sessao
+        self._parametros = parametros
+        self._calibracao = calibracao
+        self._criar_filtro = criar_filtro
+        self._detectores: Dict[str, Tuple[DetectorEventos, int]] = {}
+        self._trava = threading.Lock()
+        self.disponivel = False
+
+    def verificar_tabela(self) -> bool:
+        with self._fabrica_sessao() as db:
+            self.disponivel = inspect(db.get_bind()).has_table(EventoSQLAlchemy.__tablename__)
+        return self.disponivel
+
+    def novo_detector(self, sensor_id: str) -> DetectorEventos:
+        return DetectorEventos(sensor_id, self._parametros(), self._calibracao(sensor_id), self._criar_filtro())
+
+    def _aquecer(self, db: Session, sensor_id: str, ultima: datetime) -> Tuple[DetectorEventos, int]:
+        ponto = db.execute(_SQL_PONTO_RETOMADA, {"sensor_id": sensor_id}).scalar()
+        ponto = max(ponto or ultima - self.AQUECIMENTO_PADRAO, ultima - self.AQUECIMENTO_MAXIMO)
+        # Eventos em aberto serão detectados de novo a partir do ponto de retomada
+        db.execute(_SQL_APAGAR_ABERTOS, {"sensor_id": sensor_id})
+        linhas = db.query(LeituraSQLAlchemy.id, LeituraSQLAlchemy.created_on, LeituraSQLAlchemy.distancia)\
+                   .filter(LeituraSQLAlchemy.sensor_id == sensor_id)\
+                   .filter(LeituraSQLAlchemy.created_on >= ponto)\
+                   .order_by(asc(LeituraSQLAlchemy.created_on), asc(LeituraSQLAlchemy.id))\
+                   .all()
+        detector = self.novo_detector(sensor_id)
+        eventos = []
+        for _, created_on, distancia in linhas:
+            eventos += detector.adicionar(created_on, distancia)
+        gravar_eventos(db, eventos)
+        return detector, max((linha[0] for linha in linhas), default=0)
+
+    def ao_receber(self, novas: List[LeituraNova]) -> None:
+        """Assinante do monitor: avança os detectores e grava os eventos abertos ou encerrados."""
+        if not self.disponivel:
+            return
+        with self._trava, self._fabrica_sessao() as db:
+            eventos = []
+            for leitura in novas:
+                estado = self._detectores.get(leitura.sensor_id)
+                if estado is None:
+                    estado = self._aquecer(db, leitura.sensor_id, leitura.created_on)
+                detector, ultimo_id = estado
+                if leitura.id > ultimo_id:
+                    eventos += detector.adicionar(leitura.created_on, leitura.distancia)
+                    ultimo_id = leitura.id
+                self._detectores[leitura.sensor_id] = (detector, ultimo_id)
+            gravar_eventos(db, eventos)
+            db.commit()
+
+    def limpar(self, sensores=None) -> None:
+        """Descarta os detectores (ex.: parâmetros ou calibração alterados); serão reaquecidos."""
+        with self._trava:
+            if sensores is None:
+                self._detectores.clear()
+            for sensor_id in sensores or ():
+                self._detectores.pop(sensor_id, None)
+
+    def listar(self, db: Session, sensor_id: str, inicio: datetime, fim: datetime, tipos: Optional[Sequence[str]] = None):
+        """Eventos do sensor que se sobrepõem a [inicio, fim), em ordem de início."""
+        consulta = db.query(EventoSQLAlchemy)\
+                     .filter(EventoSQLAlchemy.sensor_id == sensor_id)\
+                     .filter(EventoSQLAlchemy.inicio < fim)\
+                     .filter(or_(EventoSQLAlchemy.fim.is_(None), EventoSQLAlchemy.fim >= inicio))
+        if tipos:
+            consulta = consulta.filter(EventoSQLAlchemy.tipo.in_(tipos))
+        return consulta.order_by(asc(EventoSQLAlchemy.inicio)).all()
+
+    def reconstruir_tudo(self, lote: int = 10000) -> None:
+        """Apaga e detecta de novo os eventos de todo o histórico, sensor por sensor."""
+        with self._fabrica_sessao() as db:
+            sensores = [s for (s,) in db.execute(text("SELECT DISTINCT sensor_id FROM leituras")).all()]
+        for sensor_id in sensores:
+            detector = self.novo_detector(sensor_id)
+            total = 0
+            with self._fabrica_sessao() as db:
+                db.execute(text("DELETE FROM eventos WHERE sensor_id = :sensor_id"), {"sensor_id": sensor_id})
+                linhas = db.query(LeituraSQLAlchemy.created_on, LeituraSQLAlchemy.distancia)\
+                           .filter(LeituraSQLAlchemy.sensor_id == sensor_id)\
+                           .order_by(asc(LeituraSQLAlchemy.created_on), asc(LeituraSQLAlchemy.id))\
+                           .yield_per(lote)
+                eventos = []
+                for created_on, distancia in linhas:
+                    eventos += detector.adicionar(created_on, distancia)
+                # Abertos e encerrados saem com a mesma chave; basta gravar a última versão de cada
+                ultimos = {(e.tipo, e.inicio): e for e in eventos}
+                gravar_eventos(db, list(ultimos.values()))
+                total = len(ultimos)
+                db.commit()
+            with self._trava:
+                self._detectores.pop(sensor_id, None)
+            print(f"[Eventos] Sensor '{sensor_id}': {total} eventos detectados.")
+
+
+if __name__ == "__main__":
+    from calibracao_api import CacheCalibracoes
+    from config_api import ConfiguracaoRuntime
+    from database_api import SessionLocal
+    from filtros_api import criar_filtro
+    from rollups_api import LACUNA_MAXIMA_MINUTOS
+
+    cfg = ConfiguracaoRuntime()
+    calibracoes = CacheCalibracoes(
+        Calibracao(cfg.obter("MIN_NIVEL"), cfg.obter("MAX_NIVEL"), cfg.obter("CAPACIDADE_LITROS")), SessionLocal
+    )
+    EventosAoVivo(
+        SessionLocal,
+        lambda: ParametrosEventos.da_configuracao(cfg.valores, LACUNA_MAXIMA_MINUTOS),
+        calibracoes.obter,
+        lambda: criar_filtro("median", cfg.valores),
+    ).reconstruir_tudo()
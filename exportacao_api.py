@@ -0,0 +1,177 @@
+# exportacao_api.py
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Iterator, Optional, Tuple
+
+from sqlalchemy import asc, select
+from sqlalchemy.orm import Session
+
+from calibracao_api import Calibracao
+from filtros_api import FiltroBase
+from models_api import Leitura as LeituraSQLAlchemy
+
+# Dependências opcionais: sem elas o formato correspondente responde 406
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+TIPO_ARROW = "application/vnd.apache.arrow.stream"
+TIPO_MSGPACK = "application/msgpack"
+TIPO_JSON = "application/json"
+
+# Tipos aceitos no Accept -> tipo da resposta
+_TIPOS = {
+    TIPO_ARROW: TIPO_ARROW,
+    TIPO_MSGPACK: TIPO_MSGPACK,
+    "application/x-msgpack": TIPO_MSGPACK,
+    TIPO_JSON: TIPO_JSON,
+    "application/*": TIPO_JSON,
+    "*/*": TIPO_JSON,
+}
+
+BIBLIOTECAS = {TIPO_ARROW: "pyarrow", TIPO_MSGPACK: "msgpack"}
+
+LINHAS_POR_LOTE = 65536
+
+CAMPOS = ("id", "distancia", "nivel", "created_on")
+
+# Marcador de fim de um stream Arrow IPC (continuação + tamanho zero)
+_FIM_STREAM_ARROW = b"\xff\xff\xff\xff\x00\x00\x00\x00"
+
+
+def negociar(accept: Optional[str]) -> Optional[str]:
+    """Formato binário pedido no cabeçalho Accept, ou None para JSON.
+
+    Vale o tipo conhecido de maior `q`; em empate, o que vem primeiro.
+    """
+    if not accept:
+        return None
+    candidatos = []
+    for posicao, item in enumerate(accept.split(",")):
+        partes = [p.strip() for p in item.split(";")]
+        q = 1.0
+        for parametro in partes[1:]:
+            nome, _, valor = parametro.partition("=")
+            if nome.strip() == "q":
+                try:
+                    q = float(valor)
+                except ValueError:
+                    q = 0.0
+        tipo = _TIPOS.get(partes[0].lower())
+        if tipo is not None and q > 0:
+            candidatos.append((-q, posicao, tipo))
+    if not candidatos:
+        return None
+    tipo = min(candidatos)[2]
+    return None if tipo == TIPO_JSON else tipo
+
+
+def disponivel(tipo: str) -> bool:
+    return (pa if tipo == TIPO_ARROW else msgpack) is not None
+
+
+@lru_cache(maxsize=None)
+def _esquema_arrow(campos: Tuple[str, ...]):
+    """Esquema Arrow (e a mensagem IPC dele) por combinação de campos."""
+    tipos = {
+        "id": pa.int64(), "distancia": pa.float64(), "nivel": pa.int8(), "created_on": pa.timestamp("us", tz="UTC"),
+    }
+    esquema = pa.schema([(campo, tipos[campo]) for campo in campos])
+    return esquema, esquema.serialize().to_pybytes()
+
+
+class _SaidaArrow:
+    """Stream Arrow IPC montado mensagem a mensagem: esquema, um lote por vez e o fim."""
+
+    def __init__(self, campos: Tuple[str, ...]):
+        self.campos = campos
+        self.esquema, self._mensagem_esquema = _esquema_arrow(campos)
+
+    def inicio(self) -> bytes:
+        return self._mensagem_esquema
+
+    def lote(self, colunas: dict) -> bytes:
+        lote = pa.record_batch(
+            [pa.array(colunas[campo], tipo) for campo, tipo in zip(self.campos, self.esquema.types)], schema=self.esquema
+        )
+        return lote.serialize().to_pybytes()
+
+    def fim(self) -> bytes:
+        return _FIM_STREAM_ARROW
+
+
+class _SaidaMsgpack:
+    """Sequência de mapas colunares MessagePack, um por lote (ler com msgpack.Unpacker)."""
+
+    def __init__(self, campos: Tuple[str, ...]):
+        self.campos = campos
+        self._empacotador = msgpack.Packer()
+
+    def inicio(self) -> bytes:
+        return b""
+
+    def lote(self, colunas: dict) -> bytes:
+        if "created_on" in colunas:
+            colunas["created_on"] = [round(instante.timestamp() * 1000) for instante in colunas["created_on"]]
+        return self._empacotador.pack({("ids" if campo == "id" else campo): colunas[campo] for campo in self.campos})
+
+    def fim(self) -> bytes:
+        return b""
+
+
+def exportar(
+    tipo: str,
+    fabrica_sessao: Callable[[], Session],
+    sensor_id: str,
+    inicio: datetime,
+    obter_calibracao: Callable[[str], Calibracao],
+    since_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    preparar_filtro: Optional[Callable[[Session, datetime], FiltroBase]] = None,
+    campos: Optional[Tuple[str, ...]] = None,
+    linhas_por_lote: int = LINHAS_POR_LOTE,
+) -> Iterator[bytes]:
+    """Gera o histórico no formato binário, um lote por vez, direto dos lotes lidos do banco.
+
+    A consulta usa cursor no servidor (yield_per), então a memória não cresce com o
+    tamanho da janela. `preparar_filtro` recebe a sessão e o primeiro instante e
+    devolve um filtro já aquecido, que segue de um lote para o outro. `campos`
+    restringe as colunas lidas e enviadas (todas, por padrão). A calibração só é
+    buscada aqui dentro, já na thread que consome o gerador, pois pode ir ao banco.
+    """
+    campos = campos or CAMPOS
+    saida = _SaidaArrow(campos) if tipo == TIPO_ARROW else _SaidaMsgpack(campos)
+    lidas = [c for c in ("id", "distancia", "created_on") if c in campos]
+    if "nivel" in campos and "distancia" not in lidas:
+        lidas.append("distancia")
+    if preparar_filtro is not None and "created_on" not in lidas:
+        lidas.append("created_on")
+    consulta = select(*(getattr(LeituraSQLAlchemy, coluna) for coluna in lidas))\
+        .where(LeituraSQLAlchemy.sensor_id == sensor_id)\
+        .where(LeituraSQLAlchemy.created_on >= inicio)
+    if since_id is not None:
+        consulta = consulta.where(LeituraSQLAlchemy.id > since_id)
+    if since is not None:
+        consulta = consulta.where(LeituraSQLAlchemy.created_on > since)
+    consulta = consulta.order_by(asc(LeituraSQLAlchemy.created_on))
+
+    yield saida.inicio()
+    calibracao = obter_calibracao(sensor_id) if "nivel" in campos else None
+    with fabrica_sessao() as db:
+        filtro = None
+        resultado = db.execute(consulta.execution_options(yield_per=linhas_por_lote))
+        for linhas in resultado.partitions():
+            colunas = dict(zip(lidas, (list(coluna) for coluna in zip(*linhas))))
+            if preparar_filtro is not None and "distancia" in colunas:
+                if filtro is None:
+                    filtro = preparar_filtro(db, colunas["created_on"][0])
+                colunas["distancia"] = [filtro.atualizar(d) for d in colunas["distancia"]]
+            if "nivel" in campos:
+                colunas["nivel"] = [round(calibracao.nivel(d)) for d in colunas["distancia"]]
+            yield saida.lote(colunas)
+    yield saida.fim()
@@ -0,0 +1,181 @@
+# filtros_api.py
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left, insort
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import desc
+from sqlalchemy.orm import Session
+
+from models_api import Leitura as LeituraSQLAlchemy
+from monitor_api import LeituraNova
+
+FILTROS = ("median", "ema", "kalman")
+
+
+class FiltroBase(ABC):
+    """Filtro de passagem única: cada leitura atualiza o estado em O(1) (ou O(janela) na mediana).
+
+    Saltos maiores que `limiar_outlier` (cm) em relação à estimativa atual são
+    descartados, a não ser que se repitam por `max_rejeicoes` leituras seguidas;
+    nesse caso o salto é real (ex.: caixa enchendo) e o filtro o aceita.
+    """
+
+    def __init__(self, limiar_outlier: float, max_rejeicoes: int = 3):
+        self.limiar_outlier = limiar_outlier
+        self.max_rejeicoes = max_rejeicoes
+        self.valor: Optional[float] = None
+        self._rejeicoes = 0
+
+    def atualizar(self, distancia: float) -> float:
+        if self.valor is not None and abs(distancia - self.valor) > self.limiar_outlier:
+            if self._rejeicoes < self.max_rejeicoes:
+                self._rejeicoes += 1
+                return self.valor
+            self._reiniciar()
+        self._rejeicoes = 0
+        self.valor = self._atualizar(distancia)
+        return self.valor
+
+    @abstractmethod
+    def _atualizar(self, distancia: float) -> float:
+        """Incorpora uma leitura aceita e devolve a nova estimativa."""
+
+    def _reiniciar(self) -> None:
+        """Descarta o histórico interno após um salto confirmado."""
+
+
+class FiltroMediana(FiltroBase):
+    """Mediana móvel das últimas `janela` leituras."""
+
+    def __init__(self, janela: int, limiar_outlier: float):
+        super().__init__(limiar_outlier)
+        self._janela: deque = deque()
+        self._ordenada: List[float] = []
+        self._tamanho = max(1, janela)
+
+    def _atualizar(self, distancia: float) -> float:
+        if len(self._janela) == self._tamanho:
+            antigo = self._janela.popleft()
+            del self._ordenada[bisect_left(self._ordenada, antigo)]
+        self._janela.append(distancia)
+        insort(self._ordenada, distancia)
+        n = len(self._ordenada)
+        meio = n // 2
+        return self._ordenada[meio] if n % 2 else (self._ordenada[meio - 1] + self._ordenada[meio]) / 2
+
+    def _reiniciar(self) -> None:
+        self._janela.clear()
+        self._ordenada.clear()
+
+
+class FiltroEMA(FiltroBase):
+    """Média móvel exponencial com fator de suavização `alfa`."""
+
+    def __init__(self, alfa: float, limiar_outlier: float):
+        super().__init__(limiar_outlier)
+        self.alfa = alfa
+
+    def _atualizar(self, distancia: float) -> float:
+        if self.valor is None:
+            return distancia
+        return self.valor + self.alfa * (distancia - self.valor)
+
+    def _reiniciar(self) -> None:
+        self.valor = None
+
+
+class FiltroKalman(FiltroBase):
+    """Filtro de Kalman 1D para um nível que varia lentamente (passeio aleatório)."""
+
+    def __init__(self, ruido_processo: float, ruido_medicao: float, limiar_outlier: float):
+        super().__init__(limiar_outlier)
+        self.q = ruido_processo
+        self.r = ruido_medicao
+        self._p = 1.0
+
+    def _atualizar(self, distancia: float) -> float:
+        if self.valor is None:
+            self._p = self.r
+            return distancia
+        p = self._p + self.q
+        ganho = p / (p + self.r)
+        self._p = (1 - ganho) * p
+        return self.valor + ganho * (distancia - self.valor)
+
+    def _reiniciar(self) -> None:
+        self.valor = None
+
+
+def criar_filtro(nome: str, parametros: Dict[str, float]) -> FiltroBase:
+    """Cria um filtro novo a partir do nome (`median`, `ema` ou `kalman`)."""
+    limiar = parametros["FILTRO_LIMIAR_OUTLIER_CM"]
+    if nome == "median":
+        return FiltroMediana(int(parametros["FILTRO_JANELA_MEDIANA"]), limiar)
+    if nome == "ema":
+        return FiltroEMA(parametros["FILTRO_ALFA_EMA"], limiar)
+    if nome == "kalman":
+        return FiltroKalman(parametros["FILTRO_KALMAN_Q"], parametros["FILTRO_KALMAN_R"], limiar)
+    raise ValueError(f"Filtro desconhecido: {nome}")
+
+
+class FiltrosAoVivo:
+    """Estado incremental dos filtros para a ponta mais recente de cada sensor.
+
+    O estado de um par (sensor, filtro) é criado na primeira consulta, aquecido
+    com as últimas leituras do banco, e depois avança a cada lote do monitor.
+    Ler o valor suavizado mais recente custa O(1). No máximo `tamanho_maximo`
+    estados ficam em memória; os mais antigos saem primeiro.
+    """
+
+    LEITURAS_AQUECIMENTO = 50
+
+    def __init__(self, fabrica_sessao: Callable[[], Session], parametros: Callable[[], Dict[str, float]], tamanho_maximo: int = 10000):
+        self.tamanho_maximo = tamanho_maximo
+        self._fabrica_sessao = fabrica_sessao
+        self._parametros = parametros
+        self._estados: Dict[Tuple[str, str], Tuple[FiltroBase, int]] = {}
+        self._trava = threading.Lock()
+
+    def valor_atual(self, sensor_id: str, nome: str) -> Optional[float]:
+        """Distância suavizada mais recente do sensor."""
+        estado = self._estados.get((sensor_id, nome))
+        if estado is None:
+            estado = self._aquecer(sensor_id, nome)
+        return estado[0].valor
+
+    def _aquecer(self, sensor_id: str, nome: str) -> Tuple[FiltroBase, int]:
+        with self._trava:
+            estado = self._estados.get((sensor_id, nome))
+            if estado is not None:
+                return estado
+            with self._fabrica_sessao() as db:
+                linhas = db.query(LeituraSQLAlchemy.id, LeituraSQLAlchemy.distancia)\
+                           .filter(LeituraSQLAlchemy.sensor_id == sensor_id)\
+                           .order_by(desc(LeituraSQLAlchemy.created_on))\
+                           .limit(self.LEITURAS_AQUECIMENTO)\
+                           .all()
+            filtro = criar_filtro(nome, self._parametros())
+            for _, distancia in reversed(linhas):
+                filtro.atualizar(distancia)
+            estado = (filtro, linhas[0][0] if linhas else 0)
+            while len(self._estados) >= self.tamanho_maximo:
+                self._estados.pop(next(iter(self._estados)), None)
+            self._estados[(sensor_id, nome)] = estado
+            return estado
+
+    def ao_receber(self, novas: List[LeituraNova]) -> None:
+        """Assinante do monitor: avança os estados já criados com as leituras novas."""
+        with self._trava:
+            for leitura in novas:
+                for nome in FILTROS:
+                    estado = self._estados.get((leitura.sensor_id, nome))
+                    if estado is not None and leitura.id > estado[1]:
+                        estado[0].atualizar(leitura.distancia)
+                        self._estados[(leitura.sensor_id, nome)] = (estado[0], leitura.id)
+
+    def limpar(self) -> None:
+        """Descarta todos os estados (ex.: parâmetros dos filtros alterados)."""
+        with self._trava:
+            self._estados.clear()
@@ -0,0 +1,189 @@
+# lacunas_api.py
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, inspect, text
+from sqlalchemy.orm import Session
+
+from models_api import Lacuna as LacunaSQLAlchemy, Leitura as LeituraSQLAlchemy
+from monitor_api import LeituraNova
+from rollups_api import LACUNA_MAXIMA_MINUTOS
+
+# Intervalos entre leituras consecutivas maiores que :limiar_segundos. Entram também a
+# leitura anterior a :inicio e a posterior a :fim, para pegar lacunas que cruzam as bordas.
+_SQL_LACUNAS_BRUTAS = """
+    SELECT anterior AS inicio, created_on AS fim
+    FROM (
+        SELECT created_on, lag(created_on) OVER (ORDER BY created_on) AS anterior
+        FROM leituras
+        WHERE sensor_id = :sensor_id
+          AND created_on >= coalesce(
+              (SELECT max(created_on) FROM leituras WHERE sensor_id = :sensor_id AND created_on < :inicio), :inicio)
+          AND created_on <= coalesce(
+              (SELECT min(created_on) FROM leituras WHERE sensor_id = :sensor_id AND created_on > :fim), :fim)
+    ) l
+    WHERE created_on - anterior > make_interval(secs => :limiar_segundos)
+"""
+
+_SQL_LACUNAS_MATERIALIZADAS = """
+    SELECT inicio, fim
+    FROM lacunas
+    WHERE sensor_id = :sensor_id AND inicio < :fim AND fim > :inicio
+      AND fim - inicio > make_interval(secs => :limiar_segundos)
+"""
+
+# Uma lacuna que cruza a faixa recalculada (leitura atrasada) é apagada e refeita
+_SQL_APAGAR_FAIXA = text("""
+    DELETE FROM lacunas WHERE sensor_id = :sensor_id AND inicio <= :fim AND fim >= :inicio
+""")
+
+_SQL_ATUALIZAR_LACUNAS = text(f"""
+    INSERT INTO lacunas (sensor_id, inicio, fim)
+    SELECT :sensor_id, inicio, fim FROM ({_SQL_LACUNAS_BRUTAS}) l
+    ON CONFLICT (sensor_id, inicio) DO UPDATE SET fim = excluded.fim
+""")
+
+# Tempo fora por período: soma da parte de cada lacuna que cai dentro dele. A lacuna
+# em andamento (da última leitura até :fim) entra como mais uma.
+_SQL_DISPONIBILIDADE = """
+    WITH lacunas_janela AS (
+        {fonte}
+        UNION ALL
+        SELECT ultima, CAST(:fim AS timestamptz)
+        FROM (SELECT max(created_on) AS ultima FROM leituras WHERE sensor_id = :sensor_id) u
+        WHERE CAST(:fim AS timestamptz) - ultima > make_interval(secs => :limiar_segundos)
+    ), periodos AS (
+        {periodos}
+    )
+    SELECT p.inicio, p.fim,
+           CAST(coalesce(sum(extract(epoch FROM least(l.fim, p.fim) - greatest(l.inicio, p.inicio))), 0) AS double precision) AS segundos_fora,
+           count(l.inicio) AS lacunas
+    FROM periodos p
+    LEFT JOIN lacunas_janela l ON l.inicio < p.fim AND l.fim > p.inicio
+    GROUP BY p.inicio, p.fim
+    ORDER BY p.inicio
+"""
+
+_SQL_PERIODO_UNICO = "SELECT CAST(:inicio AS timestamptz) AS inicio, CAST(:fim AS timestamptz) AS fim"
+
+# Períodos de calendário (UTC); o primeiro e o último são recortados pela janela
+_SQL_PERIODOS_CALENDARIO = """
+    SELECT greatest(p, CAST(:inicio AS timestamptz)) AS inicio, least(p + CAST(:passo AS interval), :fim) AS fim
+    FROM generate_series(
+        date_trunc(:unidade, CAST(:inicio AS timestamptz), 'UTC'), CAST(:fim AS timestamptz), CAST(:passo AS interval)
+    ) p
+    WHERE p < :fim
+"""
+
+AGRUPAMENTOS = {"dia": "day", "semana": "week", "mes": "month"}
+
+
+class Lacunas:
+    """Lacunas (intervalos sem leituras) por sensor, materializadas na tabela `lacunas`.
+
+    A tabela guarda os intervalos maiores que LACUNA_MAXIMA_MINUTOS e é mantida
+    a cada lote do monitor, recalculando só a faixa das leituras novas. Consultas
+    com limiar menor que esse caem nas leituras brutas.
+    """
+
+    def __init__(self, fabrica_sessao: Callable[[], Session], limiar_minimo: timedelta = timedelta(minutes=LACUNA_MAXIMA_MINUTOS)):
+        self._fabrica_sessao = fabrica_sessao
+        self.limiar_minimo = limiar_minimo
+        self.disponivel = False
+        self._sql: Dict[Tuple[str, bool], text] = {}
+
+    def verificar_tabela(self) -> bool:
+        with self._fabrica_sessao() as db:
+            self.disponivel = inspect(db.get_bind()).has_table(LacunaSQLAlchemy.__tablename__)
+        return self.disponivel
+
+    def usa_tabela(self, limiar: timedelta) -> bool:
+        return self.disponivel and limiar >= self.limiar_minimo
+
+    def atualizar(self, db: Session, sensor_id: str, inicio: datetime, fim: datetime) -> None:
+        """Recalcula as lacunas entre a leitura anterior a `inicio` e a posterior a `fim`."""
+        parametros = {"sensor_id": sensor_id, "inicio": inicio, "fim": fim,
+                      "limiar_segundos": self.limiar_minimo.total_seconds()}
+        db.execute(_SQL_APAGAR_FAIXA, parametros)
+        db.execute(_SQL_ATUALIZAR_LACUNAS, parametros)
+
+    def ao_receber(self, novas: List[LeituraNova]) -> None:
+        """Assinante do monitor: atualiza a faixa de cada sensor que recebeu leituras."""
+        if not self.disponivel:
+            return
+        faixas: Dict[str, Tuple[datetime, datetime]] = {}
+        for leitura in novas:
+            inicio, fim = faixas.get(leitura.sensor_id, (leitura.created_on, leitura.created_on))
+            faixas[leitura.sensor_id] = (min(inicio, leitura.created_on), max(fim, leitura.created_on))
+        with self._fabrica_sessao() as db:
+            for sensor_id, (inicio, fim) in faixas.items():
+                self.atualizar(db, sensor_id, inicio, fim)
+            db.commit()
+
+    def listar(self, db: Session, sensor_id: str, inicio: datetime, fim: datetime, limiar: timedelta) -> Tuple[str, list]:
+        """Lacunas maiores que `limiar` que cruzam [inicio, fim), mais a lacuna em andamento (fim None)."""
+        usar_tabela = self.usa_tabela(limiar)
+        sql = _SQL_LACUNAS_MATERIALIZADAS if usar_tabela else _SQL_LACUNAS_BRUTAS
+        linhas = db.execute(text(f"{sql} ORDER BY inicio"), {
+            "sensor_id": sensor_id, "inicio": inicio, "fim": fim, "limiar_segundos": limiar.total_seconds(),
+        }).all()
+        lacunas = [(i, f) for i, f in linhas if i < fim and f > inicio]
+        ultima = db.query(func.max(LeituraSQLAlchemy.created_on))\
+                   .filter(LeituraSQLAlchemy.sensor_id == sensor_id)\
+                   .scalar()
+        if ultima is not None and fim - ultima > limiar:
+            lacunas.append((ultima, None))
+        return ("materializada" if usar_tabela else "bruta"), lacunas
+
+    def disponibilidade(
+        self, db: Session, sensor_id: str, inicio: datetime, fim: datetime, limiar: timedelta, agrupamento: Optional[str] = None
+    ) -> Tuple[str, Optional[datetime], list]:
+        """Tempo fora e número de lacunas por período, a partir da primeira leitura do sensor.
+
+        Retorna (fonte, primeira leitura, [(inicio, fim, segundos_fora, lacunas), ...]).
+        """
+        usar_tabela = self.usa_tabela(limiar)
+        primeira = db.query(func.min(LeituraSQLAlchemy.created_on))\
+                     .filter(LeituraSQLAlchemy.sensor_id == sensor_id)\
+                     .scalar()
+        fonte = "materializada" if usar_tabela else "bruta"
+        if primeira is None or primeira >= fim:
+            return fonte, primeira, []
+        chave = (fonte, agrupamento is not None)
+        if chave not in self._sql:
+            self._sql[chave] = text(_SQL_DISPONIBILIDADE.format(
+                fonte=_SQL_LACUNAS_MATERIALIZADAS if usar_tabela else _SQL_LACUNAS_BRUTAS,
+                periodos=_SQL_PERIODOS_CALENDARIO if agrupamento else _SQL_PERIODO_UNICO,
+            ))
+        parametros = {
+            "sensor_id": sensor_id, "inicio": max(inicio, primeira), "fim": fim, "limiar_segundos": limiar.total_seconds(),
+        }
+        if agrupamento:
+            parametros.update(unidade=AGRUPAMENTOS[agrupamento], passo=f"1 {AGRUPAMENTOS[agrupamento]}")
+        return fonte, primeira, db.execute(self._sql[chave], parametros).all()
+
+    def reconstruir_tudo(self, dias_por_lote: int = 30) -> None:
+        """Recalcula a tabela para todo o histórico, sensor por sensor."""
+        self.verificar_tabela()
+        with self._fabrica_sessao() as db:
+            faixas = db.execute(text(
+                "SELECT sensor_id, min(created_on), max(created_on) FROM leituras GROUP BY sensor_id"
+            )).all()
+            for sensor_id, primeira, ultima in faixas:
+                inicio = primeira
+                while inicio <= ultima:
+                    fim = min(inicio + timedelta(days=dias_por_lote), ultima)
+                    self.atualizar(db, sensor_id, inicio, fim)
+                    db.commit()
+                    if fim == ultima:
+                        break
+                    inicio = fim
+                total = db.query(func.count()).select_from(LacunaSQLAlchemy)\
+                          .filter(LacunaSQLAlchemy.sensor_id == sensor_id)\
+                          .scalar()
+                print(f"[Lacunas] Sensor '{sensor_id}': {total} lacunas.")
+
+
+if __name__ == "__main__":
+    from database_api import SessionLocal
+    Lacunas(SessionLocal).reconstruir_tudo()
@@ -0,0 +1,51 @@
+# metricas_api.py
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+from sketch_api import DDSketch
+
+PERCENTIS = (0.5, 0.9, 0.99)
+
+
+class Metricas:
+    """Tempos de execução por nome: contagem, soma, máximo e percentis (DDSketch, erro relativo de 1%)."""
+
+    def __init__(self, precisao_relativa: float = 0.01):
+        self.precisao_relativa = precisao_relativa
+        self._tempos: Dict[str, list] = {}
+        self._trava = threading.Lock()
+
+    def registrar(self, nome: str, segundos: float) -> None:
+        ms = segundos * 1000
+        with self._trava:
+            tempo = self._tempos.get(nome)
+            if tempo is None:
+                tempo = self._tempos[nome] = [0, 0.0, 0.0, DDSketch(self.precisao_relativa)]
+            tempo[0] += 1
+            tempo[1] += ms
+            tempo[2] = max(tempo[2], ms)
+            tempo[3].adicionar(ms)
+
+    @contextmanager
+    def cronometrar(self, nome: str) -> Iterator[None]:
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(nome, time.perf_counter() - inicio)
+
+    def resumo(self) -> Dict[str, Dict[str, float]]:
+        with self._trava:
+            resumo = {}
+            for nome, (n, total, maximo, sketch) in sorted(self._tempos.items()):
+                quantis = sketch.quantis(PERCENTIS)
+                resumo[nome] = {
+                    "n": n,
+                    "total_ms": round(total, 3),
+                    "media_ms": round(total / n, 3),
+                    "max_ms": round(maximo, 3),
+                    **{f"p{round(p * 100):g}_ms": round(quantis[p], 3) for p in PERCENTIS},
+                }
+            return resumo
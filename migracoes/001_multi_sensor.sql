@@ -0,0 +1,14 @@
+-- migracoes/001_multi_sensor.sql
+-- Adiciona a dimensão de sensor às leituras e a tabela de calibração por sensor.
+-- Leituras existentes passam a pertencer ao sensor 'principal'.
+
+ALTER TABLE leituras ADD COLUMN IF NOT EXISTS sensor_id VARCHAR(64) NOT NULL DEFAULT 'principal';
+
+-- Em tabelas grandes, prefira rodar fora de transação com CREATE INDEX CONCURRENTLY.
+CREATE INDEX IF NOT EXISTS ix_leituras_sensor_id_created_on ON leituras (sensor_id, created_on);
+
+CREATE TABLE IF NOT EXISTS calibracoes (
+    sensor_id VARCHAR(64) PRIMARY KEY,
+    min_nivel DOUBLE PRECISION NOT NULL,
+    max_nivel DOUBLE PRECISION NOT NULL
+);
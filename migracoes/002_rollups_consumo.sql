@@ -0,0 +1,20 @@
+-- migracoes/002_rollups_consumo.sql
+-- Capacidade da caixa por sensor e agregados por hora usados pelo endpoint de consumo.
+-- Depois de criar a tabela, preencha o histórico com: python rollups_api.py
+
+ALTER TABLE calibracoes ADD COLUMN IF NOT EXISTS capacidade_litros DOUBLE PRECISION;
+
+CREATE TABLE IF NOT EXISTS leituras_rollup_hora (
+    sensor_id VARCHAR(64) NOT NULL,
+    bucket TIMESTAMPTZ NOT NULL,
+    n INTEGER NOT NULL,
+    distancia_min DOUBLE PRECISION NOT NULL,
+    distancia_max DOUBLE PRECISION NOT NULL,
+    distancia_soma DOUBLE PRECISION NOT NULL,
+    distancia_soma_quadrados DOUBLE PRECISION NOT NULL,
+    distancia_primeira DOUBLE PRECISION NOT NULL,
+    distancia_ultima DOUBLE PRECISION NOT NULL,
+    variacao_cm DOUBLE PRECISION NOT NULL,
+    reabastecimento_cm DOUBLE PRECISION NOT NULL,
+    PRIMARY KEY (sensor_id, bucket)
+);
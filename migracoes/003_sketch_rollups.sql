@@ -0,0 +1,5 @@
+-- migracoes/003_sketch_rollups.sql
+-- Sketch de quantis (DDSketch) por hora, usado nos percentis de janelas longas.
+-- Depois de aplicar, preencha os sketches do histórico com: python rollups_api.py
+
+ALTER TABLE leituras_rollup_hora ADD COLUMN IF NOT EXISTS sketch JSONB;
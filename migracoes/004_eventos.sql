@@ -0,0 +1,16 @@
+-- migracoes/004_eventos.sql
+-- Eventos (reabastecimento, drenagem, vazio) detectados a cada leitura nova pelo monitor.
+-- Depois de criar a tabela, detecte os eventos do histórico com: python eventos_api.py
+
+CREATE TABLE IF NOT EXISTS eventos (
+    id SERIAL PRIMARY KEY,
+    sensor_id VARCHAR(64) NOT NULL,
+    tipo VARCHAR(16) NOT NULL,
+    inicio TIMESTAMPTZ NOT NULL,
+    fim TIMESTAMPTZ,
+    distancia_inicio DOUBLE PRECISION NOT NULL,
+    distancia_fim DOUBLE PRECISION,
+    CONSTRAINT uq_eventos_sensor_id_tipo_inicio UNIQUE (sensor_id, tipo, inicio)
+);
+
+CREATE INDEX IF NOT EXISTS ix_eventos_sensor_id_inicio ON eventos (sensor_id, inicio);
@@ -0,0 +1,31 @@
+-- migracoes/005_alertas.sql
+-- Regras de alerta avaliadas a cada leitura e o histórico de disparos.
+-- Exemplos:
+--   INSERT INTO regras_alerta (sensor_id, tipo, limiar, duracao_minutos) VALUES ('principal', 'nivel_abaixo', 20, 15);
+--   INSERT INTO regras_alerta (sensor_id, tipo, duracao_minutos, destino) VALUES ('principal', 'sem_leitura', 30, 'webhook');
+-- Depois de alterar as regras: POST /admin/config/recarregar (ou SIGHUP).
+
+CREATE TABLE IF NOT EXISTS regras_alerta (
+    id SERIAL PRIMARY KEY,
+    sensor_id VARCHAR(64) NOT NULL,
+    tipo VARCHAR(16) NOT NULL CHECK (tipo IN ('nivel_abaixo', 'sem_leitura')),
+    limiar DOUBLE PRECISION,
+    duracao_minutos DOUBLE PRECISION NOT NULL DEFAULT 0,
+    histerese DOUBLE PRECISION NOT NULL DEFAULT 5,
+    destino VARCHAR(32) NOT NULL DEFAULT 'log',
+    ativo BOOLEAN NOT NULL DEFAULT true,
+    CHECK (tipo <> 'nivel_abaixo' OR limiar IS NOT NULL)
+);
+
+CREATE TABLE IF NOT EXISTS alertas (
+    id SERIAL PRIMARY KEY,
+    regra_id INTEGER NOT NULL REFERENCES regras_alerta (id) ON DELETE CASCADE,
+    sensor_id VARCHAR(64) NOT NULL,
+    inicio TIMESTAMPTZ NOT NULL,
+    disparado_em TIMESTAMPTZ NOT NULL,
+    resolvido_em TIMESTAMPTZ,
+    nivel DOUBLE PRECISION,
+    CONSTRAINT uq_alertas_regra_id_inicio UNIQUE (regra_id, inicio)
+);
+
+CREATE INDEX IF NOT EXISTS ix_alertas_sensor_id_disparado_em ON alertas (sensor_id, disparado_em);
@@ -0,0 +1,10 @@
+-- migracoes/006_lacunas.sql
+-- Lacunas entre leituras (sensor fora do ar), usadas pelo relatório de disponibilidade.
+-- Depois de criar a tabela, preencha o histórico com: python lacunas_api.py
+
+CREATE TABLE IF NOT EXISTS lacunas (
+    sensor_id VARCHAR(64) NOT NULL,
+    inicio TIMESTAMPTZ NOT NULL,
+    fim TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (sensor_id, inicio)
+);
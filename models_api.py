@@ -1,20 +1,288 @@
 # models_api.py
-from typing import Optional, Union
-from sqlalchemy import Column, Integer, Float, DateTime
-from database_api import Base 
-from pydantic import BaseModel
+from typing import Dict, List, Literal, Optional, Union
+from sqlalchemy import Boolean, Column, Integer, Float, DateTime, ForeignKey, Index, String, UniqueConstraint
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import declarative_base
+from pydantic import BaseModel, Field
+
+# Declarado aqui, e não em database_api, para que importar os modelos não abra conexão com o banco
+Base = declarative_base()
 
 class Leitura(Base):
     __tablename__ = "leituras" 
+    # Todas as consultas filtram por sensor e ordenam/limitam por data
+    __table_args__ = (Index("ix_leituras_sensor_id_created_on", "sensor_id", "created_on"),)
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    sensor_id = Column(String(64), nullable=False, server_default="principal")
     distancia = Column(Float, nullable=False)
     created_on = Column(DateTime(timezone=True), nullable=False)
 
     def __repr__(self):
-        return f"<Leitura(id={self.id}, distancia={self.distancia}, created_on='{self.created_on}', nivel={self.nivel})>"
+        return f"<Leitura(id={self.id}, sensor_id='{self.sensor_id}', distancia={self.distancia}, created_on='{self.created_on}')>"
+
+class Calibracao(Base):
+    __tablename__ = "calibracoes"
+
+    sensor_id = Column(String(64), primary_key=True)
+    min_nivel = Column(Float, nullable=False)
+    max_nivel = Column(Float, nullable=False)
+    capacidade_litros = Column(Float, nullable=True)
+
+    def __repr__(self):
+        return f"<Calibracao(sensor_id='{self.sensor_id}', min_nivel={self.min_nivel}, max_nivel={self.max_nivel}, capacidade_litros={self.capacidade_litros})>"
+
+class RollupHora(Base):
+    """Agregados por sensor e hora, mantidos pelo monitor a cada leitura nova."""
+    __tablename__ = "leituras_rollup_hora"
+
+    sensor_id = Column(String(64), primary_key=True)
+    bucket = Column(DateTime(timezone=True), primary_key=True)
+    n = Column(Integer, nullable=False)
+    distancia_min = Column(Float, nullable=False)
+    distancia_max = Column(Float, nullable=False)
+    distancia_soma = Column(Float, nullable=False)
+    distancia_soma_quadrados = Column(Float, nullable=False)
+    distancia_primeira = Column(Float, nullable=False)
+    distancia_ultima = Column(Float, nullable=False)
+    # Soma das variações de distância entre leituras consecutivas, sem os degraus de reabastecimento (cm)
+    variacao_cm = Column(Float, nullable=False)
+    # Soma dos degraus de reabastecimento (cm)
+    reabastecimento_cm = Column(Float, nullable=False)
+    # Contagens do DDSketch da hora: {indice do bucket: contagem}
+    sketch = Column(JSONB, nullable=True)
+
+    def __repr__(self):
+        return f"<RollupHora(sensor_id='{self.sensor_id}', bucket='{self.bucket}', n={self.n})>"
+
+class Evento(Base):
+    """Reabastecimentos, drenagens e períodos de caixa vazia detectados pelo monitor."""
+    __tablename__ = "eventos"
+    __table_args__ = (
+        UniqueConstraint("sensor_id", "tipo", "inicio", name="uq_eventos_sensor_id_tipo_inicio"),
+        Index("ix_eventos_sensor_id_inicio", "sensor_id", "inicio"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    sensor_id = Column(String(64), nullable=False)
+    tipo = Column(String(16), nullable=False)
+    inicio = Column(DateTime(timezone=True), nullable=False)
+    # Nulo enquanto o evento está em andamento
+    fim = Column(DateTime(timezone=True), nullable=True)
+    distancia_inicio = Column(Float, nullable=False)
+    distancia_fim = Column(Float, nullable=True)
+
+    def __repr__(self):
+        return f"<Evento(sensor_id='{self.sensor_id}', tipo='{self.tipo}', inicio='{self.inicio}', fim='{self.fim}')>"
+
+class Lacuna(Base):
+    """Intervalo entre duas leituras consecutivas maior que LACUNA_MAXIMA_MINUTOS (sensor fora do ar)."""
+    __tablename__ = "lacunas"
+
+    sensor_id = Column(String(64), primary_key=True)
+    # Última leitura antes da lacuna e primeira depois dela
+    inicio = Column(DateTime(timezone=True), primary_key=True)
+    fim = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<Lacuna(sensor_id='{self.sensor_id}', inicio='{self.inicio}', fim='{self.fim}')>"
+
+class RegraAlerta(Base):
+    """Regra avaliada a cada leitura: nível abaixo de `limiar`% ou nenhuma leitura, por `duracao_minutos`."""
+    __tablename__ = "regras_alerta"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    sensor_id = Column(String(64), nullable=False)
+    tipo = Column(String(16), nullable=False)
+    limiar = Column(Float, nullable=True)
+    duracao_minutos = Column(Float, nullable=False, server_default="0")
+    # Pontos percentuais acima do limiar para considerar o alerta resolvido
+    histerese = Column(Float, nullable=False, server_default="5")
+    destino = Column(String(32), nullable=False, server_default="log")
+    ativo = Column(Boolean, nullable=False, server_default="true")
+
+    def __repr__(self):
+        return f"<RegraAlerta(id={self.id}, sensor_id='{self.sensor_id}', tipo='{self.tipo}', limiar={self.limiar})>"
+
+class Alerta(Base):
+    """Disparo de uma regra; `inicio` é quando a condição começou e identifica o alerta."""
+    __tablename__ = "alertas"
+    __table_args__ = (
+        UniqueConstraint("regra_id", "inicio", name="uq_alertas_regra_id_inicio"),
+        Index("ix_alertas_sensor_id_disparado_em", "sensor_id", "disparado_em"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    regra_id = Column(Integer, ForeignKey("regras_alerta.id", ondelete="CASCADE"), nullable=False)
+    sensor_id = Column(String(64), nullable=False)
+    inicio = Column(DateTime(timezone=True), nullable=False)
+    disparado_em = Column(DateTime(timezone=True), nullable=False)
+    resolvido_em = Column(DateTime(timezone=True), nullable=True)
+    nivel = Column(Float, nullable=True)
+
+    def __repr__(self):
+        return f"<Alerta(regra_id={self.regra_id}, inicio='{self.inicio}', resolvido_em='{self.resolvido_em}')>"
 
 class LeituraResponse(BaseModel):
     id: int
     distancia: float 
+    nivel: Optional[int] = None
     created_on: str  
+
+class ConsumoBucket(BaseModel):
+    inicio: str
+    leituras: int
+    consumo_litros: float
+    reabastecimento_litros: float
+    vazao_consumo_lph: float
+    vazao_reabastecimento_lph: float
+
+class ConsumoResponse(BaseModel):
+    sensor_id: str
+    bucket_minutos: int
+    fonte: str
+    consumo_total_litros: float
+    reabastecimento_total_litros: float
+    buckets: List[ConsumoBucket]
+
+class PrevisaoResponse(BaseModel):
+    sensor_id: str
+    leituras_usadas: int
+    nivel_estimado: Optional[int]
+    taxa_percentual_por_hora: Optional[float]
+    vazao_litros_por_hora: Optional[float]
+    horas_ate_vazio: Optional[float]
+    vazio_em: Optional[str]
+    ultima_leitura_em: Optional[str]
+    # Sensor sem leituras há mais que a janela: as estimativas vêm nulas
+    desatualizada: bool = False
+
+class JanelaRequest(BaseModel):
+    unit: Literal["h", "d"]
+    value: int = Field(..., ge=1)
+    # Sem resolução, a série traz as leituras brutas
+    resolucao_minutos: Optional[int] = Field(None, ge=1, le=43200)
+
+class LoteRequest(BaseModel):
+    sensor_id: Optional[str] = Field(None, max_length=64)
+    janelas: List[JanelaRequest] = Field(..., min_length=1, max_length=20)
+
+class PontoSerie(BaseModel):
+    id: Optional[int] = None
+    created_on: str
+    distancia: float
+    nivel: Optional[int]
+    leituras: int = 1
+
+class SerieResponse(BaseModel):
+    unit: str
+    value: int
+    resolucao_minutos: Optional[int]
+    fonte: str
+    pontos: List[PontoSerie]
+
+class LoteResponse(BaseModel):
+    sensor_id: str
+    series: List[SerieResponse]
+
+class EstatisticasJanela(BaseModel):
+    leituras: int
+    distancia_min: Optional[float]
+    distancia_max: Optional[float]
+    distancia_media: Optional[float]
+    nivel_min: Optional[int]
+    nivel_max: Optional[int]
+    nivel_medio: Optional[int]
+
+class PontoTendencia(BaseModel):
+    created_on: str
+    nivel: Optional[int]
+
+class SnapshotResponse(BaseModel):
+    sensor_id: str
+    ultima: Optional[LeituraResponse]
+    estatisticas_24h: EstatisticasJanela
+    tendencia: List[PontoTendencia]
+
+class ResumoEstatistico(BaseModel):
+    min: Optional[float]
+    max: Optional[float]
+    media: Optional[float]
+    desvio_padrao: Optional[float]
+    percentis: Dict[str, float]
+
+class EstatisticasResponse(BaseModel):
+    sensor_id: str
+    inicio: str
+    fim: str
+    metodo: str
+    # Erro relativo máximo dos percentis quando metodo == "aproximado"
+    erro_relativo_percentis: Optional[float] = None
+    leituras: int
+    distancia: ResumoEstatistico
+    nivel: ResumoEstatistico
+
+class EventoResponse(BaseModel):
+    id: int
+    tipo: Literal["reabastecimento", "drenagem", "vazio"]
+    inicio: str
+    fim: Optional[str]
+    em_andamento: bool
+    duracao_minutos: Optional[float]
+    nivel_inicio: Optional[int]
+    nivel_fim: Optional[int]
+    # Litros que entraram (reabastecimento) ou saíram (drenagem); nulo para "vazio"
+    volume_litros: Optional[float]
+
+class EventosResponse(BaseModel):
+    sensor_id: str
+    inicio: str
+    fim: str
+    eventos: List[EventoResponse]
+
+class AlertaResponse(BaseModel):
+    id: int
+    regra_id: int
+    tipo: str
+    inicio: str
+    disparado_em: str
+    resolvido_em: Optional[str]
+    ativo: bool
+    nivel: Optional[float]
+
+class AlertasResponse(BaseModel):
+    sensor_id: str
+    alertas: List[AlertaResponse]
+
+class LacunaResponse(BaseModel):
+    inicio: str
+    fim: Optional[str]
+    em_andamento: bool
+    duracao_minutos: float
+
+class LacunasResponse(BaseModel):
+    sensor_id: str
+    inicio: str
+    fim: str
+    limiar_minutos: float
+    fonte: str
+    tempo_fora_minutos: float
+    lacunas: List[LacunaResponse]
+
+class PeriodoDisponibilidade(BaseModel):
+    inicio: str
+    fim: str
+    disponibilidade_percentual: float
+    tempo_fora_minutos: float
+    lacunas: int
+
+class DisponibilidadeResponse(BaseModel):
+    sensor_id: str
+    inicio: str
+    fim: str
+    limiar_minutos: float
+    fonte: str
+    primeira_leitura: Optional[str]
+    disponibilidade_percentual: Optional[float]
+    tempo_fora_minutos: float
+    periodos: List[PeriodoDisponibilidade]
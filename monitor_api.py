@@ -0,0 +1,130 @@
+# monitor_api.py
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import asc, func
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from models_api import Leitura as LeituraSQLAlchemy
+
+
+@dataclass(frozen=True)
+class LeituraNova:
+    """Cópia leve de uma leitura recém-gravada, repassada aos assinantes do monitor."""
+    id: int
+    sensor_id: str
+    distancia: float
+    created_on: datetime
+
+
+Assinante = Callable[[List[LeituraNova]], None]
+
+
+class MonitorLeituras:
+    """Acompanha as leituras gravadas pelo publicador do sensor.
+
+    As leituras chegam ao banco por outro processo, então o monitor consulta
+    periodicamente as linhas com `id` maior que o último visto (busca pela
+    chave primária) e repassa o lote, em ordem de id, a cada assinante. Os
+    assinantes rodam na thread do ciclo de consulta, um de cada vez.
+
+    Depois de cada lote, acorda as requisições paradas em `aguardar_nova`.
+    """
+
+    def __init__(self, fabrica_sessao: Callable[[], Session], intervalo_segundos: Callable[[], float], lote_maximo: int = 5000):
+        self._fabrica_sessao = fabrica_sessao
+        self._intervalo_segundos = intervalo_segundos
+        self.lote_maximo = lote_maximo
+        self.ultimo_id: Optional[int] = None
+        self.ultima_por_sensor: Dict[str, LeituraNova] = {}
+        self._assinantes: List[Assinante] = []
+        self._tarefa: Optional[asyncio.Task] = None
+        self._novidade = asyncio.Event()
+
+    def assinar(self, assinante: Assinante) -> None:
+        """Registra uma função que recebe cada lote de leituras novas."""
+        self._assinantes.append(assinante)
+
+    def _posicionar(self) -> None:
+        with self._fabrica_sessao() as db:
+            self.ultimo_id = db.query(func.max(LeituraSQLAlchemy.id)).scalar() or 0
+
+    def processar_novas(self) -> List[LeituraNova]:
+        """Busca as leituras posteriores à última vista e notifica os assinantes."""
+        if self.ultimo_id is None:
+            self._posicionar()
+        with self._fabrica_sessao() as db:
+            linhas = db.query(
+                LeituraSQLAlchemy.id, LeituraSQLAlchemy.sensor_id,
+                LeituraSQLAlchemy.distancia, LeituraSQLAlchemy.created_on,
+            ).filter(LeituraSQLAlchemy.id > self.ultimo_id)\
+             .order_by(asc(LeituraSQLAlchemy.id))\
+             .limit(self.lote_maximo)\
+             .all()
+        novas = [LeituraNova(*linha) for linha in linhas]
+        if not novas:
+            return novas
+
+        self.ultimo_id = novas[-1].id
+        for leitura in novas:
+            self.ultima_por_sensor[leitura.sensor_id] = leitura
+        for assinante in self._assinantes:
+            try:
+                assinante(novas)
+            except Exception as e:
+                print(f"[Monitor] Erro no assinante {getattr(assinante, '__qualname__', assinante)}: {e}")
+        return novas
+
+    def _avisar(self) -> None:
+        """Acorda quem espera em `aguardar_nova`; um evento novo fica para o próximo lote."""
+        evento, self._novidade = self._novidade, asyncio.Event()
+        evento.set()
+
+    async def aguardar_nova(self, sensor_id: str, apos_id: int, timeout: float) -> Optional[LeituraNova]:
+        """Espera até o monitor ver uma leitura do sensor com id maior que `apos_id`.
+
+        A espera é só um evento no loop: não segura conexão com o banco nem thread.
+        Devolve None se o prazo acabar antes.
+        """
+        loop = asyncio.get_running_loop()
+        prazo = loop.time() + timeout
+        while True:
+            ultima = self.ultima_por_sensor.get(sensor_id)
+            if ultima is not None and ultima.id > apos_id:
+                return ultima
+            restante = prazo - loop.time()
+            if restante <= 0:
+                return None
+            try:
+                await asyncio.wait_for(self._novidade.wait(), restante)
+            except asyncio.TimeoutError:
+                return None
+
+    async def _executar(self) -> None:
+        while True:
+            try:
+                novas = await run_in_threadpool(self.processar_novas)
+                if novas:
+                    self._avisar()
+                # Lote cheio: ainda há atraso a recuperar, consulta de novo sem esperar
+                if len(novas) >= self.lote_maximo:
+                    continue
+            except Exception as e:
+                print(f"[Monitor] Erro ao buscar novas leituras: {e}")
+            await asyncio.sleep(self._intervalo_segundos())
+
+    def iniciar(self) -> None:
+        if self._tarefa is None:
+            self._tarefa = asyncio.get_running_loop().create_task(self._executar())
+
+    async def parar(self) -> None:
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+            self._tarefa = None
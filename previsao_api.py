@@ -0,0 +1,144 @@
+# previsao_api.py
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import asc, desc
+from sqlalchemy.orm import Session
+
+from models_api import Leitura as LeituraSQLAlchemy
+from monitor_api import LeituraNova
+
+
+class RegressaoIncremental:
+    """Mínimos quadrados da distância em função do tempo sobre uma janela deslizante.
+
+    Mantém as somas (n, Σt, Σy, Σt², Σty), então incluir ou expirar um ponto e
+    obter o ajuste custam O(1). Um degrau de reabastecimento reinicia a janela,
+    pois a tendência anterior a ele não vale mais.
+    """
+
+    def __init__(self, janela: timedelta, limiar_reabastecimento_cm: float):
+        self.janela_horas = janela.total_seconds() / 3600
+        self.limiar_reabastecimento_cm = limiar_reabastecimento_cm
+        self.ultimo_instante: Optional[datetime] = None
+        self._pontos: deque = deque()
+        self._origem: Optional[datetime] = None
+        self._ultima_distancia: Optional[float] = None
+        self._zerar_somas()
+
+    def _zerar_somas(self) -> None:
+        self.n = 0
+        self._st = self._sy = self._stt = self._sty = 0.0
+
+    def _horas(self, instante: datetime) -> float:
+        return (instante - self._origem).total_seconds() / 3600
+
+    def adicionar(self, instante: datetime, distancia: float) -> None:
+        reabasteceu = (
+            self._ultima_distancia is not None
+            and self._ultima_distancia - distancia > self.limiar_reabastecimento_cm
+        )
+        if self._origem is None or reabasteceu:
+            self._pontos.clear()
+            self._zerar_somas()
+            self._origem = instante
+        self._ultima_distancia = distancia
+        self.ultimo_instante = instante
+
+        t = self._horas(instante)
+        self._pontos.append((t, distancia))
+        self.n += 1
+        self._st += t
+        self._sy += distancia
+        self._stt += t * t
+        self._sty += t * distancia
+
+        while self._pontos and self._pontos[0][0] < t - self.janela_horas:
+            t_antigo, y_antigo = self._pontos.popleft()
+            self.n -= 1
+            self._st -= t_antigo
+            self._sy -= y_antigo
+            self._stt -= t_antigo * t_antigo
+            self._sty -= t_antigo * y_antigo
+
+    def desatualizado(self, instante: datetime) -> bool:
+        """Sem leitura dentro da janela até `instante`: a tendência guardada já não diz nada sobre agora."""
+        return self.ultimo_instante is not None and (instante - self.ultimo_instante).total_seconds() / 3600 > self.janela_horas
+
+    def ajuste(self, instante: datetime) -> Optional[Tuple[float, float]]:
+        """(inclinação em cm/h, distância estimada no instante); None sem pontos suficientes ou com o sensor parado."""
+        if self.n < 2 or self.desatualizado(instante):
+            return None
+        variancia = self.n * self._stt - self._st * self._st
+        if variancia <= 0:
+            return None
+        inclinacao = (self.n * self._sty - self._st * self._sy) / variancia
+        intercepto = (self._sy - inclinacao * self._st) / self.n
+        return inclinacao, intercepto + inclinacao * self._horas(instante)
+
+
+class PrevisoesAoVivo:
+    """Um modelo de regressão por sensor, aquecido na primeira consulta e avançado pelo monitor.
+
+    No máximo `tamanho_maximo` sensores ficam em memória; os mais antigos saem primeiro.
+    """
+
+    def __init__(
+        self, fabrica_sessao: Callable[[], Session], janela: Callable[[], timedelta], limiar_reabastecimento_cm: float,
+        tamanho_maximo: int = 10000,
+    ):
+        self.tamanho_maximo = tamanho_maximo
+        self._fabrica_sessao = fabrica_sessao
+        self._janela = janela
+        self._limiar = limiar_reabastecimento_cm
+        self._modelos: Dict[str, Tuple[RegressaoIncremental, int]] = {}
+        self._trava = threading.Lock()
+
+    def modelo(self, sensor_id: str) -> RegressaoIncremental:
+        estado = self._modelos.get(sensor_id)
+        if estado is None:
+            estado = self._aquecer(sensor_id)
+        return estado[0]
+
+    def _aquecer(self, sensor_id: str) -> Tuple[RegressaoIncremental, int]:
+        with self._trava:
+            estado = self._modelos.get(sensor_id)
+            if estado is not None:
+                return estado
+            janela = self._janela()
+            with self._fabrica_sessao() as db:
+                ultima = db.query(LeituraSQLAlchemy.created_on)\
+                           .filter(LeituraSQLAlchemy.sensor_id == sensor_id)\
+                           .order_by(desc(LeituraSQLAlchemy.created_on))\
+                           .limit(1)\
+                           .scalar()
+                linhas = []
+                if ultima is not None:
+                    linhas = db.query(LeituraSQLAlchemy.id, LeituraSQLAlchemy.created_on, LeituraSQLAlchemy.distancia)\
+                               .filter(LeituraSQLAlchemy.sensor_id == sensor_id)\
+                               .filter(LeituraSQLAlchemy.created_on >= ultima - janela)\
+                               .order_by(asc(LeituraSQLAlchemy.created_on))\
+                               .all()
+            modelo = RegressaoIncremental(janela, self._limiar)
+            for _, created_on, distancia in linhas:
+                modelo.adicionar(created_on, distancia)
+            estado = (modelo, max((linha[0] for linha in linhas), default=0))
+            while len(self._modelos) >= self.tamanho_maximo:
+                self._modelos.pop(next(iter(self._modelos)), None)
+            self._modelos[sensor_id] = estado
+            return estado
+
+    def ao_receber(self, novas: List[LeituraNova]) -> None:
+        """Assinante do monitor: inclui as leituras novas nos modelos já aquecidos."""
+        with self._trava:
+            for leitura in novas:
+                estado = self._modelos.get(leitura.sensor_id)
+                if estado is not None and leitura.id > estado[1]:
+                    estado[0].adicionar(leitura.created_on, leitura.distancia)
+                    self._modelos[leitura.sensor_id] = (estado[0], leitura.id)
+
+    def limpar(self) -> None:
+        with self._trava:
+            self._modelos.clear()
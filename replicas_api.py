@@ -0,0 +1,180 @@
+# replicas_api.py
+import asyncio
+import itertools
+import threading
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine, make_url
+from starlette.concurrency import run_in_threadpool
+
+ESTRATEGIAS = ("round_robin", "menos_conexoes")
+
+# Estado do receptor de WAL e atraso de replicação em segundos. Sem nada pendente para aplicar o
+# atraso é 0, mesmo que a última transação aplicada seja antiga (primário ocioso); por isso só vale
+# com o receptor conectado: desconectado, o LSN recebido para e a réplica "alcança" um ponto velho.
+# Ler status/last_msg_receipt_time exige pg_read_all_stats (ou pg_monitor) na réplica.
+_SQL_ATRASO = text("""
+    SELECT pg_is_in_recovery(), receptor.pid IS NOT NULL, receptor.status,
+           extract(epoch FROM now() - receptor.last_msg_receipt_time),
+           CASE
+               WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+               ELSE COALESCE(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+           END
+    FROM (SELECT 1) AS um LEFT JOIN pg_stat_wal_receiver AS receptor ON true
+""")
+
+
+def avaliar_atraso(linha: tuple, silencio_maximo: float) -> float:
+    """Atraso em segundos a partir da linha de `_SQL_ATRASO`; RuntimeError se a réplica não recebe WAL do primário."""
+    em_recuperacao, tem_receptor, status, silencio, atraso = linha
+    if not em_recuperacao:
+        # Não é réplica (ex.: o próprio primário listado): não tem atraso
+        return 0.0
+    if not tem_receptor:
+        raise RuntimeError("sem receptor de WAL (desconectada do primário)")
+    if status is None:
+        raise RuntimeError("sem permissão para ler pg_stat_wal_receiver (conceda pg_monitor ao usuário)")
+    if status != "streaming":
+        raise RuntimeError(f"receptor de WAL em '{status}'")
+    if silencio is None:
+        raise RuntimeError("receptor de WAL ainda sem mensagens do primário")
+    if float(silencio) > silencio_maximo:
+        raise RuntimeError(f"nenhuma mensagem do primário há {float(silencio):.0f} s")
+    return float(atraso)
+
+
+class Replica:
+    """Engines de uma réplica de leitura e o último atraso medido (None: fora do ar ou não verificada).
+
+    `engine` é a de autocommit das consultas comuns; `engine_transacional` abre
+    transação (somente leitura), exigida pelos cursores nomeados das exportações.
+    """
+
+    def __init__(self, url: str, engine: Engine, engine_transacional: Engine):
+        self.url = url
+        self.engine = engine
+        self.engine_transacional = engine_transacional
+        self.atraso: Optional[float] = None
+        self.erro: Optional[str] = None
+
+    @property
+    def nome(self) -> str:
+        return make_url(self.url).render_as_string(hide_password=True)
+
+    def conexoes(self) -> int:
+        return self.engine.pool.checkedout() + self.engine_transacional.pool.checkedout()
+
+
+class Replicas:
+    """Réplicas de leitura do Postgres, escolhidas por round-robin ou menos conexões em uso.
+
+    Um ciclo em segundo plano mede o atraso de replicação de cada réplica; as que
+    estão acima de `atraso_maximo`, não respondem ou não estão recebendo WAL
+    (receptor fora de 'streaming' ou mudo há mais de `silencio_maximo`, acima
+    do keepalive do primário: wal_sender_timeout / 2) saem do rodízio até a
+    próxima verificação. Sem réplica saudável, `escolher` devolve None e quem
+    chamou usa o primário. Escritas nunca passam por aqui.
+
+    `criar_engine(url, transacional=..., **opcoes)` cria as duas engines de cada réplica.
+    """
+
+    def __init__(
+        self, urls: List[str], criar_engine: Callable[..., Engine], estrategia: str = "round_robin",
+        atraso_maximo: float = 5.0, intervalo_segundos: float = 5.0, silencio_maximo: float = 60.0, **opcoes_engine,
+    ):
+        if estrategia not in ESTRATEGIAS:
+            raise ValueError(f"Estratégia de réplica inválida: '{estrategia}'. Use {', '.join(ESTRATEGIAS)}.")
+        self._criar_engine = criar_engine
+        self.estrategia = estrategia
+        self.atraso_maximo = atraso_maximo
+        self.silencio_maximo = silencio_maximo
+        self.intervalo_segundos = intervalo_segundos
+        self.replicas = [
+            Replica(url, criar_engine(url, **opcoes_engine), criar_engine(url, transacional=True, **opcoes_engine))
+            for url in urls
+        ]
+        self._saudaveis: List[Replica] = []
+        self._rodizio = itertools.count()
+        self._trava = threading.Lock()
+        self._tarefa: Optional[asyncio.Task] = None
+
+    def verificar(self) -> None:
+        """Mede o atraso de cada réplica e refaz a lista das que podem receber leituras."""
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as conexao:
+                    linha = conexao.execute(_SQL_ATRASO).one()
+                replica.atraso, replica.erro = avaliar_atraso(tuple(linha), self.silencio_maximo), None
+            except Exception as e:
+                if replica.erro is None:
+                    print(f"[Replicas] {replica.nome} fora do rodízio: {e}")
+                replica.atraso, replica.erro = None, str(e).splitlines()[0]
+        saudaveis = [r for r in self.replicas if r.atraso is not None and r.atraso <= self.atraso_maximo]
+        with self._trava:
+            self._saudaveis = saudaveis
+
+    def escolher(self, transacional: bool = False) -> Optional[Engine]:
+        """Engine da réplica para uma leitura, ou None se nenhuma está em dia."""
+        with self._trava:
+            saudaveis = self._saudaveis
+            if not saudaveis:
+                return None
+            if self.estrategia == "menos_conexoes":
+                # Empate: o rodízio decide, para não concentrar tudo na primeira
+                inicio = next(self._rodizio)
+                ordem = saudaveis[inicio % len(saudaveis):] + saudaveis[:inicio % len(saudaveis)]
+                replica = min(ordem, key=Replica.conexoes)
+            else:
+                replica = saudaveis[next(self._rodizio) % len(saudaveis)]
+        return replica.engine_transacional if transacional else replica.engine
+
+    def reconfigurar(self, **opcoes_engine) -> None:
+        """Recria as engines (ex.: novo tamanho de pool), mantendo o último atraso medido."""
+        for replica in self.replicas:
+            antigo, antigo_transacional = replica.engine, replica.engine_transacional
+            replica.engine = self._criar_engine(replica.url, echo=antigo.echo, **opcoes_engine)
+            replica.engine_transacional = self._criar_engine(
+                replica.url, transacional=True, echo=antigo_transacional.echo, **opcoes_engine
+            )
+            antigo.dispose()
+            antigo_transacional.dispose()
+
+    def definir_echo(self, echo: bool) -> None:
+        for replica in self.replicas:
+            replica.engine.echo = echo
+            replica.engine_transacional.echo = echo
+
+    def estado(self) -> Dict[str, dict]:
+        with self._trava:
+            saudaveis = set(map(id, self._saudaveis))
+        return {
+            replica.nome: {
+                "atraso_segundos": replica.atraso,
+                "em_uso": id(replica) in saudaveis,
+                "conexoes": replica.conexoes(),
+                **({"erro": replica.erro} if replica.erro else {}),
+            }
+            for replica in self.replicas
+        }
+
+    async def _executar(self) -> None:
+        while True:
+            try:
+                await run_in_threadpool(self.verificar)
+            except Exception as e:
+                print(f"[Replicas] Erro ao verificar o atraso: {e}")
+            await asyncio.sleep(self.intervalo_segundos)
+
+    def iniciar(self) -> None:
+        if self.replicas and self._tarefa is None:
+            self._tarefa = asyncio.get_running_loop().create_task(self._executar())
+
+    async def parar(self) -> None:
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+            self._tarefa = None
@@ -0,0 +1,208 @@
+# rollups_api.py
+import os
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Callable, Dict, List, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+
+from models_api import RollupHora
+from monitor_api import LeituraNova
+from sketch_api import CHAVE_ZERO, DDSketch
+
+load_dotenv()
+
+# Entram nos agregados gravados: ao alterar, reconstrua os rollups (python rollups_api.py)
+LACUNA_MAXIMA_MINUTOS = float(os.getenv("LACUNA_MAXIMA_MINUTOS", "15"))
+LIMIAR_REABASTECIMENTO_CM = float(os.getenv("LIMIAR_REABASTECIMENTO_CM", "2"))
+SKETCH_PRECISAO_RELATIVA = float(os.getenv("SKETCH_PRECISAO_RELATIVA", "0.01"))
+
+UMA_HORA = timedelta(hours=1)
+
+# Leituras com a diferença para a anterior. Diferenças após uma lacuna maior que
+# :lacuna_segundos não são atribuídas (não se sabe o que aconteceu no intervalo).
+# Uma leitura anterior a :inicio entra só para fornecer a primeira diferença.
+_SQL_DIFERENCAS = """
+    SELECT created_on, distancia,
+           to_timestamp(floor(extract(epoch FROM created_on) / :passo) * :passo) AS bucket,
+           distancia - lag(distancia) OVER w AS dif,
+           extract(epoch FROM created_on - lag(created_on) OVER w) <= :lacuna_segundos AS valido
+    FROM leituras
+    WHERE sensor_id = :sensor_id
+      AND created_on >= CAST(:inicio AS timestamptz) - make_interval(secs => :lacuna_segundos)
+      AND created_on < :fim
+    WINDOW w AS (ORDER BY created_on)
+"""
+
+# Distância aumentando = nível caindo = consumo. Quedas de distância maiores que o
+# limiar são degraus de reabastecimento; as demais diferenças somam-se e o ruído se cancela.
+_SQL_SOMAS_VARIACAO = """
+    coalesce(sum(dif) FILTER (WHERE valido AND dif >= -:limiar), 0) AS variacao_cm,
+    coalesce(sum(-dif) FILTER (WHERE valido AND dif < -:limiar), 0) AS reabastecimento_cm
+"""
+
+# Bucket do DDSketch de cada distância (mesma conta de DDSketch.indice)
+SQL_INDICE_SKETCH = f"coalesce(CAST(ceil(ln(nullif(greatest(distancia, 0), 0)) / :ln_gama) AS integer)::text, '{CHAVE_ZERO}')"
+
+_SQL_AGREGADOS_HORA = f"""
+    l AS ({_SQL_DIFERENCAS}),
+    agregados AS (
+        SELECT bucket, count(*) AS n, min(distancia) AS distancia_min, max(distancia) AS distancia_max,
+               sum(distancia) AS distancia_soma, sum(distancia * distancia) AS distancia_soma_quadrados,
+               (array_agg(distancia ORDER BY created_on))[1] AS distancia_primeira,
+               (array_agg(distancia ORDER BY created_on DESC))[1] AS distancia_ultima,
+               {_SQL_SOMAS_VARIACAO}
+        FROM l
+        WHERE created_on >= :inicio
+        GROUP BY bucket
+    )
+"""
+
+_SQL_ATUALIZAR_COLUNAS = """
+        n = excluded.n,
+        distancia_min = excluded.distancia_min,
+        distancia_max = excluded.distancia_max,
+        distancia_soma = excluded.distancia_soma,
+        distancia_soma_quadrados = excluded.distancia_soma_quadrados,
+        distancia_primeira = excluded.distancia_primeira,
+        distancia_ultima = excluded.distancia_ultima,
+        variacao_cm = excluded.variacao_cm,
+        reabastecimento_cm = excluded.reabastecimento_cm
+"""
+
+_COLUNAS_ROLLUP = """
+        sensor_id, bucket, n, distancia_min, distancia_max, distancia_soma, distancia_soma_quadrados,
+        distancia_primeira, distancia_ultima, variacao_cm, reabastecimento_cm
+"""
+
+_SQL_ATUALIZAR_ROLLUP = text(f"""
+    WITH {_SQL_AGREGADOS_HORA}
+    INSERT INTO leituras_rollup_hora AS r ({_COLUNAS_ROLLUP})
+    SELECT :sensor_id, a.* FROM agregados a
+    ON CONFLICT (sensor_id, bucket) DO UPDATE SET {_SQL_ATUALIZAR_COLUNAS}
+""")
+
+# Variante com o sketch de quantis da hora (migração 003)
+_SQL_ATUALIZAR_ROLLUP_COM_SKETCH = text(f"""
+    WITH {_SQL_AGREGADOS_HORA},
+    indices AS (
+        SELECT bucket, {SQL_INDICE_SKETCH} AS indice, count(*) AS c
+        FROM l
+        WHERE created_on >= :inicio
+        GROUP BY 1, 2
+    ),
+    sketches AS (
+        SELECT bucket, jsonb_object_agg(indice, c) AS sketch FROM indices GROUP BY bucket
+    )
+    INSERT INTO leituras_rollup_hora AS r ({_COLUNAS_ROLLUP}, sketch)
+    SELECT :sensor_id, a.*, s.sketch FROM agregados a JOIN sketches s USING (bucket)
+    ON CONFLICT (sensor_id, bucket) DO UPDATE SET {_SQL_ATUALIZAR_COLUNAS}, sketch = excluded.sketch
+""")
+
+_SQL_CONSUMO_BRUTO = text(f"""
+    SELECT bucket, count(*) AS n, {_SQL_SOMAS_VARIACAO}
+    FROM ({_SQL_DIFERENCAS}) l
+    WHERE created_on >= :inicio
+    GROUP BY bucket
+    ORDER BY bucket
+""")
+
+_SQL_CONSUMO_ROLLUP = text("""
+    SELECT to_timestamp(floor(extract(epoch FROM bucket) / :passo) * :passo) AS bucket,
+           sum(n) AS n, sum(variacao_cm) AS variacao_cm, sum(reabastecimento_cm) AS reabastecimento_cm
+    FROM leituras_rollup_hora
+    WHERE sensor_id = :sensor_id AND bucket >= :inicio AND bucket < :fim
+    GROUP BY 1
+    ORDER BY 1
+""")
+
+
+def alinhar(instante: datetime, passo_segundos: int) -> datetime:
+    """Arredonda o instante para baixo até o início do bucket (buckets alinhados à época Unix)."""
+    epoch = int(instante.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % passo_segundos, tz=dt_timezone.utc)
+
+
+def _parametros(sensor_id: str, inicio: datetime, fim: datetime, passo_segundos: int) -> dict:
+    return {
+        "sensor_id": sensor_id, "inicio": inicio, "fim": fim, "passo": passo_segundos,
+        "lacuna_segundos": LACUNA_MAXIMA_MINUTOS * 60, "limiar": LIMIAR_REABASTECIMENTO_CM,
+        "ln_gama": novo_sketch().ln_gama,
+    }
+
+
+def novo_sketch() -> DDSketch:
+    """Sketch vazio com a mesma precisão dos sketches gravados nos rollups."""
+    return DDSketch(SKETCH_PRECISAO_RELATIVA)
+
+
+class Rollups:
+    """Agregados horários por sensor, usados quando a tabela existe.
+
+    A cada lote do monitor, as horas tocadas são recalculadas a partir das
+    leituras brutas; o recálculo é idempotente, então vários workers podem
+    mantê-lo ao mesmo tempo.
+    """
+
+    def __init__(self, fabrica_sessao: Callable[[], Session]):
+        self._fabrica_sessao = fabrica_sessao
+        self.disponivel = False
+        self.com_sketch = False
+
+    def verificar_tabela(self) -> bool:
+        with self._fabrica_sessao() as db:
+            inspetor = inspect(db.get_bind())
+            self.disponivel = inspetor.has_table(RollupHora.__tablename__)
+            self.com_sketch = self.disponivel and any(
+                coluna["name"] == "sketch" for coluna in inspetor.get_columns(RollupHora.__tablename__)
+            )
+        return self.disponivel
+
+    def atualizar(self, db: Session, sensor_id: str, inicio: datetime, fim: datetime) -> None:
+        """Recalcula as horas de [inicio, fim) do sensor."""
+        sql = _SQL_ATUALIZAR_ROLLUP_COM_SKETCH if self.com_sketch else _SQL_ATUALIZAR_ROLLUP
+        db.execute(sql, _parametros(sensor_id, alinhar(inicio, 3600), fim, 3600))
+
+    def ao_receber(self, novas: List[LeituraNova]) -> None:
+        """Assinante do monitor: atualiza as horas que receberam leituras."""
+        if not self.disponivel:
+            return
+        faixas: Dict[str, Tuple[datetime, datetime]] = {}
+        for leitura in novas:
+            inicio, fim = faixas.get(leitura.sensor_id, (leitura.created_on, leitura.created_on))
+            faixas[leitura.sensor_id] = (min(inicio, leitura.created_on), max(fim, leitura.created_on))
+        with self._fabrica_sessao() as db:
+            for sensor_id, (inicio, fim) in faixas.items():
+                self.atualizar(db, sensor_id, inicio, alinhar(fim, 3600) + UMA_HORA)
+            db.commit()
+
+    def variacoes(self, db: Session, sensor_id: str, inicio: datetime, fim: datetime, passo_segundos: int) -> Tuple[str, list]:
+        """Soma das variações e dos reabastecimentos (cm) por bucket, usando rollups quando possível."""
+        usar_rollup = self.disponivel and passo_segundos % 3600 == 0
+        sql = _SQL_CONSUMO_ROLLUP if usar_rollup else _SQL_CONSUMO_BRUTO
+        linhas = db.execute(sql, _parametros(sensor_id, inicio, fim, passo_segundos)).all()
+        return ("rollup" if usar_rollup else "bruto"), linhas
+
+
+def reconstruir_tudo(fabrica_sessao: Callable[[], Session], dias_por_lote: int = 30) -> None:
+    """Recalcula os rollups de todo o histórico, sensor por sensor."""
+    rollups = Rollups(fabrica_sessao)
+    rollups.verificar_tabela()
+    with fabrica_sessao() as db:
+        faixas = db.execute(text(
+            "SELECT sensor_id, min(created_on), max(created_on) FROM leituras GROUP BY sensor_id"
+        )).all()
+        for sensor_id, primeira, ultima in faixas:
+            inicio = alinhar(primeira, 3600)
+            while inicio <= ultima:
+                fim = inicio + timedelta(days=dias_por_lote)
+                rollups.atualizar(db, sensor_id, inicio, fim)
+                db.commit()
+                inicio = fim
+            print(f"[Rollups] Sensor '{sensor_id}' reconstruído até {ultima.isoformat()}.")
+
+
+if __name__ == "__main__":
+    from database_api import SessionLocal
+    reconstruir_tudo(SessionLocal)
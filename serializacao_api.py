@@ -0,0 +1,55 @@
+# serializacao_api.py
+import json
+from functools import lru_cache
+from typing import Any, List, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+from typing_extensions import TypedDict
+
+# orjson é opcional: sem ele, cai no json da biblioteca padrão com a mesma saída
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    print("[Serializacao] orjson não instalado: usando o json da biblioteca padrão (mais lento).")
+
+
+def _padrao_orjson(valor: Any) -> Any:
+    """Tipos que o orjson não conhece (modelos Pydantic, Decimal, ...)."""
+    if isinstance(valor, BaseModel):
+        return valor.model_dump(mode="json")
+    return jsonable_encoder(valor)
+
+
+def para_json(conteudo: Any) -> bytes:
+    """Serializa em JSON compacto (UTF-8, sem NaN), com orjson quando disponível."""
+    if orjson is not None:
+        return orjson.dumps(conteudo, default=_padrao_orjson)
+    return json.dumps(
+        jsonable_encoder(conteudo), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class RespostaJSON(JSONResponse):
+    """Resposta JSON padrão da API, renderizada por `para_json`."""
+
+    def render(self, content: Any) -> bytes:
+        return para_json(content)
+
+
+@lru_cache(maxsize=None)
+def adaptador_lista(modelo: type, campos: Tuple[str, ...]) -> TypeAdapter:
+    """TypeAdapter de uma lista de dicts com os `campos` do modelo, criado uma vez por combinação.
+
+    A lista inteira é validada e serializada de uma vez pelo pydantic-core, sem
+    instanciar um modelo por item.
+    """
+    item = TypedDict(f"{modelo.__name__}Item", {campo: modelo.model_fields[campo].annotation for campo in campos})
+    return TypeAdapter(List[item])
+
+
+def lista_para_json(adaptador: TypeAdapter, itens: list) -> bytes:
+    """Valida a lista inteira e já devolve o JSON."""
+    return adaptador.dump_json(adaptador.validate_python(itens))
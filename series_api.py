@@ -0,0 +1,117 @@
+# series_api.py
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import asc
+from sqlalchemy.orm import Session
+
+from models_api import Leitura as LeituraSQLAlchemy, RollupHora
+from rollups_api import alinhar
+
+
+@dataclass(frozen=True)
+class Janela:
+    """Uma série pedida: período (unit/value) e resolução em minutos (None = leituras brutas)."""
+    unit: str
+    value: int
+    resolucao_minutos: Optional[int] = None
+
+    def delta(self) -> timedelta:
+        return timedelta(hours=self.value) if self.unit == "h" else timedelta(days=self.value)
+
+    def inicio(self, agora: datetime) -> datetime:
+        if self.resolucao_minutos is None:
+            return agora - self.delta()
+        return alinhar(agora - self.delta(), self.resolucao_minutos * 60)
+
+
+@dataclass
+class Bucket:
+    """Média da distância em um intervalo [inicio, inicio + passo)."""
+    inicio: datetime
+    distancia: float
+    leituras: int
+
+
+def agregar_brutas(instantes: Sequence[datetime], distancias: Sequence[float], inicio: datetime, passo_segundos: int) -> List[Bucket]:
+    """Média por bucket de leituras já ordenadas por data, a partir de `inicio`."""
+    buckets: List[Bucket] = []
+    atual: Optional[datetime] = None
+    soma, n = 0.0, 0
+    for i in range(bisect_left(instantes, inicio), len(instantes)):
+        bucket = alinhar(instantes[i], passo_segundos)
+        if bucket != atual:
+            if n:
+                buckets.append(Bucket(atual, soma / n, n))
+            atual, soma, n = bucket, 0.0, 0
+        soma += distancias[i]
+        n += 1
+    if n:
+        buckets.append(Bucket(atual, soma / n, n))
+    return buckets
+
+
+def reagrupar_rollups(linhas: Sequence[Tuple[datetime, int, float]], inicio: datetime, passo_segundos: int) -> List[Bucket]:
+    """Junta rollups horários (bucket, n, soma) em buckets de `passo_segundos` a partir de `inicio`."""
+    somas: Dict[datetime, List[float]] = {}
+    for bucket, n, soma in linhas:
+        if bucket < inicio:
+            continue
+        acumulado = somas.setdefault(alinhar(bucket, passo_segundos), [0, 0.0])
+        acumulado[0] += n
+        acumulado[1] += soma
+    return [Bucket(b, soma / n, int(n)) for b, (n, soma) in sorted(somas.items()) if n]
+
+
+def usa_rollup(janela: Janela, rollups_disponiveis: bool) -> bool:
+    return rollups_disponiveis and janela.resolucao_minutos is not None and janela.resolucao_minutos % 60 == 0
+
+
+def consultar_janelas(db: Session, sensor_id: str, janelas: Sequence[Janela], rollups_disponiveis: bool, agora: Optional[datetime] = None):
+    """Responde várias janelas com no máximo duas consultas.
+
+    As janelas com resolução em horas cheias saem de uma única leitura dos
+    rollups (a da janela mais larga); as demais, de uma única leitura das
+    leituras brutas, fatiada e agregada em memória para cada janela.
+    Retorna, na ordem pedida, pares (fonte, pontos) onde pontos são tuplas
+    (id, created_on, distancia) para séries brutas ou `Bucket` para agregadas.
+    """
+    agora = agora or datetime.now(dt_timezone.utc)
+    de_rollup = [j for j in janelas if usa_rollup(j, rollups_disponiveis)]
+    de_brutas = [j for j in janelas if not usa_rollup(j, rollups_disponiveis)]
+
+    linhas_rollup: List[Tuple[datetime, int, float]] = []
+    if de_rollup:
+        inicio = min(j.inicio(agora) for j in de_rollup)
+        linhas_rollup = db.query(RollupHora.bucket, RollupHora.n, RollupHora.distancia_soma)\
+                          .filter(RollupHora.sensor_id == sensor_id)\
+                          .filter(RollupHora.bucket >= inicio)\
+                          .order_by(asc(RollupHora.bucket))\
+                          .all()
+
+    ids: List[int] = []
+    instantes: List[datetime] = []
+    distancias: List[float] = []
+    if de_brutas:
+        inicio = min(j.inicio(agora) for j in de_brutas)
+        linhas = db.query(LeituraSQLAlchemy.id, LeituraSQLAlchemy.created_on, LeituraSQLAlchemy.distancia)\
+                   .filter(LeituraSQLAlchemy.sensor_id == sensor_id)\
+                   .filter(LeituraSQLAlchemy.created_on >= inicio)\
+                   .order_by(asc(LeituraSQLAlchemy.created_on))\
+                   .all()
+        if linhas:
+            ids, instantes, distancias = (list(coluna) for coluna in zip(*linhas))
+
+    resultado = []
+    for janela in janelas:
+        inicio = janela.inicio(agora)
+        if usa_rollup(janela, rollups_disponiveis):
+            resultado.append(("rollup", reagrupar_rollups(linhas_rollup, inicio, janela.resolucao_minutos * 60)))
+        elif janela.resolucao_minutos is None:
+            i = bisect_left(instantes, inicio)
+            resultado.append(("bruto", list(zip(ids[i:], instantes[i:], distancias[i:]))))
+        else:
+            resultado.append(("bruto", agregar_brutas(instantes, distancias, inicio, janela.resolucao_minutos * 60)))
+    return resultado
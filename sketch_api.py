@@ -0,0 +1,77 @@
+# sketch_api.py
+import math
+from typing import Dict, Iterable, Optional, Tuple
+
+# Chave usada para valores <= 0, que não têm logaritmo
+CHAVE_ZERO = "z"
+
+
+class DDSketch:
+    """Sketch de quantis com erro relativo limitado (DDSketch).
+
+    Cada valor x > 0 cai no bucket ceil(log_gama(x)); qualquer quantil estimado
+    fica a no máximo `precisao_relativa` do valor exato. Sketches com a mesma
+    precisão se combinam somando as contagens, o que permite guardar um por
+    hora e juntar só os buckets da janela pedida.
+    """
+
+    def __init__(self, precisao_relativa: float = 0.01):
+        self.precisao_relativa = precisao_relativa
+        self.gama = (1 + precisao_relativa) / (1 - precisao_relativa)
+        self.ln_gama = math.log(self.gama)
+        self.contagens: Dict[int, int] = {}
+        self.zeros = 0
+        self.n = 0
+
+    def indice(self, valor: float) -> int:
+        return math.ceil(math.log(valor) / self.ln_gama)
+
+    def estimar(self, indice: int) -> float:
+        """Valor representativo do bucket (erro relativo <= precisao_relativa)."""
+        return 2 * self.gama ** indice / (self.gama + 1)
+
+    def adicionar(self, valor: float, contagem: int = 1) -> None:
+        if valor > 0:
+            i = self.indice(valor)
+            self.contagens[i] = self.contagens.get(i, 0) + contagem
+        else:
+            self.zeros += contagem
+        self.n += contagem
+
+    def mesclar(self, contagens: Iterable[Tuple[str, int]]) -> None:
+        """Soma contagens serializadas (chave do bucket em texto, contagem), como guardadas no banco."""
+        for chave, contagem in contagens:
+            contagem = int(contagem)
+            if chave == CHAVE_ZERO:
+                self.zeros += contagem
+            else:
+                i = int(chave)
+                self.contagens[i] = self.contagens.get(i, 0) + contagem
+            self.n += contagem
+
+    def buckets(self) -> Iterable[Tuple[float, int]]:
+        """Pares (valor representativo, contagem) em ordem crescente de valor."""
+        if self.zeros:
+            yield 0.0, self.zeros
+        for i in sorted(self.contagens):
+            yield self.estimar(i), self.contagens[i]
+
+    def quantis(self, qs: Iterable[float]) -> Dict[float, Optional[float]]:
+        """Estima vários quantis em uma só passada pelos buckets."""
+        pedidos = sorted(set(qs))
+        if not self.n:
+            return {q: None for q in pedidos}
+        resultado: Dict[float, Optional[float]] = {}
+        acumulado = 0
+        pendentes = iter(pedidos)
+        q = next(pendentes, None)
+        for valor, contagem in self.buckets():
+            acumulado += contagem
+            while q is not None and acumulado > q * (self.n - 1):
+                resultado[q] = valor
+                q = next(pendentes, None)
+        while q is not None:
+            resultado[q] = valor
+            q = next(pendentes, None)
+        return resultado
+
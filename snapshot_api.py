@@ -0,0 +1,43 @@
+# snapshot_api.py
+from datetime import datetime, timedelta
+from typing import Any, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Última leitura, estatísticas e tendência da janela em uma única ida ao banco
+_SQL_SNAPSHOT = text("""
+    WITH ultima AS (
+        SELECT id, distancia, created_on
+        FROM leituras
+        WHERE sensor_id = :sensor_id
+        ORDER BY created_on DESC
+        LIMIT 1
+    ), janela AS (
+        SELECT created_on, distancia
+        FROM leituras
+        WHERE sensor_id = :sensor_id AND created_on >= :inicio
+    ), estatisticas AS (
+        SELECT count(*) AS n, min(distancia) AS minimo, max(distancia) AS maximo, avg(distancia) AS media
+        FROM janela
+    ), tendencia AS (
+        SELECT to_timestamp(floor(extract(epoch FROM created_on) / :passo) * :passo) AS bucket,
+               avg(distancia) AS distancia
+        FROM janela
+        GROUP BY 1
+    )
+    SELECT u.id, u.distancia, u.created_on, e.n, e.minimo, e.maximo, e.media,
+           (SELECT coalesce(json_agg(json_build_array(extract(epoch FROM t.bucket), t.distancia) ORDER BY t.bucket), '[]')
+            FROM tendencia t) AS tendencia
+    FROM estatisticas e
+    LEFT JOIN ultima u ON true
+""")
+
+
+def consultar_snapshot(db: Session, sensor_id: str, agora: datetime, janela: timedelta, pontos_tendencia: int) -> Tuple[Any, ...]:
+    """Retorna (id, distancia, created_on, n, minimo, maximo, media, tendencia) da janela do sensor.
+
+    `tendencia` é uma lista de pares [epoch do bucket, distância média].
+    """
+    passo = max(60, int(janela.total_seconds() // pontos_tendencia))
+    return db.execute(_SQL_SNAPSHOT, {"sensor_id": sensor_id, "inicio": agora - janela, "passo": passo}).one()
@@ -0,0 +1,146 @@
+# sparkline_api.py
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from calibracao_api import Calibracao
+from monitor_api import LeituraNova
+
+# Soma e contagem por bucket da janela, e o maior id já contado
+_SQL_BUCKETS = text("""
+    SELECT CAST(floor(extract(epoch FROM created_on) / :passo) * :passo AS bigint) AS bucket,
+           count(*), sum(distancia), max(id)
+    FROM leituras
+    WHERE sensor_id = :sensor_id AND created_on >= :inicio
+    GROUP BY 1
+""")
+
+
+class Sparklines:
+    """Minigráfico SVG do nível nas últimas horas, a partir de médias por bucket mantidas em memória.
+
+    Os buckets de um sensor são lidos do banco uma vez (agregados no Postgres) e
+    depois cada leitura nova do monitor só soma no seu bucket; gerar o SVG não
+    consulta o banco. No máximo `tamanho_maximo` sensores ficam em memória; os
+    mais antigos saem primeiro.
+    """
+
+    def __init__(
+        self, fabrica_sessao: Callable[[], Session], janela: timedelta = timedelta(hours=24), pontos: int = 48,
+        tamanho_maximo: int = 10000,
+    ):
+        self.tamanho_maximo = tamanho_maximo
+        self._fabrica_sessao = fabrica_sessao
+        self.janela = janela
+        self.passo = int(janela.total_seconds() // pontos)
+        # sensor -> ({epoch do bucket: [n, soma]}, maior id contado)
+        self._buckets: Dict[str, Tuple[Dict[int, List[float]], int]] = {}
+        # sensor -> leituras do monitor guardadas para cada aquecimento em andamento
+        self._aquecendo: Dict[str, List[List[LeituraNova]]] = {}
+        self._trava = threading.Lock()
+
+    def _aquecer(self, sensor_id: str, agora: datetime) -> Tuple[Dict[int, List[float]], int]:
+        # A consulta roda fora da trava para não parar o monitor; o que ele entregar
+        # nesse meio-tempo fica em `pendentes` e entra no estado ao registrá-lo
+        pendentes: List[LeituraNova] = []
+        with self._trava:
+            estado = self._buckets.get(sensor_id)
+            if estado is not None:
+                return estado
+            self._aquecendo.setdefault(sensor_id, []).append(pendentes)
+        try:
+            with self._fabrica_sessao() as db:
+                linhas = db.execute(_SQL_BUCKETS, {
+                    "sensor_id": sensor_id, "passo": self.passo, "inicio": agora - self.janela,
+                }).all()
+        except Exception:
+            with self._trava:
+                self._encerrar_aquecimento(sensor_id, pendentes)
+            raise
+        with self._trava:
+            self._encerrar_aquecimento(sensor_id, pendentes)
+            estado = self._buckets.get(sensor_id)
+            if estado is not None:
+                # Outra requisição aqueceu o mesmo sensor primeiro
+                return estado
+            buckets = {bucket: [n, soma] for bucket, n, soma, _ in linhas}
+            estado = (buckets, max((ultimo for *_, ultimo in linhas), default=0))
+            for leitura in pendentes:
+                self._somar(estado, leitura)
+            while len(self._buckets) >= self.tamanho_maximo:
+                self._buckets.pop(next(iter(self._buckets)), None)
+            self._buckets[sensor_id] = estado
+            return estado
+
+    def _encerrar_aquecimento(self, sensor_id: str, pendentes: List[LeituraNova]) -> None:
+        restantes = [p for p in self._aquecendo.pop(sensor_id) if p is not pendentes]
+        if restantes:
+            self._aquecendo[sensor_id] = restantes
+
+    def ao_receber(self, novas: List[LeituraNova]) -> None:
+        """Assinante do monitor: soma as leituras novas nos buckets dos sensores já aquecidos."""
+        with self._trava:
+            for leitura in novas:
+                estado = self._buckets.get(leitura.sensor_id)
+                if estado is not None:
+                    self._somar(estado, leitura)
+                else:
+                    for pendentes in self._aquecendo.get(leitura.sensor_id, ()):
+                        pendentes.append(leitura)
+
+    def _somar(self, estado: Tuple[Dict[int, List[float]], int], leitura: LeituraNova) -> None:
+        if leitura.id <= estado[1]:
+            return
+        bucket = int(leitura.created_on.timestamp()) // self.passo * self.passo
+        n_soma = estado[0].get(bucket)
+        if n_soma is None:
+            # Bucket novo: os que saíram da janela vão embora aqui, e não só em `medias`,
+            # senão um sensor aquecido cuja página ninguém abre mais cresce sem limite
+            self._descartar_antigos(estado[0], leitura.created_on)
+            n_soma = estado[0][bucket] = [0, 0.0]
+        n_soma[0] += 1
+        n_soma[1] += leitura.distancia
+
+    def _descartar_antigos(self, buckets: Dict[int, List[float]], agora: datetime) -> None:
+        limite = int((agora - self.janela).timestamp()) // self.passo * self.passo
+        for antigo in [b for b in buckets if b < limite]:
+            del buckets[antigo]
+
+    def medias(self, sensor_id: str, agora: Optional[datetime] = None) -> List[Tuple[int, float]]:
+        """(epoch do bucket, distância média) da janela, em ordem."""
+        agora = agora or datetime.now(dt_timezone.utc)
+        estado = self._buckets.get(sensor_id)
+        if estado is None:
+            estado = self._aquecer(sensor_id, agora)
+        with self._trava:
+            self._descartar_antigos(estado[0], agora)
+            return sorted((bucket, soma / n) for bucket, (n, soma) in estado[0].items())
+
+    def svg(self, sensor_id: str, calibracao: Calibracao, largura: int = 240, altura: int = 48) -> str:
+        """SVG inline do nível (0 a 100%) na janela; buckets sem leituras interrompem a linha."""
+        agora = datetime.now(dt_timezone.utc)
+        medias = self.medias(sensor_id, agora)
+        inicio = agora.timestamp() - self.janela.total_seconds()
+        escala_x = largura / self.janela.total_seconds()
+        caminho = []
+        anterior = None
+        for bucket, distancia in medias:
+            x = max(0.0, (bucket + self.passo / 2 - inicio) * escala_x)
+            y = altura - calibracao.nivel(distancia) / 100 * altura
+            if anterior is not None and bucket - anterior == self.passo:
+                caminho.append(f"L{x:.1f} {y:.1f}")
+            else:
+                # "h0" deixa um ponto visível (pontas redondas) mesmo num bucket isolado
+                caminho.append(f"M{x:.1f} {y:.1f}h0")
+            anterior = bucket
+        return (
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{largura}" height="{altura}" '
+            f'viewBox="0 0 {largura} {altura}" role="img" aria-label="Nível nas últimas '
+            f'{self.janela.total_seconds() / 3600:g} horas">'
+            f'<rect width="{largura}" height="{altura}" fill="none" stroke="#ccc"/>'
+            f'<path d="{" ".join(caminho)}" fill="none" stroke="#1e6fd9" stroke-width="1.5" stroke-linejoin="round" stroke-linecap="round"/>'
+            f'</svg>'
+        )
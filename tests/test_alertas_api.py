@@ -0,0 +1,74 @@
+# tests/test_alertas_api.py
+"""Motor de alertas sobre leituras sintéticas."""
+import itertools
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from alertas_api import Destino, MotorAlertas, RegraAlerta
+from calibracao_api import Calibracao
+from monitor_api import LeituraNova
+
+INICIO = datetime(2025, 1, 1, tzinfo=timezone.utc)
+# Distância 20 cm = 100%, 100 cm = 0%
+CALIBRACAO = Calibracao(20.0, 100.0, 1000.0)
+
+NIVEL_BAIXO = RegraAlerta(1, "s", "nivel_abaixo", 20.0, timedelta(minutes=10), 5.0, "log")
+SEM_LEITURA = RegraAlerta(2, "s", "sem_leitura", None, timedelta(minutes=30), 0.0, "log")
+
+_ids = itertools.count(1)
+
+
+def _motor(*regras):
+    motor = MotorAlertas(lambda sensor_id: CALIBRACAO)
+    assert motor.carregar(regras, {}, {}) == []
+    return motor
+
+
+def _ler(motor, minuto, distancia):
+    novas = [LeituraNova(next(_ids), "s", distancia, INICIO + timedelta(minutes=minuto))]
+    return [(n.regra.id, n.estado) for n in motor.ao_receber(novas)]
+
+
+def test_nivel_baixo_dispara_apos_a_duracao_e_resolve_com_histerese():
+    motor = _motor(NIVEL_BAIXO)
+    assert _ler(motor, 0, 70.0) == []   # 37,5%
+    assert _ler(motor, 1, 90.0) == []   # 12,5%: condição começa
+    assert _ler(motor, 6, 90.0) == []
+    assert _ler(motor, 12, 90.0) == [(1, "disparado")]
+    assert _ler(motor, 13, 90.0) == []  # não dispara de novo
+    assert _ler(motor, 14, 82.0) == []  # 22,5%: acima do limiar, mas dentro da histerese
+    assert _ler(motor, 15, 70.0) == [(1, "resolvido")]
+
+
+def test_queda_mais_curta_que_a_duracao_nao_dispara():
+    motor = _motor(NIVEL_BAIXO)
+    _ler(motor, 0, 70.0)
+    assert _ler(motor, 1, 90.0) == []
+    assert _ler(motor, 5, 70.0) == []
+    assert _ler(motor, 20, 70.0) == []
+
+
+def test_sem_leitura_dispara_no_prazo_e_resolve_na_proxima_leitura():
+    motor = _motor(SEM_LEITURA)
+    assert _ler(motor, 0, 50.0) == []
+    assert motor.verificar_prazos(INICIO + timedelta(minutes=29)) == []
+    assert [(n.regra.id, n.estado) for n in motor.verificar_prazos(INICIO + timedelta(minutes=31))] == [(2, "disparado")]
+    assert _ler(motor, 40, 50.0) == [(2, "resolvido")]
+
+
+def test_destino_sem_enviar_falha_ao_criar():
+    class DestinoIncompleto(Destino):
+        pass
+
+    with pytest.raises(TypeError):
+        DestinoIncompleto()
+
+
+def test_motor_importa_sem_conectar_ao_banco():
+    # database_api conecta (e encerra o processo se falhar) ao ser importado
+    codigo = "import sys, alertas_api, eventos_api, calibracao_api; assert 'database_api' not in sys.modules"
+    subprocess.run([sys.executable, "-c", codigo], check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
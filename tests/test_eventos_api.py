@@ -0,0 +1,64 @@
+# tests/test_eventos_api.py
+"""Detector de eventos sobre séries sintéticas."""
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from calibracao_api import Calibracao
+from eventos_api import DetectorEventos, ParametrosEventos
+from filtros_api import FiltroMediana
+
+INICIO = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+PARAMETROS = ParametrosEventos(
+    histerese_cm=1.0,
+    reabastecimento_min_cm=3.0,
+    drenagem_cm_h=10.0,
+    duracao_minima=timedelta(minutes=10),
+    nivel_vazio=5.0,
+    lacuna=timedelta(minutes=15),
+)
+
+
+def _detectar(serie):
+    detector = DetectorEventos(
+        "teste", PARAMETROS, Calibracao(20.0, 100.0, 1000.0), FiltroMediana(5, limiar_outlier=10.0)
+    )
+    eventos = []
+    for instante, distancia in serie:
+        eventos += detector.adicionar(instante, distancia)
+    return [e for e in eventos if e.tipo == "reabastecimento" and e.fim is not None]
+
+
+def _reabastecimento(ruido_cm: float, semente: int = 0):
+    """Caixa parada em 80 cm até 01:00, enche até 30 cm às 01:15 e fica cheia até 05:00; uma leitura por minuto."""
+    aleatorio = random.Random(semente)
+    serie = []
+    for minuto in range(5 * 60):
+        if minuto < 60:
+            distancia = 80.0
+        elif minuto < 75:
+            distancia = 80.0 - (minuto - 60) * 50.0 / 15
+        else:
+            distancia = 30.0
+        serie.append((INICIO + timedelta(minutes=minuto), distancia + aleatorio.uniform(-ruido_cm, ruido_cm)))
+    return serie
+
+
+def test_reabastecimento_sem_ruido_termina_ao_encher():
+    # O evento só fecha quando a distância volta a subir: força a reversão no fim
+    serie = _reabastecimento(0.0) + [(INICIO + timedelta(hours=5, minutes=m), 40.0) for m in range(1, 6)]
+    eventos = _detectar(serie)
+    assert len(eventos) == 1
+    assert INICIO + timedelta(minutes=58) <= eventos[0].inicio <= INICIO + timedelta(minutes=62)
+    assert INICIO + timedelta(minutes=74) <= eventos[0].fim <= INICIO + timedelta(minutes=80)
+
+
+@pytest.mark.parametrize("semente", range(10))
+def test_ruido_no_patamar_nao_arrasta_o_fim(semente):
+    serie = _reabastecimento(0.5, semente) + [(INICIO + timedelta(hours=5, minutes=m), 40.0) for m in range(1, 6)]
+    eventos = _detectar(serie)
+    assert len(eventos) == 1
+    assert INICIO + timedelta(minutes=74) <= eventos[0].fim <= INICIO + timedelta(minutes=85)
+    assert eventos[0].distancia_fim == pytest.approx(30.0, abs=0.5)
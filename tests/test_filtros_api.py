@@ -0,0 +1,56 @@
+# tests/test_filtros_api.py
+"""Filtros de ruído."""
+import pytest
+
+from filtros_api import FiltroBase, FiltroEMA, FiltroKalman, FiltroMediana, criar_filtro
+
+PARAMETROS = {
+    "FILTRO_JANELA_MEDIANA": 5, "FILTRO_ALFA_EMA": 0.3, "FILTRO_KALMAN_Q": 0.01, "FILTRO_KALMAN_R": 1.0,
+    "FILTRO_LIMIAR_OUTLIER_CM": 10.0,
+}
+
+
+def test_mediana_da_janela_deslizante():
+    filtro = FiltroMediana(3, limiar_outlier=100.0)
+    assert [filtro.atualizar(d) for d in (5, 1, 3, 9, 7)] == [5, 3, 3, 3, 7]
+
+
+def test_ema_e_kalman_convergem_para_um_nivel_constante():
+    for filtro in (FiltroEMA(0.3, limiar_outlier=100.0), FiltroKalman(0.01, 1.0, limiar_outlier=100.0)):
+        filtro.atualizar(50.0)
+        for _ in range(100):
+            valor = filtro.atualizar(40.0)
+        assert valor == pytest.approx(40.0, abs=0.1)
+
+
+@pytest.mark.parametrize("nome", ["median", "ema", "kalman"])
+def test_pico_isolado_e_descartado(nome):
+    filtro = criar_filtro(nome, PARAMETROS)
+    for _ in range(5):
+        filtro.atualizar(50.0)
+    assert filtro.atualizar(5.0) == pytest.approx(50.0)
+    assert filtro.atualizar(50.0) == pytest.approx(50.0)
+
+
+@pytest.mark.parametrize("nome", ["median", "ema", "kalman"])
+def test_salto_que_se_repete_e_aceito(nome):
+    filtro = criar_filtro(nome, PARAMETROS)
+    for _ in range(5):
+        filtro.atualizar(80.0)
+    # Rejeitado por max_rejeicoes leituras, depois o filtro recomeça no nível novo
+    valores = [filtro.atualizar(30.0) for _ in range(4)]
+    assert valores[:3] == [pytest.approx(80.0)] * 3
+    assert valores[3] == pytest.approx(30.0)
+
+
+def test_filtro_desconhecido():
+    with pytest.raises(ValueError):
+        criar_filtro("media", PARAMETROS)
+
+
+def test_subclasse_sem_atualizar_falha_ao_criar():
+    class FiltroIncompleto(FiltroBase):
+        pass
+
+    with pytest.raises(TypeError):
+        FiltroIncompleto(limiar_outlier=10.0)
@@ -0,0 +1,41 @@
+# tests/test_replicas_api.py
+"""Saúde das réplicas a partir do estado do receptor de WAL."""
+import pytest
+from sqlalchemy import create_engine
+
+from replicas_api import Replicas, avaliar_atraso
+
+
+def test_replica_recebendo_wal_usa_o_atraso_medido():
+    assert avaliar_atraso((True, True, "streaming", 2.0, 0), 60) == 0.0
+    assert avaliar_atraso((True, True, "streaming", 2.0, 3.5), 60) == 3.5
+
+
+def test_servidor_fora_de_recuperacao_nao_tem_atraso():
+    assert avaliar_atraso((False, False, None, None, 0), 60) == 0.0
+
+
+@pytest.mark.parametrize("linha", [
+    # Receptor caiu: o LSN recebido parou e o replay o alcançou, então o atraso aparece como 0
+    (True, False, None, None, 0),
+    (True, True, "waiting", 5.0, 0),
+    (True, True, "streaming", 300.0, 0),
+    # Usuário sem pg_read_all_stats só vê o pid
+    (True, True, None, None, 0),
+])
+def test_replica_sem_wal_do_primario_sai_do_rodizio(linha):
+    with pytest.raises(RuntimeError):
+        avaliar_atraso(linha, 60)
+
+
+def _criar_engine(url, transacional=False, **opcoes):
+    return create_engine("sqlite://", **opcoes)
+
+
+def test_exportacao_usa_a_engine_transacional_da_replica():
+    replicas = Replicas(["postgresql://r1/db", "postgresql://r2/db"], _criar_engine)
+    assert replicas.escolher(transacional=True) is None
+    replicas._saudaveis = list(replicas.replicas)
+    escolhidas = [replicas.escolher(transacional=True) for _ in range(2)]
+    assert escolhidas == [r.engine_transacional for r in replicas.replicas]
+    assert replicas.escolher() is replicas.replicas[0].engine
@@ -0,0 +1,43 @@
+# tests/test_sketch_api.py
+"""DDSketch: erro relativo dos quantis e combinação de sketches."""
+import random
+
+import pytest
+
+from sketch_api import CHAVE_ZERO, DDSketch
+
+PERCENTIS = (0.0, 0.1, 0.5, 0.9, 0.99, 1.0)
+
+
+def _quantil_exato(ordenados, q):
+    return ordenados[int(q * (len(ordenados) - 1))]
+
+
+def test_quantis_dentro_do_erro_relativo():
+    aleatorio = random.Random(1)
+    valores = [aleatorio.lognormvariate(3, 1) for _ in range(20000)]
+    sketch = DDSketch(0.01)
+    for valor in valores:
+        sketch.adicionar(valor)
+    ordenados = sorted(valores)
+    for q, estimado in sketch.quantis(PERCENTIS).items():
+        assert estimado == pytest.approx(_quantil_exato(ordenados, q), rel=0.01)
+
+
+def test_mesclar_contagens_serializadas_equivale_a_um_sketch_unico():
+    unico, partes = DDSketch(0.01), [DDSketch(0.01) for _ in range(3)]
+    for i, valor in enumerate([0.0, 1.5, 2.0, 2.0, 10.0, 33.3, 0.0, 7.0]):
+        unico.adicionar(valor)
+        partes[i % 3].adicionar(valor)
+    mesclado = DDSketch(0.01)
+    for parte in partes:
+        mesclado.mesclar(
+            [(CHAVE_ZERO, parte.zeros)] + [(str(i), contagem) for i, contagem in parte.contagens.items()]
+        )
+    assert mesclado.n == unico.n
+    assert mesclado.quantis(PERCENTIS) == unico.quantis(PERCENTIS)
+    assert mesclado.quantis([0.0])[0.0] == 0.0
+
+
+def test_sketch_vazio():
+    assert DDSketch().quantis([0.5, 0.9]) == {0.5: None, 0.9: None}
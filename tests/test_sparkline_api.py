@@ -0,0 +1,60 @@
+# tests/test_sparkline_api.py
+"""Buckets do minigráfico, com uma sessão falsa no lugar do banco."""
+import threading
+from datetime import datetime, timedelta, timezone
+
+from monitor_api import LeituraNova
+from sparkline_api import Sparklines
+
+AGORA = datetime(2025, 1, 1, 12, tzinfo=timezone.utc)
+
+
+class SessaoFalsa:
+    """Devolve sempre as mesmas linhas (bucket, n, soma, maior id) de `_SQL_BUCKETS`."""
+
+    def __init__(self, linhas, ao_consultar=None):
+        self.linhas = linhas
+        self.ao_consultar = ao_consultar
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, consulta, parametros):
+        if self.ao_consultar is not None:
+            self.ao_consultar()
+        return self
+
+    def all(self):
+        return self.linhas
+
+
+def _bucket(instante, passo=1800):
+    return int(instante.timestamp()) // passo * passo
+
+
+def test_monitor_descarta_buckets_fora_da_janela():
+    sparklines = Sparklines(lambda: SessaoFalsa([(_bucket(AGORA), 1, 50.0, 1)]))
+    sparklines.medias("s", AGORA)
+    # Dois dias de leituras sem ninguém abrir a página: só a última janela fica em memória
+    novas = [LeituraNova(i + 2, "s", 50.0, AGORA + timedelta(minutes=30 * (i + 1))) for i in range(96)]
+    sparklines.ao_receber(novas)
+    assert len(sparklines._buckets["s"][0]) <= 49
+
+
+def test_leituras_durante_o_aquecimento_nao_se_perdem():
+    durante = LeituraNova(8, "s", 30.0, AGORA)
+
+    def monitor_entrega():
+        # O monitor consegue a trava enquanto a consulta roda; antes, ficava parado até ela voltar
+        entrega = threading.Thread(target=sparklines.ao_receber, args=([durante],))
+        entrega.start()
+        entrega.join(timeout=2)
+        assert not entrega.is_alive()
+
+    sparklines = Sparklines(lambda: SessaoFalsa([(_bucket(AGORA), 1, 50.0, 7)], monitor_entrega))
+    # A leitura 8 não estava no resultado da consulta (maior id 7): entra pela lista de pendentes
+    assert sparklines.medias("s", AGORA) == [(_bucket(AGORA), 40.0)]
+    assert sparklines._aquecendo == {}